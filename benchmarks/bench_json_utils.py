@@ -0,0 +1,85 @@
+"""
+Benchmark repair_json_output on representative agent outputs.
+
+Usage:
+    uv run python -m benchmarks.bench_json_utils [--number N]
+"""
+
+import argparse
+import json
+import timeit
+
+import json_repair
+
+from src.utils.json_utils import repair_json_output
+
+PLAN = {
+    "thought": "用户想了解最新的大模型进展，需要先搜索再整理报告。",
+    "title": "大模型进展调研",
+    "steps": [
+        {
+            "agent_name": "researcher",
+            "title": f"搜索第{i}部分资料",
+            "description": "Search the web and summarise the findings. " * 5,
+        }
+        for i in range(8)
+    ],
+}
+
+REPORT = "\n\n".join(
+    f"## 第{i}节\n\n" + "这是一段研究报告的正文内容，包含中文和 English text. " * 40
+    for i in range(60)
+)
+
+SAMPLES = {
+    "plan_json": json.dumps(PLAN, ensure_ascii=False),
+    "plan_fenced": "```json\n"
+    + json.dumps(PLAN, ensure_ascii=False, indent=2)
+    + "\n```",
+    "plan_truncated": json.dumps(PLAN, ensure_ascii=False)[:-40],
+    "report_markdown": REPORT,
+    "report_with_json_block": REPORT + '\n\n```json\n{"source": "tavily"}\n```',
+    "browser_result": json.dumps(
+        {"result_content": REPORT[:4000], "generated_gif_path": "static/x.gif"}
+    ),
+}
+
+
+def legacy_repair_json_output(content: str) -> str:
+    """The implementation before the fast path, kept for comparison."""
+    content = content.strip()
+    if content.startswith(("{", "[")) or "```json" in content:
+        try:
+            if content.startswith("```json"):
+                content = content.removeprefix("```json")
+            if content.endswith("```"):
+                content = content.removesuffix("```")
+            return json.dumps(json_repair.loads(content))
+        except Exception:
+            pass
+    return content
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=50, help="calls per sample")
+    args = parser.parse_args()
+
+    print(
+        f"{'sample':<24}{'size':>10}{'legacy ms':>12}{'current ms':>12}{'speedup':>10}"
+    )
+    for name, content in SAMPLES.items():
+        legacy = timeit.timeit(
+            lambda: legacy_repair_json_output(content), number=args.number
+        )
+        current = timeit.timeit(lambda: repair_json_output(content), number=args.number)
+        legacy_ms = legacy / args.number * 1000
+        current_ms = current / args.number * 1000
+        print(
+            f"{name:<24}{len(content):>10}{legacy_ms:>12.3f}{current_ms:>12.3f}"
+            f"{legacy_ms / current_ms:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
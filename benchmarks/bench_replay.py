@@ -0,0 +1,84 @@
+"""
+Benchmark the graph, streaming and serialisation on a recorded workflow.
+
+Record a workflow with run_agent_workflow(record=...) or WORKFLOW_RECORD_DIR,
+then replay it here, without network access. With the default speed of 0 the
+recorded LLM and tool latencies are skipped and only the framework is timed.
+
+Usage:
+    uv run python -m benchmarks.bench_replay RECORDING [--runs N]
+        [--concurrency N] [--speed FACTOR]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from benchmarks.bench_workflow import peak_rss_mb, percentile
+from src.service.workflow_service import run_agent_workflow
+from src.utils.json_utils import dumps_json
+from src.utils.replay import WorkflowRecording
+
+
+async def replay_once(recording: WorkflowRecording, speed: float) -> tuple:
+    """Replay the recording, returning its duration, events and SSE bytes."""
+    events = size = 0
+    start = time.perf_counter()
+    async for event in run_agent_workflow(
+        recording.input["messages"],
+        deep_thinking_mode=recording.input.get("deep_thinking_mode", False),
+        search_before_planning=recording.input.get("search_before_planning", False),
+        team_members=recording.input.get("team_members"),
+        replay=recording,
+        replay_speed=speed,
+    ):
+        if event["event"] == "error":
+            raise RuntimeError(event["data"]["error"])
+        events += 1
+        size += len(dumps_json(event["data"]))
+    return time.perf_counter() - start, events, size
+
+
+async def measure(
+    recording: WorkflowRecording, runs: int, concurrency: int, speed: float
+) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run():
+        async with semaphore:
+            return await replay_once(recording, speed)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run() for _ in range(runs)))
+    elapsed = time.perf_counter() - start
+    durations = [duration for duration, _, _ in results]
+    events = sum(count for _, count, _ in results)
+    return {
+        "p50 ms": percentile(durations, 50) * 1000,
+        "p95 ms": percentile(durations, 95) * 1000,
+        "events/run": events / runs,
+        "KB/run": sum(size for _, _, size in results) / runs / 1024,
+        "us/event": elapsed * 1e6 / events,
+        "peak RSS MB": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("recording")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--speed", type=float, default=0.0)
+    args = parser.parse_args()
+    # The node logs would dominate the timings
+    logging.getLogger("src").setLevel(logging.WARNING)
+
+    recording = WorkflowRecording.load(args.recording)
+    result = asyncio.run(measure(recording, args.runs, args.concurrency, args.speed))
+    print("".join(f"{name:>13}" for name in result))
+    print("".join(f"{value:>13.1f}" for value in result.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark SSE frame encoding for a token stream, with and without coalescing.
+
+Usage:
+    uv run python -m benchmarks.bench_sse [--tokens N] [--rate TOKENS_PER_SEC]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from sse_starlette.sse import ServerSentEvent
+
+from src.api.sse import coalesce_message_events, encode_event
+
+# Tokens per asyncio.sleep(), sleeping for every token is too coarse at high rates
+TOKENS_PER_TICK = 10
+
+
+async def token_events(tokens: int, rate: float):
+    """Yield message deltas the way initialize_workflow does for a streaming LLM."""
+    for i in range(tokens):
+        if rate and i % TOKENS_PER_TICK == 0:
+            await asyncio.sleep(TOKENS_PER_TICK / rate)
+        yield {
+            "event": "message",
+            "data": {"message_id": "run-1", "delta": {"content": "令牌 token "}},
+        }
+
+
+async def legacy_frames(events):
+    async for event in events:
+        yield {
+            "event": event["event"],
+            "data": json.dumps(event["data"], ensure_ascii=False),
+        }
+
+
+async def coalesced_frames(events, window: float, max_bytes: int):
+    async for event in coalesce_message_events(events, window, max_bytes):
+        yield encode_event(event)
+
+
+async def measure(frames, tokens: int) -> dict:
+    frame_count = 0
+    wire_bytes = 0
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    async for frame in frames:
+        wire_bytes += len(ServerSentEvent(**frame, sep="\n").encode())
+        frame_count += 1
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    return {
+        "frames": frame_count,
+        "frames/s": frame_count / wall,
+        "bytes": wire_bytes,
+        "cpu ms/1k tok": cpu * 1000 / (tokens / 1000),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tokens", type=int, default=20000)
+    parser.add_argument(
+        "--rate", type=float, default=0, help="tokens per second, 0 for unthrottled"
+    )
+    parser.add_argument("--window-ms", type=float, default=30)
+    parser.add_argument("--max-bytes", type=int, default=4096)
+    args = parser.parse_args()
+
+    runs = {
+        "legacy": legacy_frames(token_events(args.tokens, args.rate)),
+        "coalesced": coalesced_frames(
+            token_events(args.tokens, args.rate),
+            args.window_ms / 1000,
+            args.max_bytes,
+        ),
+    }
+    print(f"{args.tokens} tokens, rate={args.rate or 'unthrottled'}")
+    print(
+        f"{'mode':<12}{'frames':>10}{'frames/s':>14}{'bytes':>12}{'cpu ms/1k tok':>16}"
+    )
+    for name, frames in runs.items():
+        result = asyncio.run(measure(frames, args.tokens))
+        print(
+            f"{name:<12}{result['frames']:>10}{result['frames/s']:>14.0f}"
+            f"{result['bytes']:>12}{result['cpu ms/1k tok']:>16.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
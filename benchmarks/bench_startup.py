@@ -0,0 +1,72 @@
+"""
+Benchmark the cold start of an API server worker.
+
+Each run starts a fresh interpreter that imports src.api.app, runs the
+lifespan startup (what a uvicorn worker does before it serves requests) and
+then starts the Playwright server, as the first browser task would.
+
+Usage:
+    uv run python -m benchmarks.bench_startup [--runs N]
+"""
+
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+
+from benchmarks.bench_workflow import percentile
+
+
+def measure_worker() -> dict:
+    """Time the startup steps of this (fresh) process."""
+    start = time.perf_counter()
+    from src.api.app import app
+    from src.playwright_manager import ensure_playwright_server, playwright_manager
+
+    imported = time.perf_counter()
+
+    async def lifespan_startup():
+        async with app.router.lifespan_context(app):
+            return time.perf_counter()
+
+    ready = asyncio.run(lifespan_startup())
+    browser_start = time.perf_counter()
+    started = ensure_playwright_server()
+    browser_ready = time.perf_counter()
+    playwright_manager.stop_server()
+    return {
+        "import s": imported - start,
+        "lifespan s": ready - imported,
+        "worker ready s": ready - start,
+        "playwright s": browser_ready - browser_start if started else float("nan"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(measure_worker()))
+        return
+
+    runs = []
+    for _ in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_startup", "--child"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    print(f"{'':>16}{'p50':>10}{'max':>10}")
+    for name in runs[0]:
+        values = [run[name] for run in runs]
+        print(f"{name:>16}{percentile(values, 50):>10.2f}{max(values):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Benchmark run_agent_workflow end to end, offline, at several concurrency levels.
+
+Every LLM is a scripted model and tavily, the crawler and the browser are local
+stand-ins, so the numbers only measure the graph, streaming and tool overhead.
+
+Usage:
+    uv run python -m benchmarks.bench_workflow [--concurrency 1,4,16]
+        [--workflows N] [--latency SECONDS] [--tokens-per-second N]
+        [--reply-tokens N] [--tool-latency SECONDS] [--result-chars N]
+        [--search-before-planning]
+"""
+
+import argparse
+import asyncio
+import logging
+import resource
+import sys
+import time
+from typing import Dict, List
+
+from benchmarks.fakes import (
+    PLAN,
+    STAND_IN_TOOL_ARGS,
+    ScriptedChatModel,
+    offline_workflow,
+    stand_in_tools,
+)
+from src.service.workflow_service import run_agent_workflow
+
+PROMPT = [{"role": "user", "content": "Write a report on LangGraph"}]
+
+# Research, then browse, then report, so that every stand-in tool is called
+BENCHMARK_PLAN = {
+    **PLAN,
+    "steps": [
+        PLAN["steps"][0],
+        {
+            "agent_name": "browser",
+            "title": "Check the documentation",
+            "description": "Read the LangGraph documentation site.",
+        },
+        PLAN["steps"][1],
+    ],
+}
+
+
+def peak_rss_mb() -> float:
+    """The peak resident set size of the process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """The nearest-rank percentile of `values`, q between 0 and 100."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_one(search_before_planning: bool) -> tuple[float, int, bool]:
+    """Run one workflow, returning its duration, event count and success."""
+    events = 0
+    failed = False
+    start = time.perf_counter()
+    async for event in run_agent_workflow(
+        PROMPT, search_before_planning=search_before_planning
+    ):
+        events += 1
+        failed = failed or event["event"] == "error"
+    return time.perf_counter() - start, events, not failed
+
+
+async def run_level(
+    concurrency: int, workflows: int, search_before_planning: bool = False
+) -> Dict[str, float]:
+    """
+    Run `workflows` workflows, `concurrency` of them at a time.
+
+    Returns:
+        dict: Throughput, latency percentiles, events/sec and peak RSS
+    """
+    remaining = workflows
+    durations: List[float] = []
+    events = errors = 0
+
+    async def worker():
+        nonlocal remaining, events, errors
+        while remaining > 0:
+            remaining -= 1
+            duration, count, ok = await run_one(search_before_planning)
+            durations.append(duration)
+            events += count
+            errors += not ok
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "workflows/s": workflows / elapsed,
+        "p50 ms": percentile(durations, 50) * 1000,
+        "p95 ms": percentile(durations, 95) * 1000,
+        "events/s": events / elapsed,
+        "events/run": events / workflows,
+        "errors": errors,
+        "peak RSS MB": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--workflows", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--reply-tokens", type=int, default=100)
+    parser.add_argument("--tool-latency", type=float, default=0.05)
+    parser.add_argument("--result-chars", type=int, default=2000)
+    parser.add_argument("--search-before-planning", action="store_true")
+    args = parser.parse_args()
+    # The node logs would dominate the timings
+    logging.getLogger("src").setLevel(logging.WARNING)
+
+    model = ScriptedChatModel(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        reply_tokens=args.reply_tokens,
+        plan=BENCHMARK_PLAN,
+        tool_args_by_name=STAND_IN_TOOL_ARGS,
+    )
+    tools = stand_in_tools(args.tool_latency, args.result_chars)
+    columns = [
+        "workflows/s",
+        "p50 ms",
+        "p95 ms",
+        "events/s",
+        "events/run",
+        "errors",
+        "peak RSS MB",
+    ]
+    print(f"{'concurrency':<13}" + "".join(f"{c:>13}" for c in columns))
+    with offline_workflow(model, tools, search_tool=tools["search"]):
+        for concurrency in [int(c) for c in args.concurrency.split(",")]:
+            result = asyncio.run(
+                run_level(
+                    concurrency,
+                    max(args.workflows, concurrency),
+                    args.search_before_planning,
+                )
+            )
+            print(
+                f"{concurrency:<13}" + "".join(f"{result[c]:>13.1f}" for c in columns)
+            )
+
+
+if __name__ == "__main__":
+    main()
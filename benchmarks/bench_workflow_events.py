@@ -0,0 +1,96 @@
+"""
+Benchmark the per-event cost of streaming a workflow, astream_events versus astream.
+
+Usage:
+    uv run python -m benchmarks.bench_workflow_events [--runs N] [--reply-tokens N]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from benchmarks.fakes import ScriptedChatModel, offline_workflow
+from src.config import TEAM_MEMBER_CONFIGRATIONS, TEAM_MEMBERS
+from src.service.workflow_service import graph, initialize_workflow
+
+STREAMING_LLM_AGENTS = [*TEAM_MEMBERS, "planner", "coordinator"]
+PROMPT = [{"role": "user", "content": "Write a report on LangGraph"}]
+
+
+async def legacy_events() -> tuple[int, int]:
+    """Classify every astream_events event, as initialize_workflow used to."""
+    received = useful = 0
+    async for event in graph.astream_events(
+        {
+            "TEAM_MEMBERS": TEAM_MEMBERS,
+            "TEAM_MEMBER_CONFIGRATIONS": TEAM_MEMBER_CONFIGRATIONS,
+            "messages": PROMPT,
+            "deep_thinking_mode": False,
+            "search_before_planning": False,
+        },
+        version="v2",
+    ):
+        received += 1
+        kind = event["event"]
+        checkpoint_ns = event["metadata"].get("checkpoint_ns")
+        node = "" if checkpoint_ns is None else checkpoint_ns.split(":")[0]
+        if kind.startswith("on_chain") and event["name"] in STREAMING_LLM_AGENTS:
+            useful += 1
+        elif kind.startswith("on_chat_model") and node in STREAMING_LLM_AGENTS:
+            useful += 1
+        elif kind.startswith("on_tool") and node in TEAM_MEMBERS:
+            useful += 1
+    return received, useful
+
+
+async def current_events() -> tuple[int, int]:
+    """Run initialize_workflow, counting the workflow events it yields."""
+    count = 0
+    async for _ in initialize_workflow(PROMPT):
+        count += 1
+    return count, count
+
+
+async def measure(consume, runs: int) -> dict:
+    received = useful = 0
+    start = time.perf_counter()
+    for _ in range(runs):
+        run_received, run_useful = await consume()
+        received += run_received
+        useful += run_useful
+    elapsed = time.perf_counter() - start
+    return {
+        "received/run": received / runs,
+        "useful/run": useful / runs,
+        "ms/run": elapsed * 1000 / runs,
+        "us/useful": elapsed * 1e6 / useful,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--reply-tokens", type=int, default=200)
+    args = parser.parse_args()
+    # The node logs would dominate the timings
+    logging.getLogger("src").setLevel(logging.WARNING)
+
+    model = ScriptedChatModel(reply_tokens=args.reply_tokens)
+    modes = {"astream_events": legacy_events, "astream": current_events}
+    print(
+        f"{'mode':<16}{'received/run':>14}{'useful/run':>12}{'ms/run':>10}"
+        f"{'us/useful':>11}"
+    )
+    with offline_workflow(model):
+        for name, consume in modes.items():
+            result = asyncio.run(measure(consume, args.runs))
+            print(
+                f"{name:<16}{result['received/run']:>14.0f}"
+                f"{result['useful/run']:>12.0f}{result['ms/run']:>10.1f}"
+                f"{result['us/useful']:>11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
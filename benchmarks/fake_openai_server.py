@@ -0,0 +1,150 @@
+"""
+An OpenAI-compatible chat completions server answering as the DeepManus agents.
+
+Replies come from benchmarks.fakes, so a workflow run against this server goes
+from the coordinator to the reporter without tools and without network access.
+Streams are paced at a configurable token rate.
+
+Usage:
+    uv run python -m benchmarks.fake_openai_server [--port PORT]
+        [--latency SECONDS] [--tokens-per-second N] [--reply-tokens N]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, Dict, List
+
+from langchain_community.adapters.openai import convert_dict_to_message
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from benchmarks.fakes import default_reply, detect_role
+
+MODEL = "fake-gpt"
+
+# Tokens per asyncio.sleep(), sleeping for every token is too coarse at high rates
+TOKENS_PER_TICK = 10
+
+
+def reply_tokens(messages: List[Dict[str, Any]], reply_tokens: int) -> List[str]:
+    """The reply of the agent whose system prompt starts `messages`, as tokens."""
+    messages = [convert_dict_to_message(message) for message in messages]
+    reply = default_reply(detect_role(messages), messages, reply_tokens)
+    words = reply.split(" ")
+    return [word + " " for word in words[:-1]] + words[-1:]
+
+
+def _chunk(completion_id: str, delta: dict, finish_reason=None) -> str:
+    chunk = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": MODEL,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(chunk)}\n\n"
+
+
+def _usage(messages: List[dict], tokens: List[str]) -> dict:
+    prompt_tokens = sum(len(str(m.get("content") or "").split()) for m in messages)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": len(tokens),
+        "total_tokens": prompt_tokens + len(tokens),
+    }
+
+
+def create_app(
+    latency: float = 0.0, tokens_per_second: float = 0.0, reply_length: int = 200
+) -> Starlette:
+    """
+    Build the stub server.
+
+    Args:
+        latency: Seconds before the first token
+        tokens_per_second: Pace of streamed tokens, 0 streams as fast as possible
+        reply_length: Tokens in the replies of the researcher and the reporter
+    """
+
+    async def stream(body: dict, tokens: List[str]):
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        await asyncio.sleep(latency)
+        yield _chunk(completion_id, {"role": "assistant", "content": ""})
+        for i, token in enumerate(tokens):
+            if tokens_per_second and i % TOKENS_PER_TICK == 0:
+                await asyncio.sleep(TOKENS_PER_TICK / tokens_per_second)
+            yield _chunk(completion_id, {"content": token})
+        yield _chunk(completion_id, {}, finish_reason="stop")
+        if (body.get("stream_options") or {}).get("include_usage"):
+            usage = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": MODEL,
+                "choices": [],
+                "usage": _usage(body["messages"], tokens),
+            }
+            yield f"data: {json.dumps(usage)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        tokens = reply_tokens(body["messages"], reply_length)
+        if body.get("stream"):
+            return StreamingResponse(
+                stream(body, tokens), media_type="text/event-stream"
+            )
+        await asyncio.sleep(latency)
+        if tokens_per_second:
+            await asyncio.sleep(len(tokens) / tokens_per_second)
+        return JSONResponse(
+            {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": MODEL,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "".join(tokens)},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": _usage(body["messages"], tokens),
+            }
+        )
+
+    async def models(request: Request):
+        return JSONResponse(
+            {"object": "list", "data": [{"id": MODEL, "object": "model"}]}
+        )
+
+    return Starlette(
+        routes=[
+            Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+            Route("/v1/models", models),
+        ]
+    )
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--reply-tokens", type=int, default=200)
+    args = parser.parse_args()
+
+    app = create_app(args.latency, args.tokens_per_second, args.reply_tokens)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
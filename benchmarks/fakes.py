@@ -0,0 +1,316 @@
+"""
+Offline stand-ins for the LLMs and tools used by the workflow, for benchmarks.
+"""
+
+import asyncio
+import json
+import time
+from contextlib import ExitStack, contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from unittest.mock import patch
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    ToolMessage,
+)
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.tools import BaseTool, StructuredTool
+
+from src.tools.decorators import log_io
+
+# The first words of each agent's system prompt in src/prompts
+ROLE_MARKERS = {
+    "coordinator": "You are DeepManus",
+    "planner": "You are a professional Deep Researcher",
+    "supervisor": "You are a supervisor",
+    "researcher": "You are a researcher",
+    "coder": "You are a professional software engineer",
+    "browser": "You are a web browser",
+    "reporter": "You are a professional reporter",
+}
+
+PLAN = {
+    "thought": "The user wants a short research report.",
+    "title": "Offline benchmark plan",
+    "steps": [
+        {
+            "agent_name": "researcher",
+            "title": "Research the topic",
+            "description": "Search the web and summarise the findings.",
+        },
+        {
+            "agent_name": "reporter",
+            "title": "Write the report",
+            "description": "Write a report based on the research.",
+        },
+    ],
+}
+
+
+def detect_role(messages: List[BaseMessage]) -> str:
+    """Find which agent is calling the model from its system prompt."""
+    system_prompt = str(messages[0].content) if messages else ""
+    for role, marker in ROLE_MARKERS.items():
+        if marker in system_prompt:
+            return role
+    return "unknown"
+
+
+def default_reply(
+    role: str, messages: List[BaseMessage], reply_tokens: int, plan: dict = PLAN
+) -> str:
+    """Reply like each agent would for a research request."""
+    if role == "coordinator":
+        return "handoff_to_planner()"
+    if role == "planner":
+        return json.dumps(plan)
+    if role == "supervisor":
+        done = {message.name for message in messages if message.name}
+        for step in plan["steps"]:
+            if step["agent_name"] not in done:
+                return json.dumps({"next": step["agent_name"]})
+        return json.dumps({"next": "FINISH"})
+    return " ".join(f"{role}-token-{i}" for i in range(reply_tokens))
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    A chat model that answers as each DeepManus agent, streaming word by word.
+
+    latency is the delay before the first token, tokens_per_second paces the
+    rest of the stream (0 streams as fast as possible). Once tools are bound,
+    the model first calls each of them with its tool_args_by_name entry, or
+    tool_args, then answers. The planner answers with `plan`.
+    """
+
+    latency: float = 0.0
+    tokens_per_second: float = 0.0
+    reply_tokens: int = 200
+    plan: dict = PLAN
+    tool_names: List[str] = []
+    tool_args: dict = {"query": "benchmark"}
+    tool_args_by_name: Dict[str, dict] = {}
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _tool_call_chunk(
+        self, messages: List[BaseMessage]
+    ) -> Optional[ChatGenerationChunk]:
+        called = {m.name for m in messages if isinstance(m, ToolMessage)}
+        for name in self.tool_names:
+            if name not in called:
+                return ChatGenerationChunk(
+                    message=AIMessageChunk(
+                        content="",
+                        tool_call_chunks=[
+                            {
+                                "name": name,
+                                "args": json.dumps(
+                                    self.tool_args_by_name.get(name, self.tool_args)
+                                ),
+                                "id": f"call_{name}_{len(messages)}",
+                                "index": 0,
+                            }
+                        ],
+                    )
+                )
+        return None
+
+    def _tokens(self, messages: List[BaseMessage]) -> List[str]:
+        reply = default_reply(
+            detect_role(messages), messages, self.reply_tokens, self.plan
+        )
+        words = reply.split(" ")
+        return [word + " " for word in words[:-1]] + words[-1:]
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = None
+        for chunk in self._stream(messages, stop, run_manager):
+            message = chunk.message if message is None else message + chunk.message
+        return ChatResult(
+            generations=[
+                ChatGeneration(
+                    message=AIMessage(
+                        content=message.content, tool_calls=message.tool_calls
+                    )
+                )
+            ]
+        )
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        tool_call = self._tool_call_chunk(messages)
+        if tool_call:
+            yield tool_call
+            return
+        for token in self._tokens(messages):
+            if self.tokens_per_second:
+                time.sleep(1 / self.tokens_per_second)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ):
+        await asyncio.sleep(self.latency)
+        tool_call = self._tool_call_chunk(messages)
+        if tool_call:
+            yield tool_call
+            return
+        for token in self._tokens(messages):
+            if self.tokens_per_second:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    def bind_tools(self, tools, **kwargs):
+        names = [getattr(t, "name", None) or t.__name__ for t in tools]
+        return self.model_copy(update={"tool_names": names})
+
+    def with_structured_output(self, schema=None, **kwargs):
+        return self | JsonOutputParser()
+
+
+# Arguments the scripted model passes to each stand-in tool
+STAND_IN_TOOL_ARGS = {
+    "tavily_search": {"query": "benchmark"},
+    "multi_search": {"queries": ["benchmark", "offline benchmark"]},
+    "crawl_tool": {"url": "https://example.com/benchmark"},
+    "browser": {"instruction": "Open example.com and read the page"},
+}
+
+
+def stand_in_tools(latency: float = 0.0, result_chars: int = 2000) -> dict:
+    """
+    Local tools named and shaped like tavily, the crawler and the browser.
+
+    They are logged with log_io under the names the real tools log, so their
+    results can be recorded and replayed through the real tools; the browser,
+    like BrowserTool, also has an asynchronous version.
+
+    Args:
+        latency: Seconds each tool call takes
+        result_chars: Length of the text each tool returns
+
+    Returns:
+        dict: Tool lists by agent, plus the planner's "search" tool
+    """
+    text = ("offline benchmark result " * (result_chars // 25 + 1))[:result_chars]
+
+    def results(query: str) -> List[dict]:
+        return [
+            {
+                "url": f"https://example.com/{query.replace(' ', '-')}/{i}",
+                "title": f"{query} {i}",
+                "content": text[: result_chars // 3],
+            }
+            for i in range(3)
+        ]
+
+    @log_io
+    def tavily_search(query: str) -> tuple:
+        """search query to look up"""
+        time.sleep(latency)
+        # Like TavilySearchResults, the results and the raw response
+        return results(query), {"query": query, "results": results(query)}
+
+    @log_io
+    def multi_search_tool(queries: List[str]) -> List[dict]:
+        """Run several search queries in parallel and merge their results."""
+        time.sleep(latency)
+        return [result for query in queries for result in results(query)]
+
+    @log_io
+    def crawl_tool(url: str) -> dict:
+        """Use this to crawl a url and get a readable content in markdown format."""
+        time.sleep(latency)
+        return {
+            "role": "user",
+            "content": [{"type": "text", "text": f"# {url}\n\n{text}"}],
+        }
+
+    @log_io
+    def browser(instruction: str) -> str:
+        """Use this tool to interact with web browsers."""
+        time.sleep(latency)
+        return text
+
+    async def abrowser(instruction: str) -> str:
+        await asyncio.sleep(latency)
+        return text
+
+    search = StructuredTool.from_function(
+        tavily_search, response_format="content_and_artifact"
+    )
+    return {
+        "search": search,
+        "researcher": [
+            search,
+            StructuredTool.from_function(multi_search_tool, name="multi_search"),
+            StructuredTool.from_function(crawl_tool),
+        ],
+        "coder": [],
+        "browser": [StructuredTool.from_function(browser, coroutine=abrowser)],
+    }
+
+
+@contextmanager
+def offline_workflow(
+    model: BaseChatModel,
+    tools: Optional[dict] = None,
+    search_tool: Optional[BaseTool] = None,
+):
+    """
+    Run the workflow graph against `model` instead of the configured LLMs.
+
+    Args:
+        model: The chat model every agent should use
+        tools: Optional tool lists for the researcher, coder and browser agents
+        search_tool: Optional replacement of tavily for search_before_planning
+    """
+    from src.agents import agents
+
+    tools = tools or {}
+    with ExitStack() as stack:
+        stack.enter_context(patch.object(agents, "get_llm_by_type", lambda _: model))
+        stack.enter_context(patch("src.graph.nodes.get_llm_by_type", lambda _: model))
+        if search_tool is not None:
+            stack.enter_context(patch("src.graph.nodes.tavily_tool", search_tool))
+        for agent, node_attr in (
+            ("researcher", "research_agent"),
+            ("coder", "coder_agent"),
+            ("browser", "browser_agent"),
+        ):
+            react_agent = agents.create_agent(agent, tools.get(agent, []), agent)
+            stack.enter_context(patch(f"src.graph.nodes.{node_attr}", react_agent))
+        yield
@@ -0,0 +1,296 @@
+"""
+Load test /api/chat/stream with concurrent clients against a fake LLM server.
+
+Starts benchmarks.fake_openai_server and the API server (src.api.app:app,
+one uvicorn worker) pointed at it, then opens N concurrent chat streams for
+each level and reports time to first event, tokens/sec per stream, rejected
+and dropped connections, and the API server's CPU and RSS (needs psutil, the
+`bench` extra).
+
+Usage:
+    uv run python -m benchmarks.loadtest_sse [--connections 1,10,50]
+        [--tokens-per-second N] [--latency SECONDS] [--reply-tokens N]
+        [--timeout SECONDS] [--env KEY=VALUE ...]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Iterator, List, Optional
+
+import httpx
+
+from benchmarks.bench_workflow import percentile
+from benchmarks.fake_openai_server import MODEL
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - psutil is optional
+    psutil = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROMPT = [{"role": "user", "content": "Write a report on LangGraph"}]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def running(command: List[str], env: Dict[str, str], log) -> Iterator[subprocess.Popen]:
+    """Run a server process for the duration of the block."""
+    process = subprocess.Popen(
+        command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    try:
+        yield process
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 120.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"{url} did not answer within {timeout}s")
+
+
+def parse_sse(lines: List[str]) -> Iterator[tuple]:
+    """Yield (event, data) for each frame of an SSE stream's lines."""
+    event, data = None, []
+    for line in lines:
+        if not line:
+            if event is not None:
+                yield event, "\n".join(data)
+            event, data = None, []
+        elif line.startswith("event:"):
+            event = line[len("event:") :].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:") :].strip())
+
+
+class StreamResult:
+    """What one client saw of its chat stream."""
+
+    def __init__(self):
+        self.status: Optional[int] = None
+        self.ttfe: Optional[float] = None
+        self.tokens = 0
+        self.first_token: Optional[float] = None
+        self.last_token: Optional[float] = None
+        self.events = 0
+        self.completed = False
+        self.error: Optional[str] = None
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        if self.first_token is None or self.last_token == self.first_token:
+            return None
+        return self.tokens / (self.last_token - self.first_token)
+
+    def on_event(self, event: str, data: str, elapsed: float) -> None:
+        self.events += 1
+        if self.ttfe is None:
+            self.ttfe = elapsed
+        if event == "message":
+            content = (json.loads(data).get("delta") or {}).get("content")
+            if content:
+                self.tokens += len(content.split())
+                self.first_token = self.first_token or elapsed
+                self.last_token = elapsed
+        elif event == "final_session_state":
+            self.completed = True
+        elif event == "error":
+            self.error = data
+
+
+async def open_stream(client: httpx.AsyncClient, url: str, user: int) -> StreamResult:
+    result = StreamResult()
+    start = time.perf_counter()
+    try:
+        async with client.stream(
+            "POST",
+            url,
+            json={"messages": PROMPT},
+            # One caller per connection, the per-key admission limit is not tested
+            headers={"X-API-Key": f"loadtest-{user}"},
+        ) as response:
+            result.status = response.status_code
+            if response.status_code != 200:
+                return result
+            lines = []
+            async for line in response.aiter_lines():
+                lines.append(line)
+                if line:
+                    continue
+                for event, data in parse_sse(lines):
+                    result.on_event(event, data, time.perf_counter() - start)
+                lines = []
+    except httpx.HTTPError as e:
+        result.error = repr(e)
+    return result
+
+
+class ServerSampler:
+    """Samples the CPU time and RSS of the API server process while a level runs."""
+
+    def __init__(self, pid: int):
+        self.process = psutil.Process(pid) if psutil else None
+        self.peak_rss = 0
+        self._cpu_start = 0.0
+        self._start = 0.0
+        self.cpu_percent: Optional[float] = None
+
+    def _cpu(self) -> float:
+        times = self.process.cpu_times()
+        return times.user + times.system
+
+    async def run(self, stop: asyncio.Event) -> None:
+        if self.process is None:
+            return
+        self._start = time.perf_counter()
+        self._cpu_start = self._cpu()
+        while not stop.is_set():
+            self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(stop.wait(), 0.25)
+        elapsed = time.perf_counter() - self._start
+        self.cpu_percent = (self._cpu() - self._cpu_start) * 100 / elapsed
+
+
+async def run_level(base_url: str, pid: int, connections: int, timeout: float) -> dict:
+    """Open `connections` concurrent chat streams and summarise them."""
+    sampler = ServerSampler(pid)
+    stop = asyncio.Event()
+    sampling = asyncio.create_task(sampler.run(stop))
+    limits = httpx.Limits(max_connections=connections)
+    start = time.perf_counter()
+    async with httpx.AsyncClient(
+        base_url=base_url, timeout=httpx.Timeout(timeout, connect=10), limits=limits
+    ) as client:
+        results = await asyncio.gather(
+            *(open_stream(client, "/api/chat/stream", i) for i in range(connections))
+        )
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await sampling
+
+    ok = [r for r in results if r.completed and not r.error]
+    ttfe = [r.ttfe for r in ok]
+    rates = [r.tokens_per_second for r in ok if r.tokens_per_second]
+    return {
+        "conns": connections,
+        "ok": len(ok),
+        "429": sum(r.status == 429 for r in results),
+        "dropped": sum(r.status != 429 and r not in ok for r in results),
+        "ttfe p50": percentile(ttfe, 50) * 1000 if ttfe else float("nan"),
+        "ttfe p95": percentile(ttfe, 95) * 1000 if ttfe else float("nan"),
+        "tok/s p50": percentile(rates, 50) if rates else float("nan"),
+        "events/s": sum(r.events for r in results) / elapsed,
+        "cpu %": sampler.cpu_percent if psutil else float("nan"),
+        "rss MB": sampler.peak_rss / 1024 / 1024 if psutil else float("nan"),
+    }
+
+
+def server_env(llm_url: str, overrides: List[str]) -> Dict[str, str]:
+    env = dict(os.environ)
+    for prefix in ("BASIC", "REASONING", "VL"):
+        env[f"{prefix}_MODEL"] = MODEL
+        env[f"{prefix}_BASE_URL"] = llm_url
+        env[f"{prefix}_API_KEY"] = "fake"
+    env.setdefault("TAVILY_API_KEY", "fake")
+    for override in overrides:
+        key, _, value = override.partition("=")
+        env[key] = value
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--connections", default="1,10,50")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--reply-tokens", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        help="KEY=VALUE for the API server, e.g. MAX_CONCURRENT_WORKFLOWS=100",
+    )
+    args = parser.parse_args()
+    if psutil is None:
+        print("psutil is not installed, server CPU and RSS are not reported")
+
+    llm_port, api_port = free_port(), free_port()
+    llm_url = f"http://127.0.0.1:{llm_port}/v1"
+    api_url = f"http://127.0.0.1:{api_port}"
+    log = tempfile.NamedTemporaryFile(
+        "w", prefix="loadtest-", suffix=".log", delete=False
+    )
+    print(f"Server logs: {log.name}")
+    llm_command = [
+        sys.executable,
+        "-m",
+        "benchmarks.fake_openai_server",
+        f"--port={llm_port}",
+        f"--latency={args.latency}",
+        f"--tokens-per-second={args.tokens_per_second}",
+        f"--reply-tokens={args.reply_tokens}",
+    ]
+    api_command = [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "src.api.app:app",
+        "--host=127.0.0.1",
+        f"--port={api_port}",
+        "--log-level=warning",
+    ]
+    with (
+        running(llm_command, dict(os.environ), log) as llm,
+        running(api_command, server_env(llm_url, args.env), log) as api,
+    ):
+        wait_ready(f"{llm_url}/models", llm)
+        wait_ready(f"{api_url}/api/team_members", api)
+        columns = None
+        for connections in [int(c) for c in args.connections.split(",")]:
+            result = asyncio.run(run_level(api_url, api.pid, connections, args.timeout))
+            if columns is None:
+                columns = list(result)
+                print("".join(f"{c:>10}" for c in columns))
+            print(
+                "".join(
+                    (
+                        f"{result[c]:>10.1f}"
+                        if isinstance(result[c], float)
+                        else f"{result[c]:>10}"
+                    )
+                    for c in columns
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
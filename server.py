@@ -2,61 +2,64 @@
 Server script for running the DeepManus API.
 """
 
+import argparse
 import logging
-import uvicorn
-import sys
 import os
-import signal
-import atexit
 
-from src.playwright_manager import ensure_playwright_server, shutdown_playwright_server
-from src.llms.litellm_config import configure_litellm
+import uvicorn
+
+from src.config import SERVER_DRAIN_TIMEOUT, SERVER_WORKERS
+from src.utils.logging_setup import setup_logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
+# Configure logging, written by a background thread
+setup_logging()
 
 logger = logging.getLogger(__name__)
 
-def cleanup_resources():
-    """清理所有资源，确保程序正常退出"""
-    logger.info("正在关闭服务器并清理资源...")
-    shutdown_playwright_server()
-    logger.info("资源清理完成")
+# 流在 SERVER_DRAIN_TIMEOUT 后以错误事件结束，再多等几秒让它发送出去
+SHUTDOWN_GRACE = 5
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the DeepManus API server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=SERVER_WORKERS,
+        help="Worker processes (default: SERVER_WORKERS)",
+    )
+    parser.add_argument(
+        "--reload",
+        action="store_true",
+        help="Restart on code changes, for development, runs a single worker",
+    )
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
-    logger.info("Starting DeepManus API server")
-    
-    # 配置LiteLLM
-    configure_litellm()
-    
-    # 启动Playwright服务器
-    if not ensure_playwright_server():
-        logger.error("无法启动Playwright服务器，服务将无法使用浏览器功能")
-    
-    # 注册清理函数
-    atexit.register(cleanup_resources)
-    
-    # 处理信号以确保优雅关闭
-    for sig in [signal.SIGINT, signal.SIGTERM]:
-        if hasattr(signal, str(sig)):
-            signal.signal(sig, lambda sig, frame: cleanup_resources())
-    
-    # 启动服务器
-    reload = True
-    if sys.platform.startswith("win"):
-        reload = False
-    port = int(os.getenv("PORT", 8000))
-    
-    try:
-        uvicorn.run(
-            "src.api.app:app",
-            host="0.0.0.0",
-            port=port,
-            reload=reload,
-            log_level="info",
-        )
-    finally:
-        cleanup_resources()
+    args = parse_args()
+    if args.reload and args.workers > 1:
+        logger.warning("--reload runs a single worker, ignoring --workers")
+    logger.info(
+        f"Starting DeepManus API server on {args.host}:{args.port} "
+        f"({'reload' if args.reload else f'{args.workers} workers'})"
+    )
+
+    # 同一主机上的所有工作进程共享一个 Playwright 服务器，由第一个需要它的进程启动，
+    # 各进程通过 PLAYWRIGHT_STATE_DIR 中的锁文件和状态文件协调；lifespan 钩子只注销本进程，
+    # 最后一个停止的进程关闭服务器。
+    # SIGINT/SIGTERM 由 uvicorn 处理：停止接受连接，等待正在进行的流结束，
+    # 然后执行关闭钩子并退出
+    uvicorn.run(
+        "src.api.app:app",
+        host=args.host,
+        port=args.port,
+        reload=args.reload,
+        workers=None if args.reload else args.workers,
+        log_level="info",
+        # uvicorn's loggers propagate to the queue-based root handler
+        log_config=None,
+        timeout_graceful_shutdown=SERVER_DRAIN_TIMEOUT + SHUTDOWN_GRACE,
+    )
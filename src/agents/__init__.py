@@ -1,3 +1,3 @@
-from .agents import research_agent, coder_agent, browser_agent
+from .agents import research_agent, coder_agent, browser_agent, get_replay_agent
 
-__all__ = ["research_agent", "coder_agent", "browser_agent"]
+__all__ = ["research_agent", "coder_agent", "browser_agent", "get_replay_agent"]
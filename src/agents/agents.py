@@ -5,25 +5,46 @@ from src.tools import (
     bash_tool,
     browser_tool,
     crawl_tool,
+    multi_search_tool,
     python_repl_tool,
     tavily_tool,
 )
 
 from src.llms.llm import get_llm_by_type
 from src.config.agents import AGENT_LLM_MAP
+from src.utils.replay import replay_chat_model
 
 
 # Create agents using configured LLM types
-def create_agent(agent_type: str, tools: list, prompt_template: str):
+def create_agent(agent_type: str, tools: list, prompt_template: str, llm=None):
     """Factory function to create agents with consistent configuration."""
     return create_react_agent(
-        get_llm_by_type(AGENT_LLM_MAP[agent_type]),
+        llm or get_llm_by_type(AGENT_LLM_MAP[agent_type]),
         tools=tools,
         prompt=lambda state: apply_prompt_template(prompt_template, state),
     )
 
 
+AGENT_TOOLS = {
+    "researcher": [tavily_tool, multi_search_tool, crawl_tool],
+    "coder": [python_repl_tool, bash_tool],
+    "browser": [browser_tool],
+}
+
 # Create agents using the factory function
-research_agent = create_agent("researcher", [tavily_tool, crawl_tool], "researcher")
-coder_agent = create_agent("coder", [python_repl_tool, bash_tool], "coder")
-browser_agent = create_agent("browser", [browser_tool], "browser")
+research_agent = create_agent("researcher", AGENT_TOOLS["researcher"], "researcher")
+coder_agent = create_agent("coder", AGENT_TOOLS["coder"], "coder")
+browser_agent = create_agent("browser", AGENT_TOOLS["browser"], "browser")
+
+# The agents answering from a recording, created on the first replay
+_replay_agents = {}
+
+
+def get_replay_agent(agent_type: str):
+    """The agent of `agent_type` using the replay model, see src.utils.replay."""
+    agent = _replay_agents.get(agent_type)
+    if agent is None:
+        agent = _replay_agents[agent_type] = create_agent(
+            agent_type, AGENT_TOOLS[agent_type], agent_type, llm=replay_chat_model
+        )
+    return agent
@@ -0,0 +1,273 @@
+"""
+Admission control for workflows started through the API.
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from src.config import TEAM_MEMBERS
+from src.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+BROWSER_CLASS = "browser"
+DEFAULT_CLASS = "default"
+
+ADMISSION_WAIT = registry.histogram(
+    "deepmanus_admission_wait_seconds",
+    "Time requests waited for a workflow slot, admitted or rejected",
+    ["resource_class"],
+)
+
+
+def get_resource_class(team_members: Optional[List[str]]) -> str:
+    """Return "browser" for workflows that may start a browser, else "default"."""
+    members = team_members if team_members else TEAM_MEMBERS
+    return BROWSER_CLASS if "browser" in members else DEFAULT_CLASS
+
+
+class AdmissionRejected(Exception):
+    """Raised when a workflow cannot be admitted, the client should retry later."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Too many concurrent workflows ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class WorkflowSlot:
+    """A running workflow's place in the admission controller."""
+
+    def __init__(
+        self, controller: "AdmissionController", key: str, resource_class: str
+    ):
+        self.controller = controller
+        self.key = key
+        self.resource_class = resource_class
+        self.released = False
+
+    def release(self) -> None:
+        """Free the slot, releasing more than once has no effect."""
+        if not self.released:
+            self.released = True
+            self.controller._release(self)
+
+
+class _Waiter:
+    """A request waiting for a workflow slot."""
+
+    def __init__(self, key: str, resource_class: str, future: asyncio.Future):
+        self.key = key
+        self.resource_class = resource_class
+        self.future = future
+        self.admitted = False
+
+
+class AdmissionController:
+    """
+    Limit how many workflows run at once, in total, per API key and for the
+    browser resource class.
+
+    Requests over a limit wait up to `queue_timeout` seconds for a slot, and
+    released slots go to the waiting requests in arrival order. They are
+    rejected with AdmissionRejected when the wait times out, or right away
+    when `max_queue_size` requests are already waiting. A limit of 0 disables it.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_per_key: int,
+        max_browser: int,
+        max_queue_size: int,
+        queue_timeout: float,
+        retry_after: int,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_per_key = max_per_key
+        self.max_browser = max_browser
+        self.max_queue_size = max_queue_size
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._running = 0
+        self._running_by_key: Counter = Counter()
+        self._running_by_class: Counter = Counter()
+        self._waiters: List[_Waiter] = []
+        # 指标
+        self._admitted = 0
+        self._rejected: Counter = Counter()
+        self._wait_count = 0
+        self._wait_sum = 0.0
+        self._wait_max = 0.0
+
+    def _can_admit(self, key: str, resource_class: str) -> bool:
+        if self.max_concurrent and self._running >= self.max_concurrent:
+            return False
+        if self.max_per_key and self._running_by_key[key] >= self.max_per_key:
+            return False
+        if (
+            resource_class == BROWSER_CLASS
+            and self.max_browser
+            and self._running_by_class[BROWSER_CLASS] >= self.max_browser
+        ):
+            return False
+        return True
+
+    def _reject(self, reason: str, key: str) -> AdmissionRejected:
+        self._rejected[reason] += 1
+        logger.warning(f"Workflow rejected for key '{key}': {reason}")
+        return AdmissionRejected(reason, self.retry_after)
+
+    async def acquire(self, key: str, resource_class: str) -> WorkflowSlot:
+        """
+        Wait for a slot to run a workflow.
+
+        Args:
+            key: The API key the workflow is run for
+            resource_class: "browser" or "default", see get_resource_class
+
+        Returns:
+            WorkflowSlot: The slot, to be released when the workflow ends
+
+        Raises:
+            AdmissionRejected: If the wait queue is full or the wait timed out
+        """
+        start = time.monotonic()
+        # 释放的名额总是先交给可运行的等待者，此时仍有空位说明等待者都受其他限制
+        if self._can_admit(key, resource_class):
+            self._add_running(key, resource_class)
+            self._record_wait(time.monotonic() - start, resource_class)
+            return WorkflowSlot(self, key, resource_class)
+
+        if self.max_queue_size and len(self._waiters) >= self.max_queue_size:
+            raise self._reject("queue_full", key)
+
+        waiter = _Waiter(
+            key, resource_class, asyncio.get_running_loop().create_future()
+        )
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter.future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            # 超时与分配名额同时发生时，名额已经属于本请求
+            if not waiter.admitted:
+                self._record_wait(time.monotonic() - start, resource_class)
+                raise self._reject("timeout", key)
+        except asyncio.CancelledError:
+            if waiter.admitted:
+                # 调用方已离开，把分配到的名额交给下一个等待者
+                self._remove_running(key, resource_class)
+                self._dispatch()
+            raise
+        finally:
+            if not waiter.admitted:
+                self._waiters.remove(waiter)
+
+        self._record_wait(time.monotonic() - start, resource_class)
+        return WorkflowSlot(self, key, resource_class)
+
+    def _add_running(self, key: str, resource_class: str) -> None:
+        self._running += 1
+        self._running_by_key[key] += 1
+        self._running_by_class[resource_class] += 1
+        self._admitted += 1
+
+    def _remove_running(self, key: str, resource_class: str) -> None:
+        self._running -= 1
+        self._running_by_key[key] -= 1
+        if not self._running_by_key[key]:
+            del self._running_by_key[key]
+        self._running_by_class[resource_class] -= 1
+
+    def _release(self, slot: WorkflowSlot) -> None:
+        self._remove_running(slot.key, slot.resource_class)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Give free slots to the waiting requests the limits allow, oldest first."""
+        for waiter in list(self._waiters):
+            # 超时的等待者在其任务恢复运行前仍在队列中
+            if waiter.future.done():
+                continue
+            if not self._can_admit(waiter.key, waiter.resource_class):
+                continue
+            self._waiters.remove(waiter)
+            self._add_running(waiter.key, waiter.resource_class)
+            waiter.admitted = True
+            waiter.future.set_result(None)
+
+    def _record_wait(self, seconds: float, resource_class: str) -> None:
+        ADMISSION_WAIT.observe(seconds, resource_class)
+        self._wait_count += 1
+        self._wait_sum += seconds
+        self._wait_max = max(self._wait_max, seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the admission metrics.
+
+        Returns:
+            Dict[str, Any]: Running workflows by resource class, the queue depth,
+            admitted and rejected counts, and the time spent waiting for a slot
+        """
+        return {
+            "running": self._running,
+            "running_by_class": {
+                resource_class: self._running_by_class[resource_class]
+                for resource_class in (DEFAULT_CLASS, BROWSER_CLASS)
+            },
+            "queue_depth": len(self._waiters),
+            "admitted": self._admitted,
+            "rejected": dict(self._rejected),
+            "wait_seconds": {
+                "count": self._wait_count,
+                "sum": self._wait_sum,
+                "max": self._wait_max,
+            },
+        }
+
+
+def register_admission_metrics(controller: AdmissionController) -> None:
+    """
+    Export the controller's stats with the process metrics on every scrape.
+
+    Args:
+        controller: The admission controller of the API server
+    """
+    running = registry.gauge(
+        "deepmanus_admission_running",
+        "Admitted workflows by resource class",
+        ["resource_class"],
+    )
+    limit = registry.gauge(
+        "deepmanus_admission_limit",
+        "Maximum concurrent workflows by resource class",
+        ["resource_class"],
+    )
+    queue_depth = registry.gauge(
+        "deepmanus_admission_queue_depth", "Requests waiting for a workflow slot"
+    )
+    admitted = registry.counter(
+        "deepmanus_admission_admitted_total", "Requests given a workflow slot"
+    )
+    rejected = registry.counter(
+        "deepmanus_admission_rejected_total",
+        "Requests rejected with 429 by reason",
+        ["reason"],
+    )
+
+    def collect() -> None:
+        stats = controller.stats()
+        for resource_class, count in stats["running_by_class"].items():
+            running.set(count, resource_class)
+        limit.set(controller.max_concurrent, DEFAULT_CLASS)
+        limit.set(controller.max_browser, BROWSER_CLASS)
+        queue_depth.set(stats["queue_depth"])
+        admitted.set(stats["admitted"])
+        for reason, count in stats["rejected"].items():
+            rejected.set(count, reason)
+
+    registry.add_collector(collect)
@@ -2,39 +2,94 @@
 FastAPI application for DeepManus.
 """
 
-import json
 import logging
 import os
+from contextlib import asynccontextmanager
 from typing import Dict, List, Any, Optional, Union
 
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 from pydantic import BaseModel, Field
-from sse_starlette.sse import EventSourceResponse
+from starlette.background import BackgroundTask
 import asyncio
 from typing import AsyncGenerator, Dict, List, Any
 
 from src.graph import build_graph
-from src.config import TEAM_MEMBERS, TEAM_MEMBER_CONFIGRATIONS, BROWSER_HISTORY_DIR
+from src.config import (
+    TEAM_MEMBERS,
+    TEAM_MEMBER_CONFIGRATIONS,
+    BROWSER_HISTORY_DIR,
+    SSE_COALESCE_WINDOW_MS,
+    SSE_COALESCE_MAX_BYTES,
+    SSE_QUEUE_MAX_SIZE,
+    SSE_QUEUE_OVERFLOW_POLICY,
+    MAX_CONCURRENT_WORKFLOWS,
+    MAX_WORKFLOWS_PER_KEY,
+    MAX_BROWSER_WORKFLOWS,
+    ADMISSION_QUEUE_TIMEOUT,
+    ADMISSION_MAX_QUEUE_SIZE,
+    ADMISSION_RETRY_AFTER,
+    SERVER_DRAIN_TIMEOUT,
+    PLAYWRIGHT_SERVER_STARTUP,
+)
 from src.service.workflow_service import run_agent_workflow
-from src.playwright_manager import ensure_playwright_server
+from src.api.admission import (
+    AdmissionController,
+    AdmissionRejected,
+    register_admission_metrics,
+    get_resource_class,
+)
+from src.api.sse import (
+    DrainingEventSourceResponse,
+    coalesce_message_events,
+    encode_event,
+    shutting_down,
+)
+from src.playwright_manager import (
+    shutdown_playwright_server,
+    start_playwright_server_in_background,
+)
+from src.llms.http_client import aclose_http_clients
 from src.llms.litellm_config import configure_litellm
+from src.llms.usage import usage_tracker
+from src.tools.decorators import tool_stats_summary
+from src.tools.resources import close_all_workflow_resources
+from src.utils.metrics import registry
 
 # 配置LiteLLM
 configure_litellm()
 
-# 确保Playwright服务器已启动
-ensure_playwright_server()
-
 # Configure logging
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    启动和关闭本进程的共享资源，多工作进程时每个进程各执行一次
+
+    关闭钩子在正在进行的流结束（或超过 SERVER_DRAIN_TIMEOUT）之后才运行
+    """
+    # Playwright服务器默认在第一次执行浏览器任务时启动，不拖慢工作进程的启动
+    if PLAYWRIGHT_SERVER_STARTUP == "background":
+        start_playwright_server_in_background()
+    try:
+        yield
+    finally:
+        logger.info("正在关闭服务器并清理资源...")
+        await close_all_workflow_resources()
+        await aclose_http_clients()
+        await asyncio.to_thread(shutdown_playwright_server)
+        logger.info("资源清理完成")
+
+
 # Create FastAPI app
 app = FastAPI(
     title="DeepManus API",
     description="API for DeepManus LangGraph-based agent workflow",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -49,6 +104,17 @@ app.add_middleware(
 # Create the graph
 graph = build_graph()
 
+# 限制同时运行的工作流数量
+admission = AdmissionController(
+    max_concurrent=MAX_CONCURRENT_WORKFLOWS,
+    max_per_key=MAX_WORKFLOWS_PER_KEY,
+    max_browser=MAX_BROWSER_WORKFLOWS,
+    max_queue_size=ADMISSION_MAX_QUEUE_SIZE,
+    queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+    retry_after=ADMISSION_RETRY_AFTER,
+)
+register_admission_metrics(admission)
+
 
 class ContentItem(BaseModel):
     type: str = Field(..., description="The type of content (text, image, etc.)")
@@ -81,15 +147,16 @@ class ChatRequest(BaseModel):
 
 
 @app.post("/api/chat/stream")
-async def chat_stream(request: ChatRequest):
+async def chat_stream(request: ChatRequest, x_api_key: Optional[str] = Header(None)):
     """
     处理聊天请求的流式响应
-    
+
     Args:
         request: 聊天请求对象
-        
+        x_api_key: 调用方的 API Key，用于按调用方限制并发
+
     Returns:
-        EventSourceResponse: 事件流响应
+        DrainingEventSourceResponse: 事件流响应
     """
     try:
         # Convert Pydantic models to dictionaries and normalize content format
@@ -115,34 +182,67 @@ async def chat_stream(request: ChatRequest):
 
             messages.append(message_dict)
 
+        # 服务器正在关闭，新的工作流由其他实例处理
+        if shutting_down():
+            raise HTTPException(
+                status_code=503,
+                detail="Server is shutting down",
+                headers={"Retry-After": str(ADMISSION_RETRY_AFTER)},
+            )
+
+        # 等待工作流名额，超时或排队已满时返回 429
+        try:
+            slot = await admission.acquire(
+                x_api_key or "anonymous", get_resource_class(request.team_members)
+            )
+        except AdmissionRejected as e:
+            raise HTTPException(
+                status_code=429,
+                detail=str(e),
+                headers={"Retry-After": str(e.retry_after)},
+            )
+
         async def event_generator():
             try:
-                async for event in run_agent_workflow(
+                events = run_agent_workflow(
                     messages,
                     request.debug,
                     request.deep_thinking_mode,
                     request.search_before_planning,
                     request.team_members,
+                )
+                # 合并连续的消息增量，减少SSE帧数；慢速客户端使用有界队列
+                async for event in coalesce_message_events(
+                    events,
+                    window=SSE_COALESCE_WINDOW_MS / 1000,
+                    max_bytes=SSE_COALESCE_MAX_BYTES,
+                    max_queue_size=SSE_QUEUE_MAX_SIZE,
+                    overflow_policy=SSE_QUEUE_OVERFLOW_POLICY,
                 ):
-                    yield {
-                        "event": event["event"],
-                        "data": json.dumps(event["data"], ensure_ascii=False),
-                    }
+                    yield encode_event(event)
             except asyncio.CancelledError:
                 logger.info("流处理被取消")
                 raise
             except Exception as e:
                 logger.error(f"工作流中发生错误: {e}")
-                yield {
-                    "event": "error",
-                    "data": json.dumps({"error": str(e)}, ensure_ascii=False)
-                }
+                yield encode_event({"event": "error", "data": {"error": str(e)}})
+            finally:
+                slot.release()
 
-        return EventSourceResponse(
+        # 服务器关闭时让正在运行的工作流继续输出，超时后以错误事件结束
+        return DrainingEventSourceResponse(
             event_generator(),
             media_type="text/event-stream",
             sep="\n",
+            # 客户端在流开始前断开时也要释放名额
+            background=BackgroundTask(slot.release),
+            drain_timeout=SERVER_DRAIN_TIMEOUT,
+            final_event=encode_event(
+                {"event": "error", "data": {"error": "Server is shutting down"}}
+            ),
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"聊天端点发生错误: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -172,6 +272,52 @@ async def get_browser_history_file(filename: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/admission")
+async def get_admission_stats():
+    """
+    Get the admission control metrics.
+
+    Returns:
+        dict: Running workflows by resource class, queue depth, rejections and wait times
+    """
+    return admission.stats()
+
+
+@app.get("/api/usage")
+async def get_usage_summary():
+    """
+    Get the LLM usage of this server process.
+
+    Returns:
+        dict: Calls, tokens, cost, time to first token and latency by agent and model
+    """
+    return usage_tracker.summary()
+
+
+@app.get("/api/tool_stats")
+async def get_tool_stats():
+    """
+    Get the call statistics of the tools.
+
+    Returns:
+        dict: Calls, errors, durations and result sizes by tool name
+    """
+    return tool_stats_summary()
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Get the process metrics in the Prometheus text format.
+
+    Returns:
+        PlainTextResponse: Node, tool and LLM durations, workflows and browsers
+    """
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @app.get("/api/team_members")
 async def get_team_members():
     """
@@ -0,0 +1,324 @@
+"""
+Helpers for turning workflow events into server-sent events.
+"""
+
+import asyncio
+import contextlib
+import logging
+from collections import deque
+from typing import Any, AsyncGenerator, AsyncIterable, Dict, Optional, Tuple
+
+import anyio
+from sse_starlette.sse import AppStatus, EventSourceResponse, ensure_bytes
+from starlette.types import Message, Receive, Scope, Send
+
+from src.utils.json_utils import dumps_json
+
+logger = logging.getLogger(__name__)
+
+
+def encode_event(event: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Encode a workflow event as an SSE frame for EventSourceResponse.
+
+    Args:
+        event: A workflow event with "event" and "data" keys
+
+    Returns:
+        The SSE frame with the data serialised to JSON
+    """
+    return {"event": event["event"], "data": dumps_json(event["data"])}
+
+
+def _merge_key(event: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """Return (message_id, delta field) for text deltas that can be merged."""
+    if event.get("event") != "message":
+        return None
+    data = event["data"]
+    delta = data.get("delta") or {}
+    if len(delta) != 1:
+        return None
+    field, value = next(iter(delta.items()))
+    if not isinstance(value, str):
+        return None
+    return data.get("message_id"), field
+
+
+class _PendingDelta:
+    """Text deltas of one message waiting to be sent as a single frame."""
+
+    def __init__(self, key: Tuple[str, str], text: str, deadline: float):
+        self.key = key
+        self.parts = [text]
+        self.size = len(text)
+        self.deadline = deadline
+
+    def append(self, text: str) -> None:
+        self.parts.append(text)
+        self.size += len(text)
+
+    def to_event(self) -> Dict[str, Any]:
+        message_id, field = self.key
+        return {
+            "event": "message",
+            "data": {"message_id": message_id, "delta": {field: "".join(self.parts)}},
+        }
+
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "coalesce")
+
+
+class BoundedEventQueue:
+    """
+    A bounded queue of workflow events between the graph and the SSE client.
+
+    When the queue is full, `put` applies the overflow policy:
+
+    - block: wait until the client has read an event
+    - drop_oldest: discard the oldest queued message delta, blocking if there is none
+    - coalesce: append the delta to the last queued delta of the same message,
+      blocking for any other event
+    """
+
+    def __init__(self, maxsize: int, policy: str = "block"):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self.merged = 0
+        self._items: deque = deque()
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _full(self) -> bool:
+        return 0 < self.maxsize <= len(self._items)
+
+    def _drop_oldest_delta(self) -> bool:
+        for i, item in enumerate(self._items):
+            if isinstance(item, _PendingDelta) or _merge_key(item) is not None:
+                del self._items[i]
+                self.dropped += 1
+                return True
+        return False
+
+    def _merge_into_tail(self, event: Dict[str, Any]) -> bool:
+        key = _merge_key(event)
+        if key is None or not self._items:
+            return False
+        tail = self._items[-1]
+        if not isinstance(tail, _PendingDelta):
+            if _merge_key(tail) != key:
+                return False
+            tail = _PendingDelta(key, tail["data"]["delta"][key[1]], 0)
+            self._items[-1] = tail
+        elif tail.key != key:
+            return False
+        tail.append(event["data"]["delta"][key[1]])
+        self.merged += 1
+        return True
+
+    async def put(self, event: Any) -> None:
+        """Add an event, applying the overflow policy when the queue is full."""
+        while self._full():
+            if self.policy == "drop_oldest" and self._drop_oldest_delta():
+                break
+            if self.policy == "coalesce" and self._merge_into_tail(event):
+                return
+            self._not_full.clear()
+            await self._not_full.wait()
+        self._items.append(event)
+        self._not_empty.set()
+
+    def put_nowait(self, event: Any) -> None:
+        """Add an event ignoring the size limit, used for end of stream markers."""
+        self._items.append(event)
+        self._not_empty.set()
+
+    def get_nowait(self) -> Any:
+        """Remove and return an event, raising asyncio.QueueEmpty if there is none."""
+        if not self._items:
+            raise asyncio.QueueEmpty
+        item = self._items.popleft()
+        if not self._items:
+            self._not_empty.clear()
+        self._not_full.set()
+        return item.to_event() if isinstance(item, _PendingDelta) else item
+
+    async def get(self) -> Any:
+        """Remove and return an event, waiting until one is available."""
+        while not self._items:
+            await self._not_empty.wait()
+        return self.get_nowait()
+
+
+_END_OF_STREAM = object()
+
+
+async def _pump(
+    events: AsyncIterable[Dict[str, Any]], queue: BoundedEventQueue
+) -> None:
+    """Move events from the workflow into the queue, ending with a marker."""
+    try:
+        # Close the workflow in this task when it is cancelled, so its context
+        # managers exit in the context they were entered in
+        async with contextlib.aclosing(events):
+            async for event in events:
+                await queue.put(event)
+    except Exception as e:
+        queue.put_nowait(e)
+    queue.put_nowait(_END_OF_STREAM)
+
+
+async def coalesce_message_events(
+    events: AsyncIterable[Dict[str, Any]],
+    window: float,
+    max_bytes: int,
+    max_queue_size: int = 0,
+    overflow_policy: str = "block",
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Merge consecutive message deltas of the same message into fewer events.
+
+    Deltas are held back for at most `window` seconds, or until `max_bytes`
+    characters have accumulated. Any other event flushes the pending deltas
+    first, so the event order is preserved.
+
+    The workflow is read by a separate task into a queue of at most
+    `max_queue_size` events, so a slow client does not let events pile up
+    without bound. See BoundedEventQueue for the overflow policies.
+
+    Args:
+        events: The workflow events
+        window: Maximum time in seconds a delta is held back, 0 disables merging
+        max_bytes: Flush once the merged delta reaches this size, 0 for no limit
+        max_queue_size: Maximum number of queued events, 0 for no limit
+        overflow_policy: One of "block", "drop_oldest" or "coalesce"
+
+    Yields:
+        Dict[str, Any]: The workflow events with merged deltas
+    """
+    queue = BoundedEventQueue(max_queue_size, overflow_policy)
+    if window <= 0 and max_queue_size <= 0:
+        async with contextlib.aclosing(events):
+            async for event in events:
+                yield event
+        return
+
+    loop = asyncio.get_running_loop()
+    producer = asyncio.create_task(_pump(events, queue))
+    pending: Optional[_PendingDelta] = None
+    try:
+        while True:
+            # Drain whatever is already queued without suspending
+            try:
+                event = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                if pending is None:
+                    event = await queue.get()
+                else:
+                    timeout = pending.deadline - loop.time()
+                    try:
+                        event = await asyncio.wait_for(queue.get(), max(timeout, 0))
+                    except asyncio.TimeoutError:
+                        yield pending.to_event()
+                        pending = None
+                        continue
+
+            if event is _END_OF_STREAM:
+                break
+            if isinstance(event, Exception):
+                raise event
+
+            key = _merge_key(event) if window > 0 else None
+            if pending is not None and key == pending.key:
+                pending.append(event["data"]["delta"][key[1]])
+            else:
+                if pending is not None:
+                    yield pending.to_event()
+                    pending = None
+                if key is None:
+                    yield event
+                    continue
+                pending = _PendingDelta(
+                    key, event["data"]["delta"][key[1]], loop.time() + window
+                )
+            if max_bytes and pending.size >= max_bytes:
+                yield pending.to_event()
+                pending = None
+
+        if pending is not None:
+            yield pending.to_event()
+    finally:
+        producer.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await producer
+        if queue.dropped or queue.merged:
+            logger.info(
+                f"Slow SSE client: dropped {queue.dropped} and merged {queue.merged} "
+                "queued message events"
+            )
+
+
+def shutting_down() -> bool:
+    """Whether the server has received SIGINT or SIGTERM."""
+    return AppStatus.should_exit
+
+
+class DrainingEventSourceResponse(EventSourceResponse):
+    """
+    An EventSourceResponse that lets a running stream finish on server shutdown.
+
+    EventSourceResponse ends every stream as soon as uvicorn receives SIGINT or
+    SIGTERM, cutting off running workflows. Here the stream goes on for up to
+    `drain_timeout` seconds after the signal. If it has not finished by then,
+    it is cancelled and ends with `final_event`, so the client knows to retry.
+    Uvicorn stops accepting connections meanwhile and waits for open ones to
+    close (timeout_graceful_shutdown) before the lifespan shutdown runs.
+    """
+
+    def __init__(
+        self, *args, drain_timeout: float, final_event: Any = None, **kwargs
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.drain_timeout = drain_timeout
+        self.final_event = final_event
+        self._drain_scope = anyio.CancelScope()
+        self._started = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        async def tracking_send(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                self._started = True
+            await send(message)
+
+        await super().__call__(scope, receive, tracking_send)
+
+    async def _stream_response(self, send: Send) -> None:
+        with self._drain_scope:
+            await super()._stream_response(send)
+        if not self._drain_scope.cancelled_caught or not self._started:
+            return
+        logger.info("Server is shutting down, ending the event stream")
+        async with self._send_lock:
+            self.active = False
+            if self.final_event is not None:
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": ensure_bytes(self.final_event, self.sep),
+                        "more_body": True,
+                    }
+                )
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _listen_for_exit_signal(self) -> None:
+        await EventSourceResponse._listen_for_exit_signal()
+        await anyio.sleep(self.drain_timeout)
+        # Ending the stream stops the other tasks of the response
+        self._drain_scope.cancel()
+        await anyio.sleep_forever()
@@ -24,8 +24,50 @@ from .env import (
     CHROME_PROXY_SERVER,
     CHROME_PROXY_USERNAME,
     CHROME_PROXY_PASSWORD,
+    PLAYWRIGHT_SERVER_STARTUP,
+    PLAYWRIGHT_SERVER_TIMEOUT,
+    PLAYWRIGHT_HEALTH_INTERVAL,
+    PLAYWRIGHT_STATE_DIR,
+    BROWSER_SCREENSHOT_MAX_WIDTH,
+    BROWSER_SCREENSHOT_FORMAT,
+    BROWSER_SCREENSHOT_QUALITY,
+    BROWSER_SCREENSHOT_SKIP_DISTANCE,
+    # SSE streaming
+    SSE_COALESCE_WINDOW_MS,
+    SSE_COALESCE_MAX_BYTES,
+    SSE_QUEUE_MAX_SIZE,
+    SSE_QUEUE_OVERFLOW_POLICY,
+    # Admission control
+    MAX_CONCURRENT_WORKFLOWS,
+    MAX_WORKFLOWS_PER_KEY,
+    MAX_BROWSER_WORKFLOWS,
+    ADMISSION_QUEUE_TIMEOUT,
+    ADMISSION_MAX_QUEUE_SIZE,
+    ADMISSION_RETRY_AFTER,
+    SERVER_WORKERS,
+    SERVER_DRAIN_TIMEOUT,
+    # LLM HTTP clients
+    LLM_HTTP_MAX_CONNECTIONS,
+    LLM_HTTP_MAX_KEEPALIVE,
+    LLM_HTTP_KEEPALIVE_EXPIRY,
+    LLM_HTTP2,
+    LLM_STREAM_USAGE,
+    TRACING_ENABLED,
+    TRACING_EXPORTER,
+    TRACING_FILE,
+    TRACING_OTLP_ENDPOINT,
+    TRACING_SAMPLE_RATE,
+    LOG_LEVEL,
+    LOG_FORMAT,
+    LOG_QUEUE_SIZE,
+    WORKFLOW_RECORD_DIR,
+)
+from .tools import (
+    TAVILY_MAX_RESULTS,
+    MULTI_SEARCH_MAX_QUERIES,
+    MULTI_SEARCH_MAX_RESULTS,
+    BROWSER_HISTORY_DIR,
 )
-from .tools import TAVILY_MAX_RESULTS, BROWSER_HISTORY_DIR
 from .loader import load_yaml_config
 
 # Team configuration
@@ -93,12 +135,48 @@ __all__ = [
     "TEAM_MEMBERS",
     "TEAM_MEMBER_CONFIGRATIONS",
     "TAVILY_MAX_RESULTS",
+    "MULTI_SEARCH_MAX_QUERIES",
+    "MULTI_SEARCH_MAX_RESULTS",
     "CHROME_INSTANCE_PATH",
     "CHROME_HEADLESS",
     "CHROME_PROXY_SERVER",
     "CHROME_PROXY_USERNAME",
     "CHROME_PROXY_PASSWORD",
+    "PLAYWRIGHT_SERVER_STARTUP",
+    "PLAYWRIGHT_SERVER_TIMEOUT",
+    "PLAYWRIGHT_HEALTH_INTERVAL",
+    "PLAYWRIGHT_STATE_DIR",
+    "BROWSER_SCREENSHOT_MAX_WIDTH",
+    "BROWSER_SCREENSHOT_FORMAT",
+    "BROWSER_SCREENSHOT_QUALITY",
+    "BROWSER_SCREENSHOT_SKIP_DISTANCE",
     "BROWSER_HISTORY_DIR",
+    "SSE_COALESCE_WINDOW_MS",
+    "SSE_COALESCE_MAX_BYTES",
+    "SSE_QUEUE_MAX_SIZE",
+    "SSE_QUEUE_OVERFLOW_POLICY",
+    "MAX_CONCURRENT_WORKFLOWS",
+    "MAX_WORKFLOWS_PER_KEY",
+    "MAX_BROWSER_WORKFLOWS",
+    "ADMISSION_QUEUE_TIMEOUT",
+    "ADMISSION_MAX_QUEUE_SIZE",
+    "ADMISSION_RETRY_AFTER",
+    "SERVER_WORKERS",
+    "SERVER_DRAIN_TIMEOUT",
+    "LLM_HTTP_MAX_CONNECTIONS",
+    "LLM_HTTP_MAX_KEEPALIVE",
+    "LLM_HTTP_KEEPALIVE_EXPIRY",
+    "LLM_HTTP2",
+    "LLM_STREAM_USAGE",
+    "TRACING_ENABLED",
+    "TRACING_EXPORTER",
+    "TRACING_FILE",
+    "TRACING_OTLP_ENDPOINT",
+    "TRACING_SAMPLE_RATE",
+    "LOG_LEVEL",
+    "LOG_FORMAT",
+    "LOG_QUEUE_SIZE",
+    "WORKFLOW_RECORD_DIR",
     # Azure configurations
     "AZURE_API_BASE",
     "AZURE_API_KEY",
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -34,3 +35,87 @@ CHROME_HEADLESS = os.getenv("CHROME_HEADLESS", "False") == "True"
 CHROME_PROXY_SERVER = os.getenv("CHROME_PROXY_SERVER")
 CHROME_PROXY_USERNAME = os.getenv("CHROME_PROXY_USERNAME")
 CHROME_PROXY_PASSWORD = os.getenv("CHROME_PROXY_PASSWORD")
+
+# Playwright server: "lazy" starts it on the first browser task, "background"
+# starts it in a background thread when a server worker starts
+PLAYWRIGHT_SERVER_STARTUP = os.getenv("PLAYWRIGHT_SERVER_STARTUP", "lazy")
+# Seconds to wait for the server to accept connections
+PLAYWRIGHT_SERVER_TIMEOUT = float(os.getenv("PLAYWRIGHT_SERVER_TIMEOUT", "30"))
+# Seconds between health checks of the server, it is restarted when it stops responding
+PLAYWRIGHT_HEALTH_INTERVAL = float(os.getenv("PLAYWRIGHT_HEALTH_INTERVAL", "10"))
+# Directory holding the lock and PID files of the server shared by the workers on a host,
+# deployments with different browser settings need separate directories
+PLAYWRIGHT_STATE_DIR = os.getenv(
+    "PLAYWRIGHT_STATE_DIR", os.path.join(tempfile.gettempdir(), "deepmanus-playwright")
+)
+
+# Screenshots the browser agent sends to the vision model: downscaled to this width and
+# re-encoded as jpeg, webp or png at this quality. The last image sent is sent again
+# without re-encoding when the pixels are identical, or when the perceptual hash differs
+# by at most SKIP_DISTANCE of 64 bits (-1 reuses it only for identical pixels)
+BROWSER_SCREENSHOT_MAX_WIDTH = int(os.getenv("BROWSER_SCREENSHOT_MAX_WIDTH", "1024"))
+BROWSER_SCREENSHOT_FORMAT = os.getenv("BROWSER_SCREENSHOT_FORMAT", "jpeg")
+BROWSER_SCREENSHOT_QUALITY = int(os.getenv("BROWSER_SCREENSHOT_QUALITY", "70"))
+BROWSER_SCREENSHOT_SKIP_DISTANCE = int(
+    os.getenv("BROWSER_SCREENSHOT_SKIP_DISTANCE", "-1")
+)
+
+# SSE streaming configuration
+# Consecutive message deltas are merged for up to this many milliseconds (0 disables)
+SSE_COALESCE_WINDOW_MS = int(os.getenv("SSE_COALESCE_WINDOW_MS", "30"))
+# A merged delta is flushed as soon as it reaches this many characters
+SSE_COALESCE_MAX_BYTES = int(os.getenv("SSE_COALESCE_MAX_BYTES", "4096"))
+# Maximum number of events queued for a slow client (0 for no limit)
+SSE_QUEUE_MAX_SIZE = int(os.getenv("SSE_QUEUE_MAX_SIZE", "256"))
+# What to do when the queue is full: block, drop_oldest or coalesce
+SSE_QUEUE_OVERFLOW_POLICY = os.getenv("SSE_QUEUE_OVERFLOW_POLICY", "coalesce")
+
+# Admission control for /api/chat/stream
+# Maximum number of workflows running at once, and per API key (X-API-Key header)
+MAX_CONCURRENT_WORKFLOWS = int(os.getenv("MAX_CONCURRENT_WORKFLOWS", "8"))
+MAX_WORKFLOWS_PER_KEY = int(os.getenv("MAX_WORKFLOWS_PER_KEY", "2"))
+# Workflows that may use the browser each start a Chrome instance
+MAX_BROWSER_WORKFLOWS = int(os.getenv("MAX_BROWSER_WORKFLOWS", "2"))
+# Requests wait at most this many seconds for a slot, with at most this many waiting
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+ADMISSION_MAX_QUEUE_SIZE = int(os.getenv("ADMISSION_MAX_QUEUE_SIZE", "32"))
+# Retry-After header (seconds) sent with 429 responses
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "10"))
+
+# API server (server.py): worker processes, each with its own admission limits,
+# and seconds running chat streams get to finish after SIGTERM before they are ended
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1"))
+SERVER_DRAIN_TIMEOUT = float(os.getenv("SERVER_DRAIN_TIMEOUT", "30"))
+
+# Shared HTTP connection pools for the LLM clients, one per API host
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100"))
+LLM_HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20"))
+# Seconds an idle connection is kept open
+LLM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "60"))
+# Use HTTP/2 when the h2 package is installed
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "True") == "True"
+
+# Ask the OpenAI and Azure APIs to report token usage for streamed responses,
+# otherwise the usage accounting estimates the tokens
+LLM_STREAM_USAGE = os.getenv("LLM_STREAM_USAGE", "True") == "True"
+
+# OpenTelemetry tracing, one trace per workflow (needs opentelemetry-sdk)
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "False") == "True"
+# Exporter: file (JSON lines in TRACING_FILE) or otlp (OTLP/HTTP to the endpoint)
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "file")
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.jsonl")
+TRACING_OTLP_ENDPOINT = os.getenv(
+    "TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"
+)
+# Fraction of workflows traced
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "1.0"))
+
+# Logging: root level, text or json output, and the number of records buffered
+# for the background writer thread (records are dropped when it is full)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Record every workflow's LLM responses and tool results to this directory, one
+# gzipped JSON file per workflow, for offline replay (empty disables recording)
+WORKFLOW_RECORD_DIR = os.getenv("WORKFLOW_RECORD_DIR", "")
@@ -19,6 +19,11 @@ def process_dict(config: Dict[str, Any]) -> Dict[str, Any]:
     for key, value in config.items():
         if isinstance(value, dict):
             result[key] = process_dict(value)
+        elif isinstance(value, list):
+            result[key] = [
+                process_dict(item) if isinstance(item, dict) else replace_env_vars(item)
+                for item in value
+            ]
         elif isinstance(value, str):
             result[key] = replace_env_vars(value)
         else:
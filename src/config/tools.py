@@ -1,4 +1,8 @@
 # Tool configuration
 TAVILY_MAX_RESULTS = 5
 
+# Multi-query search configuration
+MULTI_SEARCH_MAX_QUERIES = 5
+MULTI_SEARCH_MAX_RESULTS = 10
+
 BROWSER_HISTORY_DIR = "static/browser_history"
@@ -1,9 +1,20 @@
 import sys
+import time
+
+from src.utils.metrics import registry
+from src.utils.tracing import span
 
 from .article import Article
 from .jina_client import WebClient
 from .readability_extractor import ReadabilityExtractor
 
+CRAWL_DURATION = registry.histogram(
+    "deepmanus_crawl_duration_seconds", "Duration of page crawls", ["outcome"]
+)
+CRAWL_BYTES = registry.counter(
+    "deepmanus_crawl_html_bytes_total", "HTML bytes downloaded by the crawler"
+)
+
 
 class Crawler:
     def crawl(self, url: str) -> Article:
@@ -18,13 +29,23 @@ class Crawler:
         """
         # 使用WebClient获取网页内容
         web_client = WebClient()
-        html = web_client.crawl(url, return_format="html")
-        
-        # 使用ReadabilityExtractor提取文章内容
-        extractor = ReadabilityExtractor()
-        article = extractor.extract_article(html)
-        article.url = url
-        return article
+        with span("crawl", {"url.full": url}) as crawl_span:
+            start = time.perf_counter()
+            try:
+                html = web_client.crawl(url, return_format="html")
+            except BaseException:
+                CRAWL_DURATION.observe(time.perf_counter() - start, "error")
+                raise
+            CRAWL_DURATION.observe(time.perf_counter() - start, "ok")
+            CRAWL_BYTES.inc(amount=len(html))
+            crawl_span.set_attribute("http.response.body.size", len(html))
+
+            # 使用ReadabilityExtractor提取文章内容
+            extractor = ReadabilityExtractor()
+            article = extractor.extract_article(html)
+            article.url = url
+            crawl_span.set_attribute("crawl.article_size", len(article.html_content))
+            return article
 
 
 if __name__ == "__main__":
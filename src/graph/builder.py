@@ -1,5 +1,12 @@
+import functools
+from typing import Callable
+
+from langgraph.config import get_config
 from langgraph.graph import StateGraph, START
 
+from src.utils.metrics import registry
+from src.utils.tracing import NOOP_SPAN, get_tracer, get_workflow_span, span
+
 from .types import State
 from .nodes import (
     supervisor_node,
@@ -11,16 +18,43 @@ from .nodes import (
     planner_node,
 )
 
+NODE_DURATION = registry.histogram(
+    "deepmanus_node_duration_seconds", "Duration of graph node runs", ["node"]
+)
+
+
+def _node_span(name: str):
+    if get_tracer() is None:
+        return NOOP_SPAN
+    # 节点的 span 属于其工作流的 trace
+    workflow_id = get_config().get("metadata", {}).get("workflow_id")
+    return span(
+        f"node {name}",
+        {"langgraph.node": name, "workflow_id": workflow_id or ""},
+        parent=get_workflow_span(workflow_id),
+    )
+
+
+def _instrumented(name: str, node: Callable) -> Callable:
+    """Wrap a node to record its duration and trace it."""
+
+    @functools.wraps(node)
+    def wrapper(*args, **kwargs):
+        with NODE_DURATION.time(name), _node_span(name):
+            return node(*args, **kwargs)
+
+    return wrapper
+
 
 def build_graph():
     """Build and return the agent workflow graph."""
     builder = StateGraph(State)
     builder.add_edge(START, "coordinator")
-    builder.add_node("coordinator", coordinator_node)
-    builder.add_node("planner", planner_node)
-    builder.add_node("supervisor", supervisor_node)
-    builder.add_node("researcher", research_node)
-    builder.add_node("coder", code_node)
-    builder.add_node("browser", browser_node)
-    builder.add_node("reporter", reporter_node)
+    builder.add_node("coordinator", _instrumented("coordinator", coordinator_node))
+    builder.add_node("planner", _instrumented("planner", planner_node))
+    builder.add_node("supervisor", _instrumented("supervisor", supervisor_node))
+    builder.add_node("researcher", _instrumented("researcher", research_node))
+    builder.add_node("coder", _instrumented("coder", code_node))
+    builder.add_node("browser", _instrumented("browser", browser_node))
+    builder.add_node("reporter", _instrumented("reporter", reporter_node))
     return builder.compile()
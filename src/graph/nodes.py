@@ -1,38 +1,103 @@
 import logging
 import json
-import json_repair
-import logging
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
 from copy import deepcopy
 from typing import Literal
 from langchain_core.messages import HumanMessage, BaseMessage
 
-import json_repair
 from langchain_core.messages import HumanMessage
+from langgraph.config import get_stream_writer
 from langgraph.types import Command
 
-from src.agents import research_agent, coder_agent, browser_agent
+from src.agents import research_agent, coder_agent, browser_agent, get_replay_agent
 from src.llms.llm import get_llm_by_type
 from src.config import TEAM_MEMBERS
 from src.config.agents import AGENT_LLM_MAP
 from src.prompts.template import apply_prompt_template
 from src.tools.search import tavily_tool
-from src.utils.json_utils import repair_json_output
+from src.utils.json_utils import repair_json_output, PlanStreamParser
+from src.utils.replay import current_replay
 from .types import State, Router
 
 logger = logging.getLogger(__name__)
 
+HANDOFF_TO_PLANNER = "handoff_to_planner"
+
 RESPONSE_FORMAT = "Response from {}:\n\n<response>\n{}\n</response>\n\n*Please execute the next step.*"
 
 
+def detect_handoff(content: str) -> bool | None:
+    """
+    Decide from the beginning of a coordinator reply whether it hands off to the planner.
+
+    Args:
+        content: The coordinator reply received so far
+
+    Returns:
+        True for a handoff, False for a plain reply, None while still undecided
+    """
+    head = content.lstrip().lstrip("`")
+    if head.startswith(HANDOFF_TO_PLANNER):
+        return True
+    if HANDOFF_TO_PLANNER.startswith(head):
+        return None
+    return False
+
+
+def _stream_coordinator(llm, messages: list) -> str:
+    """Stream the coordinator reply, cancelling the generation once it hands off."""
+    chunks = []
+    is_handoff = None
+    stream = llm.stream(messages)
+    try:
+        for chunk in stream:
+            chunks.append(chunk.content)
+            if is_handoff is None:
+                is_handoff = detect_handoff("".join(chunks))
+                if is_handoff:
+                    logger.info("Coordinator handed off to planner, stop generating")
+                    break
+    finally:
+        stream.close()
+    return "".join(chunks)
+
+
+def _dispatch_plan_step(step: dict, index: int) -> None:
+    """Publish a completed plan step to the event stream while planning continues."""
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        # Not running inside a graph, there is no event stream to publish to
+        return
+    writer({"event": "plan_step", "data": {"index": index, "step": step}})
+
+
+def _agent(agent, agent_type: str):
+    """The agent to run, or its replay copy when a recording is being replayed."""
+    if current_replay() is not None:
+        return get_replay_agent(agent_type)
+    return agent
+
+
+def _consume_search(future: Future) -> list | str | None:
+    """Wait for a speculative search, returning None if it failed."""
+    try:
+        return future.result()
+    except Exception as e:
+        logger.error(f"Speculative search before planning failed: {e}")
+        return None
+
+
 def research_node(state: State) -> Command[Literal["supervisor"]]:
     """Node for the researcher agent that performs research tasks."""
     logger.info("Research agent starting task")
-    result = research_agent.invoke(state)
+    result = _agent(research_agent, "researcher").invoke(state)
     logger.info("Research agent completed task")
     response_content = result["messages"][-1].content
     # 尝试修复可能的JSON输出
     response_content = repair_json_output(response_content)
-    logger.debug(f"Research agent response: {response_content}")
+    logger.debug("Research agent response: %s", response_content)
     return Command(
         update={
             "messages": [
@@ -49,12 +114,12 @@ def research_node(state: State) -> Command[Literal["supervisor"]]:
 def code_node(state: State) -> Command[Literal["supervisor"]]:
     """Node for the coder agent that executes Python code."""
     logger.info("Code agent starting task")
-    result = coder_agent.invoke(state)
+    result = _agent(coder_agent, "coder").invoke(state)
     logger.info("Code agent completed task")
     response_content = result["messages"][-1].content
     # 尝试修复可能的JSON输出
     response_content = repair_json_output(response_content)
-    logger.debug(f"Code agent response: {response_content}")
+    logger.debug("Code agent response: %s", response_content)
     return Command(
         update={
             "messages": [
@@ -71,12 +136,12 @@ def code_node(state: State) -> Command[Literal["supervisor"]]:
 def browser_node(state: State) -> Command[Literal["supervisor"]]:
     """Node for the browser agent that performs web browsing tasks."""
     logger.info("Browser agent starting task")
-    result = browser_agent.invoke(state)
+    result = _agent(browser_agent, "browser").invoke(state)
     logger.info("Browser agent completed task")
     response_content = result["messages"][-1].content
     # 尝试修复可能的JSON输出
     response_content = repair_json_output(response_content)
-    logger.debug(f"Browser agent response: {response_content}")
+    logger.debug("Browser agent response: %s", response_content)
     return Command(
         update={
             "messages": [
@@ -105,8 +170,8 @@ def supervisor_node(state: State) -> Command[Literal[*TEAM_MEMBERS, "__end__"]]:
         .invoke(messages)
     )
     goto = response["next"]
-    logger.debug(f"Current state messages: {state['messages']}")
-    logger.debug(f"Supervisor response: {response}")
+    logger.debug("Current state messages: %s", state["messages"])
+    logger.debug("Supervisor response: %s", response)
 
     if goto == "FINISH":
         goto = "__end__"
@@ -126,7 +191,12 @@ def planner_node(state: State) -> Command[Literal["supervisor", "__end__"]]:
     if state.get("deep_thinking_mode"):
         llm = get_llm_by_type("reasoning")
     if state.get("search_before_planning"):
-        searched_content = tavily_tool.invoke({"query": state["messages"][-1].content})
+        # 优先使用协调器阶段预先发起的搜索结果
+        searched_content = state.get("search_results")
+        if searched_content is None:
+            searched_content = tavily_tool.invoke(
+                {"query": state["messages"][-1].content}
+            )
         if isinstance(searched_content, list):
             messages = deepcopy(messages)
             messages[
@@ -136,24 +206,19 @@ def planner_node(state: State) -> Command[Literal["supervisor", "__end__"]]:
             logger.error(
                 f"Tavily search returned malformed response: {searched_content}"
             )
-    stream = llm.stream(messages)
-    full_response = ""
-    for chunk in stream:
-        full_response += chunk.content
-    logger.debug(f"Current state messages: {state['messages']}")
-    logger.debug(f"Planner response: {full_response}")
-
-    if full_response.startswith("```json"):
-        full_response = full_response.removeprefix("```json")
-
-    if full_response.endswith("```"):
-        full_response = full_response.removesuffix("```")
+    # 增量解析计划，每个步骤完成后立即发出事件
+    parser = PlanStreamParser()
+    for chunk in llm.stream(messages):
+        for step in parser.feed(chunk.content):
+            logger.info(f"Planner finished step: {step.get('title')}")
+            _dispatch_plan_step(step, len(parser.steps) - 1)
+    logger.debug("Current state messages: %s", state["messages"])
+    logger.debug("Planner response: %s", parser.text)
 
+    # 步骤已在流式解析中提取，这里只做严格校验，解析失败时才修复整个计划
+    full_response = repair_json_output(parser.text)
     goto = "supervisor"
-    try:
-        repaired_response = json_repair.loads(full_response)
-        full_response = json.dumps(repaired_response)
-    except json.JSONDecodeError:
+    if not full_response.startswith(("{", "[")):
         logger.warning("Planner response is not a valid JSON")
         goto = "__end__"
 
@@ -170,21 +235,43 @@ def coordinator_node(state: State) -> Command[Literal["planner", "__end__"]]:
     """Coordinator node that communicate with customers."""
     logger.info("Coordinator talking.")
     messages = apply_prompt_template("coordinator", state)
-    response = get_llm_by_type(AGENT_LLM_MAP["coordinator"]).invoke(messages)
-    logger.debug(f"Current state messages: {state['messages']}")
-    response_content = response.content
+    # Speculatively start the planner's search while the coordinator is thinking
+    search_executor = None
+    search_future = None
+    if state.get("search_before_planning"):
+        search_executor = ThreadPoolExecutor(max_workers=1)
+        # 在当前上下文中搜索，使其属于本工作流的 trace、日志和录制
+        search_future = search_executor.submit(
+            contextvars.copy_context().run,
+            tavily_tool.invoke,
+            {"query": state["messages"][-1].content},
+        )
+    try:
+        response_content = _stream_coordinator(
+            get_llm_by_type(AGENT_LLM_MAP["coordinator"]), messages
+        )
+    finally:
+        if search_executor:
+            search_executor.shutdown(wait=False)
+    logger.debug("Current state messages: %s", state["messages"])
     # 尝试修复可能的JSON输出
     response_content = repair_json_output(response_content)
-    logger.debug(f"Coordinator response: {response_content}")
+    logger.debug("Coordinator response: %s", response_content)
 
     goto = "__end__"
-    if "handoff_to_planner" in response_content:
+    if HANDOFF_TO_PLANNER in response_content:
         goto = "planner"
 
-    # 更新response.content为修复后的内容
-    response.content = response_content
+    update = {}
+    if search_future:
+        if goto == "planner":
+            update["search_results"] = _consume_search(search_future)
+        else:
+            # No planning will happen, discard the speculative search
+            search_future.cancel()
 
     return Command(
+        update=update,
         goto=goto,
     )
 
@@ -194,11 +281,11 @@ def reporter_node(state: State) -> Command[Literal["supervisor"]]:
     logger.info("Reporter write final report")
     messages = apply_prompt_template("reporter", state)
     response = get_llm_by_type(AGENT_LLM_MAP["reporter"]).invoke(messages)
-    logger.debug(f"Current state messages: {state['messages']}")
+    logger.debug("Current state messages: %s", state["messages"])
     response_content = response.content
     # 尝试修复可能的JSON输出
     response_content = repair_json_output(response_content)
-    logger.debug(f"reporter response: {response_content}")
+    logger.debug("reporter response: %s", response_content)
 
     return Command(
         update={
@@ -26,3 +26,4 @@ class State(MessagesState):
     full_plan: str
     deep_thinking_mode: bool
     search_before_planning: bool
+    search_results: list[dict] | str | None
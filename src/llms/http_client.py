@@ -0,0 +1,145 @@
+"""
+Shared HTTP clients for the LLM providers.
+
+Every LLM client built by get_llm_by_type reuses one connection pool per base
+URL, so concurrent workflows share warm keep-alive connections instead of
+opening a new TLS connection for each client.
+"""
+
+import asyncio
+import importlib.util
+import logging
+import threading
+import weakref
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from src.config import (
+    LLM_HTTP_MAX_CONNECTIONS,
+    LLM_HTTP_MAX_KEEPALIVE,
+    LLM_HTTP_KEEPALIVE_EXPIRY,
+    LLM_HTTP2,
+)
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional h2 package (pip install httpx[http2])
+HTTP2_ENABLED = LLM_HTTP2 and importlib.util.find_spec("h2") is not None
+
+# The SDKs pass their own timeout with every request, this is only the fallback
+DEFAULT_TIMEOUT = httpx.Timeout(120.0, connect=10.0)
+
+_lock = threading.Lock()
+_clients: Dict[str, httpx.Client] = {}
+_async_clients: Dict[str, httpx.AsyncClient] = {}
+_async_transports: Dict[str, "_LoopLocalTransport"] = {}
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=LLM_HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def _client_key(base_url: Optional[str]) -> str:
+    """Clients are shared by all base URLs with the same scheme, host and port."""
+    if not base_url:
+        return ""
+    parts = urlsplit(base_url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+class _LoopLocalTransport(httpx.AsyncBaseTransport):
+    """
+    An async transport with a connection pool per event loop.
+
+    Connections cannot be shared between event loops, and the browser agent
+    runs its LLM calls in an event loop of its own tool thread.
+    """
+
+    def __init__(self):
+        # event loop -> httpx.AsyncHTTPTransport, dropped when the loop is gone
+        self._transports = weakref.WeakKeyDictionary()
+
+    def _transport(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        transport = self._transports.get(loop)
+        if transport is None:
+            transport = httpx.AsyncHTTPTransport(limits=_limits(), http2=HTTP2_ENABLED)
+            self._transports[loop] = transport
+        return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport().handle_async_request(request)
+
+    async def aclose(self) -> None:
+        transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+
+def get_http_client(base_url: Optional[str] = None) -> httpx.Client:
+    """
+    Get the shared synchronous HTTP client for a base URL.
+
+    Args:
+        base_url: The LLM API base URL, None for the provider's default
+
+    Returns:
+        httpx.Client: A pooled client, shared by all LLMs using the same host
+    """
+    key = _client_key(base_url)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = httpx.Client(
+                limits=_limits(),
+                timeout=DEFAULT_TIMEOUT,
+                http2=HTTP2_ENABLED,
+            )
+            _clients[key] = client
+            logger.debug(f"Created shared HTTP client for '{key or 'default'}'")
+        return client
+
+
+def get_async_http_client(base_url: Optional[str] = None) -> httpx.AsyncClient:
+    """
+    Get the shared asynchronous HTTP client for a base URL.
+
+    Args:
+        base_url: The LLM API base URL, None for the provider's default
+
+    Returns:
+        httpx.AsyncClient: A pooled client, usable from any event loop
+    """
+    key = _client_key(base_url)
+    with _lock:
+        client = _async_clients.get(key)
+        if client is None:
+            transport = _LoopLocalTransport()
+            client = httpx.AsyncClient(transport=transport, timeout=DEFAULT_TIMEOUT)
+            _async_clients[key] = client
+            _async_transports[key] = transport
+        return client
+
+
+def close_http_clients() -> None:
+    """Close the shared synchronous clients, e.g. when the server shuts down."""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
+
+
+async def aclose_http_clients() -> None:
+    """Close the shared clients' connections opened from the running event loop."""
+    close_http_clients()
+    with _lock:
+        transports = list(_async_transports.values())
+    for transport in transports:
+        await transport.aclose()
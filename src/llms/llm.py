@@ -24,8 +24,34 @@ from src.config import (
     BASIC_AZURE_DEPLOYMENT,
     VL_AZURE_DEPLOYMENT,
     REASONING_AZURE_DEPLOYMENT,
+    LLM_STREAM_USAGE,
 )
 from src.config.agents import LLMType
+from src.llms.http_client import get_async_http_client, get_http_client
+from src.llms.router import RoutedChatModel
+from src.llms.usage import usage_callback
+from src.utils.replay import current_replay, replay_chat_model
+import litellm
+
+
+def _shared_http_clients(base_url: Optional[str]) -> Dict[str, Any]:
+    """
+    The shared, pooled HTTP clients for an OpenAI compatible client of `base_url`
+    """
+    return {
+        "http_client": get_http_client(base_url),
+        "http_async_client": get_async_http_client(base_url),
+    }
+
+
+def _use_shared_litellm_clients() -> None:
+    """
+    Make LiteLLM build its provider clients on the shared, pooled HTTP clients
+    """
+    if litellm.client_session is None:
+        litellm.client_session = get_http_client()
+    if litellm.aclient_session is None:
+        litellm.aclient_session = get_async_http_client()
 
 
 def create_openai_llm(
@@ -39,7 +65,13 @@ def create_openai_llm(
     Create a ChatOpenAI instance with the specified configuration
     """
     # Only include base_url in the arguments if it's not None or empty
-    llm_kwargs = {"model": model, "temperature": temperature, **kwargs}
+    llm_kwargs = {
+        "model": model,
+        "temperature": temperature,
+        "stream_usage": LLM_STREAM_USAGE,
+        **_shared_http_clients(base_url),
+        **kwargs,
+    }
 
     if base_url:  # This will handle None or empty string
         llm_kwargs["base_url"] = base_url
@@ -61,7 +93,12 @@ def create_deepseek_llm(
     Create a ChatDeepSeek instance with the specified configuration
     """
     # Only include base_url in the arguments if it's not None or empty
-    llm_kwargs = {"model": model, "temperature": temperature, **kwargs}
+    llm_kwargs = {
+        "model": model,
+        "temperature": temperature,
+        **_shared_http_clients(base_url),
+        **kwargs,
+    }
 
     if base_url:  # This will handle None or empty string
         llm_kwargs["api_base"] = base_url
@@ -88,6 +125,8 @@ def create_azure_llm(
         api_version=api_version,
         api_key=api_key,
         temperature=temperature,
+        stream_usage=LLM_STREAM_USAGE,
+        **_shared_http_clients(azure_endpoint),
     )
 
 
@@ -101,6 +140,7 @@ def create_litellm_model(
     """
     Support various different model's through LiteLLM's capabilities.
     """
+    _use_shared_litellm_clients()
 
     llm_kwargs = {"model": model, "temperature": temperature, **kwargs}
 
@@ -114,9 +154,10 @@ def create_litellm_model(
 
 
 # Cache for LLM instances
-_llm_cache: dict[LLMType, ChatOpenAI | ChatDeepSeek | AzureChatOpenAI | ChatLiteLLM] = (
-    {}
-)
+_llm_cache: dict[
+    LLMType,
+    ChatOpenAI | ChatDeepSeek | AzureChatOpenAI | ChatLiteLLM | RoutedChatModel,
+] = {}
 
 
 def is_litellm_model(model_name: str) -> bool:
@@ -205,7 +246,9 @@ def _create_llm_use_env(
     return llm
 
 
-def _create_llm_use_conf(llm_type: LLMType, conf: Dict[str, Any]) -> ChatLiteLLM:
+def _create_llm_use_conf(
+    llm_type: LLMType, conf: Dict[str, Any]
+) -> ChatLiteLLM | RoutedChatModel:
     llm_type_map = {
         "reasoning": conf.get("REASONING_MODEL"),
         "basic": conf.get("BASIC_MODEL"),
@@ -214,17 +257,27 @@ def _create_llm_use_conf(llm_type: LLMType, conf: Dict[str, Any]) -> ChatLiteLLM
     llm_conf = llm_type_map.get(llm_type)
     if not llm_conf:
         raise ValueError(f"Unknown LLM type: {llm_type}")
-    if not isinstance(llm_conf, dict):
+    # 一个类型可以配置多个端点，由路由器选择
+    endpoint_confs = llm_conf if isinstance(llm_conf, list) else [llm_conf]
+    if not all(isinstance(endpoint, dict) for endpoint in endpoint_confs):
         raise ValueError(f"Invalid LLM Conf: {llm_type}")
-    return ChatLiteLLM(**llm_conf)
+    _use_shared_litellm_clients()
+    endpoints = [ChatLiteLLM(**endpoint) for endpoint in endpoint_confs]
+    if len(endpoints) == 1:
+        return endpoints[0]
+    return RoutedChatModel(endpoints=endpoints, settings=conf.get("LLM_ROUTER") or {})
 
 
 def get_llm_by_type(
     llm_type: LLMType,
-) -> ChatOpenAI | ChatDeepSeek | AzureChatOpenAI | ChatLiteLLM:
+) -> ChatOpenAI | ChatDeepSeek | AzureChatOpenAI | ChatLiteLLM | RoutedChatModel:
     """
     Get LLM instance by type. Returns cached instance if available.
     """
+    # 回放录制的工作流时，所有调用都返回录制的响应
+    if current_replay() is not None:
+        return replay_chat_model
+
     if llm_type in _llm_cache:
         return _llm_cache[llm_type]
 
@@ -237,6 +290,8 @@ def get_llm_by_type(
     else:
         llm = _create_llm_use_env(llm_type)
 
+    # 统计每次调用的 token、延迟和费用
+    llm.callbacks = [usage_callback]
     _llm_cache[llm_type] = llm
     return llm
 
@@ -0,0 +1,632 @@
+"""
+Route the requests of one LLM type over several endpoints.
+
+The router prefers the endpoint with the lowest EWMA latency, penalised by
+its recent error rate. Endpoints answering 429 are skipped until their
+Retry-After has passed, failed requests are retried on the next endpoint, and
+requests slower than the endpoint's p95 are hedged on a second endpoint.
+
+Latency is kept apart per call kind: the full latency of non streaming
+requests and the time to the first chunk of streaming ones.
+"""
+
+import asyncio
+import contextlib
+import logging
+import math
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable, RunnableBinding
+from pydantic import Field
+
+logger = logging.getLogger(__name__)
+
+# Default router settings, overridden by LLM_ROUTER in conf.yaml
+DEFAULT_ROUTER_SETTINGS = {
+    # Weight of the latest sample in the latency and error rate averages
+    "ewma_alpha": 0.3,
+    # An endpoint failing every request counts as this many times slower
+    "error_penalty": 4.0,
+    # Hedge a request once it is slower than this percentile of the endpoint
+    "hedge_percentile": 0.95,
+    # Samples needed before hedging, 0 disables hedging
+    "hedge_min_samples": 20,
+    # Seconds to skip an endpoint after a 429 without a Retry-After header
+    "rate_limit_cooldown": 10.0,
+    # Longest Retry-After honoured, in seconds
+    "max_cooldown": 60.0,
+}
+
+# Latency samples kept per endpoint and call kind for the hedging percentile
+LATENCY_WINDOW = 200
+
+# Call kinds with their own latency: full latency and time to the first chunk
+GENERATE = "generate"
+STREAM = "stream"
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    """Return the Retry-After of a rate limit error in seconds, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    if value := headers.get("retry-after-ms"):
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    if value := headers.get("retry-after"):
+        try:
+            return float(value)
+        except ValueError:
+            try:
+                return parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                pass
+    return None
+
+
+def _is_rate_limited(error: BaseException) -> bool:
+    status = getattr(error, "status_code", None) or getattr(
+        getattr(error, "response", None), "status_code", None
+    )
+    return status == 429 or "RateLimit" in type(error).__name__
+
+
+def _endpoint_name(endpoint: BaseChatModel, index: int) -> str:
+    model = getattr(endpoint, "model", None) or getattr(endpoint, "model_name", "")
+    base = getattr(endpoint, "api_base", None) or getattr(
+        endpoint, "openai_api_base", None
+    )
+    return f"{model}@{base}#{index}" if base else f"{model}#{index}"
+
+
+class EndpointStats:
+    """Latency and error statistics of one endpoint, shared by its bound copies."""
+
+    def __init__(self, name: str):
+        self.name = name
+        # Per call kind, GENERATE or STREAM
+        self.latency: Dict[str, Optional[float]] = {GENERATE: None, STREAM: None}
+        self.samples: Dict[str, deque] = {
+            GENERATE: deque(maxlen=LATENCY_WINDOW),
+            STREAM: deque(maxlen=LATENCY_WINDOW),
+        }
+        self.error_rate = 0.0
+        self.cooldown_until = 0.0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def begin(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def abandon(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def record_success(self, kind: str, latency: float, alpha: float) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.samples[kind].append(latency)
+            if self.latency[kind] is None:
+                self.latency[kind] = latency
+            else:
+                self.latency[kind] = alpha * latency + (1 - alpha) * self.latency[kind]
+            self.error_rate = (1 - alpha) * self.error_rate
+
+    def record_error(self, error: BaseException, alpha: float, settings: dict) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.error_rate = alpha + (1 - alpha) * self.error_rate
+            if _is_rate_limited(error):
+                cooldown = _retry_after(error) or settings["rate_limit_cooldown"]
+                cooldown = min(max(cooldown, 0), settings["max_cooldown"])
+                self.cooldown_until = time.monotonic() + cooldown
+                logger.warning(
+                    f"LLM endpoint {self.name} is rate limited, "
+                    f"skipping it for {cooldown:.1f}s"
+                )
+
+    def percentile(self, kind: str, p: float) -> float:
+        with self._lock:
+            ordered = sorted(self.samples[kind])
+        return ordered[min(len(ordered) - 1, math.ceil(p * len(ordered)) - 1)]
+
+    def score(self, kind: str, error_penalty: float) -> float:
+        # Endpoints without samples are tried first, so every endpoint gets measured,
+        # unless they have only failed so far
+        latency = self.latency[kind]
+        if latency is None:
+            return math.inf if self.error_rate else -1.0
+        return latency * (1 + error_penalty * self.error_rate) * (1 + self.in_flight)
+
+
+class _Attempt:
+    """One endpoint chosen for a request, timing the request and its outcome."""
+
+    def __init__(self, router: "RoutedChatModel", index: int, kind: str):
+        self.router = router
+        self.index = index
+        self.kind = kind
+        self.stats = router.stats[index]
+        self.start = time.monotonic()
+        self.stats.begin()
+        self.done = False
+
+    def succeeded(self) -> None:
+        if not self.done:
+            self.done = True
+            self.stats.record_success(
+                self.kind,
+                time.monotonic() - self.start,
+                self.router.settings["ewma_alpha"],
+            )
+
+    def failed(self, error: BaseException) -> None:
+        if not self.done:
+            self.done = True
+            self.stats.record_error(
+                error, self.router.settings["ewma_alpha"], self.router.settings
+            )
+
+    def abandoned(self) -> None:
+        """The request lost a hedge race, it says nothing about the endpoint."""
+        if not self.done:
+            self.done = True
+            self.stats.abandon()
+
+
+class RoutedChatModel(BaseChatModel):
+    """
+    A chat model that sends each request to the best of several endpoints.
+
+    Args:
+        endpoints: The chat models of the endpoints, e.g. one ChatLiteLLM each
+        settings: Router settings, see DEFAULT_ROUTER_SETTINGS
+    """
+
+    endpoints: List[BaseChatModel]
+    # Keyword arguments bound to each endpoint, e.g. its tools
+    endpoint_kwargs: List[Dict[str, Any]] = Field(default_factory=list)
+    settings: Dict[str, Any] = Field(default_factory=dict)
+    stats: List[EndpointStats] = Field(default_factory=list)
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.settings = {**DEFAULT_ROUTER_SETTINGS, **self.settings}
+        if not self.endpoint_kwargs:
+            self.endpoint_kwargs = [{} for _ in self.endpoints]
+        if not self.stats:
+            self.stats = [
+                EndpointStats(_endpoint_name(endpoint, i))
+                for i, endpoint in enumerate(self.endpoints)
+            ]
+
+    @property
+    def _llm_type(self) -> str:
+        return "routed"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> Runnable:
+        """Bind the tools to every endpoint, in each endpoint's own format."""
+        # LangSmith metadata stays on the router, the endpoints are called directly
+        ls_kwargs = {k: kwargs.pop(k) for k in list(kwargs) if k.startswith("ls_")}
+        endpoint_kwargs = []
+        for endpoint in self.endpoints:
+            bound = endpoint.bind_tools(tools, **kwargs)
+            endpoint_kwargs.append(
+                bound.kwargs if isinstance(bound, RunnableBinding) else {}
+            )
+        routed = self.model_copy(update={"endpoint_kwargs": endpoint_kwargs})
+        return routed.bind(**ls_kwargs) if ls_kwargs else routed
+
+    def _order(self, kind: str, exclude: Sequence[int] = ()) -> List[int]:
+        """Endpoint indexes from best to worst for a call kind, rate limited last."""
+        now = time.monotonic()
+        penalty = self.settings["error_penalty"]
+        candidates = [i for i in range(len(self.endpoints)) if i not in exclude]
+        return sorted(
+            candidates,
+            key=lambda i: (
+                max(self.stats[i].cooldown_until - now, 0),
+                self.stats[i].score(kind, penalty),
+            ),
+        )
+
+    def _hedge_delay(self, index: int, kind: str) -> Optional[float]:
+        stats = self.stats[index]
+        min_samples = self.settings["hedge_min_samples"]
+        if (
+            len(self.endpoints) < 2
+            or not min_samples
+            or len(stats.samples[kind]) < min_samples
+        ):
+            return None
+        return stats.percentile(kind, self.settings["hedge_percentile"])
+
+    def _call_kwargs(self, index: int, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        return {**self.endpoint_kwargs[index], **kwargs}
+
+    def _failover(self, kind: str, tried: List[int], error: BaseException) -> int:
+        remaining = self._order(kind, exclude=tried)
+        if not remaining:
+            raise error
+        logger.warning(
+            f"LLM endpoint {self.stats[tried[-1]].name} failed ({error}), "
+            f"retrying on {self.stats[remaining[0]].name}"
+        )
+        return remaining[0]
+
+    # Non streaming requests
+
+    def _generate_on(
+        self, index: int, messages: List[BaseMessage], stop, kwargs
+    ) -> ChatResult:
+        attempt = _Attempt(self, index, GENERATE)
+        try:
+            result = self.endpoints[index]._generate(
+                messages, stop=stop, **self._call_kwargs(index, kwargs)
+            )
+        except BaseException as e:
+            attempt.failed(e)
+            raise
+        attempt.succeeded()
+        return result
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tried: List[int] = []
+        index = self._order(GENERATE)[0]
+        while True:
+            tried.append(index)
+            try:
+                return self._generate_hedged(index, tried, messages, stop, kwargs)
+            except Exception as e:
+                index = self._failover(GENERATE, tried, e)
+
+    def _generate_hedged(self, index, tried, messages, stop, kwargs) -> ChatResult:
+        delay = self._hedge_delay(index, GENERATE)
+        if delay is None:
+            return self._generate_on(index, messages, stop, kwargs)
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        try:
+            futures = {
+                executor.submit(self._generate_on, index, messages, stop, kwargs): index
+            }
+            done, _ = wait(futures, timeout=delay)
+            hedge = self._order(GENERATE, exclude=tried)
+            if not done and hedge:
+                logger.info(
+                    f"LLM endpoint {self.stats[index].name} slower than "
+                    f"{delay:.2f}s, hedging on {self.stats[hedge[0]].name}"
+                )
+                tried.append(hedge[0])
+                futures[
+                    executor.submit(self._generate_on, hedge[0], messages, stop, kwargs)
+                ] = hedge[0]
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        return future.result()
+            # Every attempt failed, fail over with the last error
+            raise next(iter(done)).exception()
+        finally:
+            # The losing request finishes in the background, its result is dropped
+            executor.shutdown(wait=False)
+
+    async def _agenerate_on(
+        self, index: int, messages: List[BaseMessage], stop, kwargs
+    ) -> ChatResult:
+        attempt = _Attempt(self, index, GENERATE)
+        try:
+            result = await self.endpoints[index]._agenerate(
+                messages, stop=stop, **self._call_kwargs(index, kwargs)
+            )
+        except asyncio.CancelledError:
+            attempt.abandoned()
+            raise
+        except BaseException as e:
+            attempt.failed(e)
+            raise
+        attempt.succeeded()
+        return result
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tried: List[int] = []
+        index = self._order(GENERATE)[0]
+        while True:
+            tried.append(index)
+            try:
+                return await self._agenerate_hedged(
+                    index, tried, messages, stop, kwargs
+                )
+            except Exception as e:
+                index = self._failover(GENERATE, tried, e)
+
+    async def _agenerate_hedged(
+        self, index, tried, messages, stop, kwargs
+    ) -> ChatResult:
+        delay = self._hedge_delay(index, GENERATE)
+        tasks = [asyncio.create_task(self._agenerate_on(index, messages, stop, kwargs))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            hedge = self._order(GENERATE, exclude=tried)
+            if not done and hedge:
+                tried.append(hedge[0])
+                tasks.append(
+                    asyncio.create_task(
+                        self._agenerate_on(hedge[0], messages, stop, kwargs)
+                    )
+                )
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            raise next(iter(done)).exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    # Streaming requests, hedged on the time to the first chunk
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        tried: List[int] = []
+        index = self._order(STREAM)[0]
+        while True:
+            tried.append(index)
+            started = False
+            try:
+                for chunk in self._stream_hedged(index, tried, messages, stop, kwargs):
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                # Chunks already sent cannot be taken back
+                if started:
+                    raise
+                index = self._failover(STREAM, tried, e)
+
+    def _stream_hedged(
+        self, index, tried, messages, stop, kwargs
+    ) -> Iterator[ChatGenerationChunk]:
+        delay = self._hedge_delay(index, STREAM)
+        if delay is None:
+            yield from self._stream_on(index, messages, stop, kwargs)
+            return
+
+        chunks: queue.Queue = queue.Queue()
+        attempts: Dict[int, _Attempt] = {}
+        # Set to stop an endpoint's request, e.g. once another one has won
+        stopped: Dict[int, threading.Event] = {}
+
+        def produce(i: int) -> None:
+            attempt = attempts[i]
+            stream = self.endpoints[i]._stream(
+                messages, stop=stop, **self._call_kwargs(i, kwargs)
+            )
+            try:
+                for chunk in stream:
+                    if stopped[i].is_set():
+                        attempt.abandoned()
+                        return
+                    attempt.succeeded()
+                    chunks.put((i, chunk, None))
+                chunks.put((i, None, None))
+            except BaseException as e:
+                attempt.failed(e)
+                chunks.put((i, None, e))
+            finally:
+                stream.close()
+
+        def start(i: int) -> None:
+            attempts[i] = _Attempt(self, i, STREAM)
+            stopped[i] = threading.Event()
+            threading.Thread(target=produce, args=(i,), daemon=True).start()
+
+        start(index)
+        winner: Optional[int] = None
+        hedged = False
+        failed: Dict[int, BaseException] = {}
+        try:
+            while True:
+                timeout = delay if winner is None and not hedged else None
+                try:
+                    i, chunk, error = chunks.get(timeout=timeout)
+                except queue.Empty:
+                    hedged = True
+                    hedge = self._order(STREAM, exclude=tried)
+                    if hedge:
+                        logger.info(
+                            f"LLM endpoint {self.stats[index].name} has not answered "
+                            f"in {delay:.2f}s, hedging on {self.stats[hedge[0]].name}"
+                        )
+                        tried.append(hedge[0])
+                        start(hedge[0])
+                    continue
+                if winner is not None and i != winner:
+                    continue
+                if chunk is not None:
+                    if winner is None:
+                        # The first endpoint to answer wins, the other one is stopped
+                        winner = i
+                        for j, event in stopped.items():
+                            if j != i:
+                                event.set()
+                    yield chunk
+                elif error is None:
+                    return
+                elif winner is not None:
+                    raise error
+                else:
+                    failed[i] = error
+                    if len(failed) == len(attempts):
+                        raise error
+        finally:
+            for event in stopped.values():
+                event.set()
+
+    def _stream_on(
+        self, index: int, messages: List[BaseMessage], stop, kwargs
+    ) -> Iterator[ChatGenerationChunk]:
+        attempt = _Attempt(self, index, STREAM)
+        try:
+            for chunk in self.endpoints[index]._stream(
+                messages, stop=stop, **self._call_kwargs(index, kwargs)
+            ):
+                attempt.succeeded()
+                yield chunk
+        except GeneratorExit:
+            attempt.abandoned()
+            raise
+        except BaseException as e:
+            attempt.failed(e)
+            raise
+        attempt.succeeded()
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        tried: List[int] = []
+        index = self._order(STREAM)[0]
+        while True:
+            tried.append(index)
+            started = False
+            try:
+                async with contextlib.aclosing(
+                    self._astream_hedged(index, tried, messages, stop, kwargs)
+                ) as chunks:
+                    async for chunk in chunks:
+                        started = True
+                        yield chunk
+                return
+            except Exception as e:
+                # Chunks already sent cannot be taken back
+                if started:
+                    raise
+                index = self._failover(STREAM, tried, e)
+
+    async def _astream_hedged(
+        self, index, tried, messages, stop, kwargs
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        delay = self._hedge_delay(index, STREAM)
+        if delay is None:
+            async with contextlib.aclosing(
+                self._astream_on(index, messages, stop, kwargs)
+            ) as chunks:
+                async for chunk in chunks:
+                    yield chunk
+            return
+
+        chunks: asyncio.Queue = asyncio.Queue()
+        tasks: Dict[int, asyncio.Task] = {}
+
+        async def produce(i: int) -> None:
+            try:
+                async for chunk in self._astream_on(i, messages, stop, kwargs):
+                    chunks.put_nowait((i, chunk, None))
+                chunks.put_nowait((i, None, None))
+            except Exception as e:
+                chunks.put_nowait((i, None, e))
+
+        def start(i: int) -> None:
+            tasks[i] = asyncio.create_task(produce(i))
+
+        start(index)
+        winner: Optional[int] = None
+        hedged = False
+        failed: Dict[int, BaseException] = {}
+        try:
+            while True:
+                timeout = delay if winner is None and not hedged else None
+                try:
+                    i, chunk, error = await asyncio.wait_for(chunks.get(), timeout)
+                except asyncio.TimeoutError:
+                    hedged = True
+                    hedge = self._order(STREAM, exclude=tried)
+                    if hedge:
+                        logger.info(
+                            f"LLM endpoint {self.stats[index].name} has not answered "
+                            f"in {delay:.2f}s, hedging on {self.stats[hedge[0]].name}"
+                        )
+                        tried.append(hedge[0])
+                        start(hedge[0])
+                    continue
+                if winner is not None and i != winner:
+                    continue
+                if chunk is not None:
+                    if winner is None:
+                        # The first endpoint to answer wins, the other one is cancelled
+                        winner = i
+                        for j, task in tasks.items():
+                            if j != i:
+                                task.cancel()
+                    yield chunk
+                elif error is None:
+                    return
+                elif winner is not None:
+                    raise error
+                else:
+                    failed[i] = error
+                    if len(failed) == len(tasks):
+                        raise error
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+    async def _astream_on(
+        self, index: int, messages: List[BaseMessage], stop, kwargs
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        attempt = _Attempt(self, index, STREAM)
+        try:
+            async for chunk in self.endpoints[index]._astream(
+                messages, stop=stop, **self._call_kwargs(index, kwargs)
+            ):
+                attempt.succeeded()
+                yield chunk
+        except (asyncio.CancelledError, GeneratorExit):
+            attempt.abandoned()
+            raise
+        except BaseException as e:
+            attempt.failed(e)
+            raise
+        attempt.succeeded()
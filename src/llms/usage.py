@@ -0,0 +1,389 @@
+"""
+Token, latency and cost accounting for the LLM clients.
+
+get_llm_by_type attaches one UsageCallbackHandler to every client it builds. The
+handler records each call under the agent (graph node) that made it and under
+the workflow_id found in the run metadata, and keeps process-wide totals.
+"""
+
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+import litellm
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage, get_buffer_string
+from langchain_core.outputs import ChatGenerationChunk, LLMResult
+
+from src.utils.metrics import registry
+from src.utils.tracing import end_span, start_span
+
+logger = logging.getLogger(__name__)
+
+LLM_TTFT = registry.histogram(
+    "deepmanus_llm_ttft_seconds", "Time to the first token of LLM calls", ["model"]
+)
+LLM_LATENCY = registry.histogram(
+    "deepmanus_llm_latency_seconds", "Duration of LLM calls", ["model"]
+)
+LLM_ERRORS = registry.counter(
+    "deepmanus_llm_errors_total", "Failed LLM calls", ["model"]
+)
+
+# Models litellm has no price for, looked up only once
+_unpriced_models: Set[str] = set()
+
+
+class UsageStats:
+    """Aggregated usage of a group of LLM calls."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        # Calls whose tokens were counted locally because the API reported none
+        self.estimated_calls = 0
+        self.cost = 0.0
+        self.ttft = 0.0
+        self.latency = 0.0
+
+    def add(
+        self,
+        prompt_tokens: int,
+        completion_tokens: int,
+        estimated: bool,
+        cost: float,
+        ttft: float,
+        latency: float,
+    ) -> None:
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.estimated_calls += estimated
+        self.cost += cost
+        self.ttft += ttft
+        self.latency += latency
+
+    def to_dict(self) -> Dict[str, Any]:
+        calls = self.calls or 1
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "estimated_calls": self.estimated_calls,
+            "cost": round(self.cost, 6),
+            "avg_ttft": round(self.ttft / calls, 4),
+            "avg_latency": round(self.latency / calls, 4),
+            "total_latency": round(self.latency, 4),
+        }
+
+
+class UsageReport:
+    """Usage broken down by agent and by model, plus the total."""
+
+    def __init__(self):
+        self.agents: Dict[str, UsageStats] = {}
+        self.models: Dict[str, UsageStats] = {}
+        self.total = UsageStats()
+
+    def _groups(self, agent: str, model: str) -> List[UsageStats]:
+        return [
+            self.agents.setdefault(agent, UsageStats()),
+            self.models.setdefault(model, UsageStats()),
+            self.total,
+        ]
+
+    def add(self, agent: str, model: str, **usage: Any) -> None:
+        for stats in self._groups(agent, model):
+            stats.add(**usage)
+
+    def add_error(self, agent: str, model: str) -> None:
+        for stats in self._groups(agent, model):
+            stats.errors += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "agents": {name: s.to_dict() for name, s in self.agents.items()},
+            "models": {name: s.to_dict() for name, s in self.models.items()},
+            "total": self.total.to_dict(),
+        }
+
+
+class UsageTracker:
+    """Thread-safe usage totals, per running workflow and for the whole process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._process = UsageReport()
+        self._workflows: Dict[str, UsageReport] = {}
+
+    def _reports(self, workflow_id: Optional[str]) -> List[UsageReport]:
+        if not workflow_id:
+            return [self._process]
+        workflow = self._workflows.setdefault(workflow_id, UsageReport())
+        return [self._process, workflow]
+
+    def record(
+        self, workflow_id: Optional[str], agent: str, model: str, **usage: Any
+    ) -> None:
+        with self._lock:
+            for report in self._reports(workflow_id):
+                report.add(agent, model, **usage)
+
+    def record_error(self, workflow_id: Optional[str], agent: str, model: str) -> None:
+        with self._lock:
+            for report in self._reports(workflow_id):
+                report.add_error(agent, model)
+
+    def pop_workflow(self, workflow_id: str) -> Dict[str, Any]:
+        """
+        Get the usage of a workflow and stop tracking it.
+
+        Args:
+            workflow_id: The workflow's ID
+
+        Returns:
+            dict: Usage by agent and model, and the workflow total
+        """
+        with self._lock:
+            report = self._workflows.pop(workflow_id, None) or UsageReport()
+            return report.to_dict()
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Get the usage of all LLM calls since the process started.
+
+        Returns:
+            dict: Usage by agent and model, the total and the workflows in progress
+        """
+        with self._lock:
+            return {
+                **self._process.to_dict(),
+                "workflows_in_progress": len(self._workflows),
+            }
+
+
+class _Run:
+    """An LLM call in progress."""
+
+    __slots__ = (
+        "workflow_id",
+        "agent",
+        "model",
+        "messages",
+        "start",
+        "first_token",
+        "generation",
+        "span",
+    )
+
+    def __init__(self, workflow_id, agent, model, messages):
+        self.workflow_id = workflow_id
+        self.agent = agent
+        self.model = model
+        self.messages = messages
+        self.start = time.monotonic()
+        self.first_token: Optional[float] = None
+        # The chunks streamed so far, merged
+        self.generation: Optional[ChatGenerationChunk] = None
+        self.span = start_span(
+            f"llm {agent}", {"gen_ai.request.model": model, "agent": agent}
+        )
+
+
+def agent_name(metadata: Dict[str, Any]) -> str:
+    """The graph node making an LLM call, from the call's run metadata."""
+    # "researcher:<task id>|agent:<task id>" for the agents' subgraphs
+    node = (metadata.get("checkpoint_ns") or "").split(":")[0]
+    return node or metadata.get("langgraph_node") or "unknown"
+
+
+def _get(obj: Any, key: str) -> Any:
+    if isinstance(obj, dict):
+        return obj.get(key)
+    return getattr(obj, key, None)
+
+
+def _reported_tokens(response: LLMResult) -> Optional[Tuple[int, int]]:
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            usage = getattr(message, "usage_metadata", None)
+            if usage:
+                return usage["input_tokens"], usage["output_tokens"]
+    token_usage = (response.llm_output or {}).get("token_usage")
+    if token_usage and _get(token_usage, "prompt_tokens") is not None:
+        return (
+            _get(token_usage, "prompt_tokens") or 0,
+            _get(token_usage, "completion_tokens") or 0,
+        )
+    return None
+
+
+def response_model(response: LLMResult) -> Optional[str]:
+    """The model that answered, as reported by the API."""
+    llm_output = response.llm_output or {}
+    model = llm_output.get("model_name") or llm_output.get("model")
+    if model:
+        return model
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            metadata = getattr(message, "response_metadata", None) or {}
+            if metadata.get("model_name"):
+                return metadata["model_name"]
+    return None
+
+
+def _completion_text(response: LLMResult) -> str:
+    parts = []
+    for generations in response.generations:
+        for generation in generations:
+            parts.append(generation.text)
+            message = getattr(generation, "message", None)
+            for tool_call in getattr(message, "tool_calls", None) or []:
+                parts.append(tool_call["name"] + json.dumps(tool_call["args"]))
+    return "".join(parts)
+
+
+def _count_tokens(model: str, text: str) -> int:
+    if not text:
+        return 0
+    try:
+        return litellm.token_counter(model=model, text=text)
+    except Exception:
+        return len(text) // 4
+
+
+def _cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    if not model or model in _unpriced_models:
+        return 0.0
+    try:
+        prompt_cost, completion_cost = litellm.cost_per_token(
+            model=model,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+        )
+    except Exception:
+        logger.debug(f"No price known for model {model}, its cost is counted as 0")
+        _unpriced_models.add(model)
+        return 0.0
+    return prompt_cost + completion_cost
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """Records tokens, time to first token, latency and cost of every chat call."""
+
+    # Only bookkeeping, no need to run it in the executor for async calls
+    run_inline = True
+
+    def __init__(self, tracker: UsageTracker):
+        self.tracker = tracker
+        self._runs: Dict[UUID, _Run] = {}
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[BaseMessage]],
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        metadata = metadata or {}
+        params = kwargs.get("invocation_params") or {}
+        self._runs[run_id] = _Run(
+            workflow_id=metadata.get("workflow_id"),
+            agent=agent_name(metadata),
+            model=params.get("model") or params.get("model_name") or "",
+            messages=messages,
+        )
+
+    def on_llm_new_token(
+        self,
+        token: str,
+        *,
+        run_id: UUID,
+        chunk: Optional[ChatGenerationChunk] = None,
+        **kwargs: Any,
+    ) -> None:
+        run = self._runs.get(run_id)
+        if run is None:
+            return
+        if run.first_token is None:
+            run.first_token = time.monotonic()
+        if isinstance(chunk, ChatGenerationChunk):
+            run.generation = chunk if run.generation is None else run.generation + chunk
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            self._record(run, response)
+
+    def _record(self, run: _Run, response: LLMResult) -> None:
+        latency = time.monotonic() - run.start
+        ttft = (run.first_token or time.monotonic()) - run.start
+        model = response_model(response) or run.model or "unknown"
+
+        tokens = _reported_tokens(response)
+        estimated = tokens is None
+        if estimated:
+            prompt = "\n".join(get_buffer_string(m) for m in run.messages)
+            tokens = (
+                _count_tokens(model, prompt),
+                _count_tokens(model, _completion_text(response)),
+            )
+        prompt_tokens, completion_tokens = tokens
+
+        LLM_TTFT.observe(ttft, model)
+        LLM_LATENCY.observe(latency, model)
+        if run.span.is_recording():
+            run.span.set_attributes(
+                {
+                    "gen_ai.response.model": model,
+                    "gen_ai.usage.input_tokens": prompt_tokens,
+                    "gen_ai.usage.output_tokens": completion_tokens,
+                    "gen_ai.usage.estimated": estimated,
+                    "llm.ttft": ttft,
+                }
+            )
+        end_span(run.span)
+        self.tracker.record(
+            run.workflow_id,
+            run.agent,
+            model,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            estimated=estimated,
+            cost=_cost(model, prompt_tokens, completion_tokens),
+            ttft=ttft,
+            latency=latency,
+        )
+
+    def on_llm_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        # A stream closed by its reader, e.g. the coordinator once it hands off,
+        # completed with the chunks streamed so far
+        if isinstance(error, GeneratorExit):
+            generations = [[run.generation]] if run.generation is not None else [[]]
+            self._record(run, LLMResult(generations=generations))
+            return
+        end_span(run.span, error)
+        model = run.model or "unknown"
+        LLM_ERRORS.inc(model)
+        self.tracker.record_error(run.workflow_id, run.agent, model)
+
+
+# Process-wide accounting shared by all LLM clients
+usage_tracker = UsageTracker()
+usage_callback = UsageCallbackHandler(usage_tracker)
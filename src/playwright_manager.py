@@ -2,33 +2,214 @@
 管理Playwright服务器启动和停止的模块
 """
 
+import http.client
+import json
 import subprocess
 import logging
 import os
 import signal
+import socket
+import threading
 import time
 import platform
 import atexit
+import contextlib
 import sys
+import uuid
+from collections import deque
+from importlib import metadata
 from pathlib import Path
 from typing import Optional, Tuple, List
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from src.config import (
+    CHROME_HEADLESS,
+    CHROME_PROXY_SERVER,
+    CHROME_PROXY_USERNAME,
+    CHROME_PROXY_PASSWORD,
+    PLAYWRIGHT_SERVER_TIMEOUT,
+    PLAYWRIGHT_HEALTH_INTERVAL,
+    PLAYWRIGHT_STATE_DIR,
+)
+from src.utils.metrics import registry
+
 logger = logging.getLogger(__name__)
 
+PLAYWRIGHT_RESTARTS = registry.counter(
+    "deepmanus_playwright_restarts_total",
+    "Playwright server restarts after a failed health check",
+)
+
+# 启动失败后，在这段时间（秒）内不再重试，避免每个浏览器任务都重复安装和启动
+START_RETRY_INTERVAL = 60
+
+# 连续多少次健康检查无响应后重启服务器，进程退出时立即重启
+HEALTH_CHECK_FAILURES = 3
+
+# 保留的服务器输出行数，启动失败时写入日志
+OUTPUT_LINES = 50
+
+# 服务器预先启动的浏览器的参数，与browser_use在本地启动浏览器时相同
+BROWSER_ARGS = [
+    "--no-sandbox",
+    "--disable-blink-features=AutomationControlled",
+    "--disable-infobars",
+    "--disable-background-timer-throttling",
+    "--disable-popup-blocking",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-renderer-backgrounding",
+    "--disable-window-activation",
+    "--disable-focus-on-load",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--no-startup-window",
+    "--window-position=0,0",
+    "--disable-web-security",
+    "--disable-site-isolation-trials",
+    "--disable-features=IsolateOrigins,site-per-process",
+]
+
+
+def _free_port() -> int:
+    """获取一个空闲的本地端口"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _endpoint_healthy(port: Optional[int], ws_path: str, timeout: float = 2) -> bool:
+    """
+    检查端口上是否有使用该websocket路径的Playwright服务器在响应
+
+    Args:
+        port: 服务器端口
+        ws_path: 服务器的websocket路径
+        timeout: 请求的超时秒数
+
+    Returns:
+        bool: 服务器是否响应
+    """
+    if port is None:
+        return False
+    # 不使用urllib，避免请求被环境变量中的代理转发
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    try:
+        connection.request("GET", "/json")
+        body = connection.getresponse().read()
+        return json.loads(body).get("wsEndpointPath") == ws_path
+    except (OSError, ValueError, http.client.HTTPException):
+        return False
+    finally:
+        connection.close()
+
+
+def _pid_alive(pid: int) -> bool:
+    """检查进程是否存在"""
+    if platform.system() == "Windows":
+        # Windows上os.kill(pid, 0)会终止进程
+        output = subprocess.run(
+            ["tasklist", "/FI", f"PID eq {pid}", "/NH"],
+            capture_output=True,
+            text=True,
+        ).stdout
+        return str(pid) in output
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _is_server_process(pid: int) -> bool:
+    """
+    检查进程是否是记录的Playwright服务器，避免PID被其他进程重用后误杀
+
+    Args:
+        pid: 记录的服务器进程ID
+
+    Returns:
+        bool: 无法确认时，POSIX系统上只要进程是进程组的首进程即返回True
+    """
+    if platform.system() == "Windows":
+        return True
+    try:
+        if os.getpgid(pid) != pid:
+            return False
+    except ProcessLookupError:
+        return False
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return b"launch-server" in f.read()
+    except FileNotFoundError:
+        # 没有/proc的系统（macOS）
+        return True
+
+
 class PlaywrightManager:
-    """管理Playwright服务器的类"""
+    """
+    管理Playwright服务器的类
+
+    服务器通过launch-server预先启动一个浏览器，浏览器任务通过websocket连接，
+    各自在其中创建独立的上下文，不必每次启动浏览器。后台线程读取服务器的输出，
+    并定期检查其健康状况，进程退出或无响应时自动重启
+
+    同一主机上的工作进程共享一个服务器：启动和停止在状态目录的文件锁内进行，
+    服务器的PID、端口和使用它的进程记录在状态文件中。后启动的进程连接已有的服务器，
+    最后一个停止的进程关闭它，只会终止状态文件中记录的进程
+    """
     
-    def __init__(self):
+    def __init__(self, state_dir: Optional[str] = None):
         self.server_process: Optional[subprocess.Popen] = None
         self.is_running = False
+        self.port: Optional[int] = None
+        # 随机的websocket路径，其他本地进程无法猜到
+        self._ws_path = f"/{uuid.uuid4().hex}"
+        self._state_dir = state_dir or PLAYWRIGHT_STATE_DIR
+        self._lock_path = os.path.join(self._state_dir, "server.lock")
+        self._state_path = os.path.join(self._state_dir, "server.json")
+        self._log_path = os.path.join(self._state_dir, "server.log")
+        self._config_path = os.path.join(self._state_dir, "launch-server.json")
+        # 启动可能同时由多个浏览器任务触发，只启动一次
+        self._lock = threading.Lock()
+        self._last_failure: Optional[float] = None
+        self._output: deque = deque(maxlen=OUTPUT_LINES)
+        self._supervisor: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._atexit_registered = False
+        # 查找npm和检测版本需要启动子进程，结果缓存在进程内
+        self._npm_path: Optional[str] = None
+        self._npm_checked = False
+        self._version: Optional[str] = None
+        self._version_checked = False
+
+    @property
+    def ws_endpoint(self) -> Optional[str]:
+        """服务器的websocket地址，未运行时为None"""
+        if not self.is_running or self.port is None:
+            return None
+        return f"ws://127.0.0.1:{self.port}{self._ws_path}"
         
     def _find_npm_executable(self) -> Optional[str]:
         """
-        查找npm或npx可执行文件的路径
+        查找npm或npx可执行文件的路径，结果会被缓存
         
         Returns:
             Optional[str]: npm或npx可执行文件的路径，如果未找到则返回None
         """
+        if not self._npm_checked:
+            self._npm_path = self._locate_npm_executable()
+            self._npm_checked = True
+        return self._npm_path
+
+    def _locate_npm_executable(self) -> Optional[str]:
+        """查找npm或npx可执行文件的路径"""
         npm_commands = ["npm", "npm.cmd"] if platform.system() == "Windows" else ["npm"]
         npx_commands = ["npx", "npx.cmd"] if platform.system() == "Windows" else ["npx"]
         
@@ -64,6 +245,18 @@ class PlaywrightManager:
         
         return None
     
+    def get_playwright_version(self) -> Optional[str]:
+        """
+        获取已安装的Playwright版本，结果会被缓存
+
+        Returns:
+            Optional[str]: 版本号，未安装时返回None
+        """
+        if not self._version_checked:
+            self._version = self._detect_playwright_version()
+            self._version_checked = True
+        return self._version
+
     def _check_playwright_installed(self) -> bool:
         """
         检查是否已安装Playwright
@@ -71,12 +264,26 @@ class PlaywrightManager:
         Returns:
             bool: 如果安装了Playwright，则返回True
         """
+        return self.get_playwright_version() is not None
+
+    def _detect_playwright_version(self) -> Optional[str]:
+        """
+        检测Playwright版本，优先读取Python包的元数据，不需要启动子进程
+
+        Returns:
+            Optional[str]: 版本号，未安装时返回None
+        """
+        try:
+            return metadata.version("playwright")
+        except metadata.PackageNotFoundError:
+            pass
+
         try:
             # 尝试查找已安装的playwright
             npm_path = self._find_npm_executable()
             if not npm_path:
                 logger.warning("未找到npm或npx命令")
-                return False
+                return None
             
             # 确定是npx还是npm
             is_npx = os.path.basename(npm_path).startswith("npx")
@@ -93,12 +300,15 @@ class PlaywrightManager:
                 stderr=subprocess.PIPE,
                 text=True,
                 check=False,
+                timeout=PLAYWRIGHT_SERVER_TIMEOUT,
             )
             
-            return result.returncode == 0 and "Version" in result.stdout
+            if result.returncode == 0 and "Version" in result.stdout:
+                return result.stdout.split("Version", 1)[1].strip()
+            return None
         except Exception as e:
             logger.warning(f"检查Playwright安装状态时出错: {e}")
-            return False
+            return None
     
     def _install_playwright(self) -> bool:
         """
@@ -130,6 +340,7 @@ class PlaywrightManager:
                 
                 if result.returncode == 0:
                     logger.info("使用Python成功安装Playwright")
+                    self._version_checked = False
                     return True
                 else:
                     logger.warning(f"使用Python安装Playwright失败: {result.stderr}")
@@ -206,6 +417,7 @@ class PlaywrightManager:
                 return False
             
             logger.info("Playwright安装完成")
+            self._version_checked = False
             return True
             
         except Exception as e:
@@ -214,7 +426,7 @@ class PlaywrightManager:
     
     def _get_server_command(self) -> Optional[List[str]]:
         """
-        获取启动Playwright服务器的命令
+        获取通过npm运行Playwright命令行的命令
         
         Returns:
             Optional[List[str]]: 命令列表，如果无法确定则返回None
@@ -229,21 +441,193 @@ class PlaywrightManager:
         
         # 返回适当的命令
         if is_npx:
-            return [npm_path, "playwright", "run-server"]
+            return [npm_path, "playwright"]
         else:
-            return [npm_path, "exec", "playwright", "--", "run-server"]
+            return [npm_path, "exec", "playwright", "--"]
+
+    def _server_args(self) -> List[str]:
+        """launch-server的参数，它启动一个共享的浏览器，每个连接在其中创建自己的上下文"""
+        return ["launch-server", "--browser", "chromium", "--config", self._config_path]
+
+    def _write_launch_config(self) -> None:
+        """
+        写入launch-server的配置：监听地址、websocket路径和浏览器的启动参数
+
+        配置可能包含代理密码，文件只有当前用户可读，服务器启动后即删除
+        """
+        config = {
+            "host": "127.0.0.1",
+            "port": self.port,
+            "wsPath": self._ws_path,
+            "headless": CHROME_HEADLESS,
+            "args": BROWSER_ARGS,
+        }
+        if CHROME_PROXY_SERVER:
+            config["proxy"] = {"server": CHROME_PROXY_SERVER}
+            if CHROME_PROXY_USERNAME:
+                config["proxy"]["username"] = CHROME_PROXY_USERNAME
+            if CHROME_PROXY_PASSWORD:
+                config["proxy"]["password"] = CHROME_PROXY_PASSWORD
+        fd = os.open(self._config_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(config, f)
+
+    def _is_healthy(self, timeout: float = 2) -> bool:
+        """
+        检查服务器是否能响应HTTP请求，由本进程启动时还要求进程存活
+
+        Args:
+            timeout: 请求的超时秒数
+
+        Returns:
+            bool: 服务器是否健康
+        """
+        if self.server_process is not None and self.server_process.poll() is not None:
+            return False
+        return _endpoint_healthy(self.port, self._ws_path, timeout)
     
+    def _wait_until_ready(self, timeout: float) -> bool:
+        """
+        等待服务器开始响应，代替固定的等待时间
+
+        Args:
+            timeout: 最长等待秒数
+
+        Returns:
+            bool: 服务器是否已就绪，进程退出或超时返回False
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.server_process.poll() is not None:
+                return False
+            if self._is_healthy():
+                return True
+            time.sleep(0.05)
+        logger.error(f"Playwright服务器在 {timeout} 秒内未就绪")
+        return False
+
+    def _drain_output(self, process: subprocess.Popen) -> None:
+        """
+        把服务器写入日志文件的输出转发到日志，直到进程退出
+
+        服务器的输出写入状态目录中的文件而不是管道，启动它的进程退出后，
+        服务器仍可继续为其他进程服务
+        """
+        with open(self._log_path, "rb") as f:
+            while True:
+                line = f.readline()
+                exited = process.poll() is not None
+                if not line:
+                    if exited:
+                        return
+                    time.sleep(0.1)
+                    continue
+                if not line.endswith(b"\n") and not exited:
+                    # 不完整的行，等待服务器写完
+                    f.seek(-len(line), os.SEEK_CUR)
+                    time.sleep(0.1)
+                    continue
+                text = line.decode("utf-8", errors="ignore").rstrip()
+                if text:
+                    self._output.append(text)
+                    logger.info(f"[playwright-server] {text}")
+
+    def _launch(self, cmd: List[str], env: Optional[dict] = None) -> bool:
+        """
+        启动服务器进程，在后台线程中读取其输出，并等待其就绪
+
+        Args:
+            cmd: 启动命令
+            env: 进程的环境变量，None表示继承当前环境
+
+        Returns:
+            bool: 服务器是否已就绪
+        """
+        # 使用subprocess启动服务器，不显示窗口
+        startupinfo = None
+        if platform.system() == "Windows":
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+
+        self._output.clear()
+        with open(self._log_path, "wb") as log:
+            self.server_process = subprocess.Popen(
+                cmd,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                startupinfo=startupinfo,
+                env=env,
+                # 独立的会话，不会收到终端发给工作进程的信号，停止时也不会向本进程发送信号
+                start_new_session=platform.system() != "Windows",
+            )
+        threading.Thread(
+            target=self._drain_output,
+            args=(self.server_process,),
+            name="playwright-server-output",
+            daemon=True,
+        ).start()
+        return self._wait_until_ready(PLAYWRIGHT_SERVER_TIMEOUT)
+
+    def _discard_failed_process(self) -> str:
+        """
+        结束未能就绪的服务器进程
+
+        Returns:
+            str: 进程最近的输出
+        """
+        if self.server_process.poll() is None:
+            self.server_process.kill()
+        self.server_process.wait()
+        self.server_process = None
+        with open(self._log_path, "rb") as f:
+            lines = f.read().decode("utf-8", errors="ignore").splitlines()
+        return "\n".join(lines[-OUTPUT_LINES:])
+
     def start_server(self) -> bool:
         """
-        启动Playwright MCP服务器
+        启动Playwright服务器，并发调用时只启动一次
         
         Returns:
             bool: 是否成功启动服务器
         """
-        if self.is_running:
-            logger.info("Playwright MCP服务器已在运行")
-            return True
+        with self._lock:
+            if self.is_running:
+                return True
+            if (
+                self._last_failure is not None
+                and time.monotonic() - self._last_failure < START_RETRY_INTERVAL
+            ):
+                return False
             
+            start = time.perf_counter()
+            started = self._acquire_server()
+            if started:
+                logger.info(
+                    f"Playwright服务器已就绪: {self.ws_endpoint}，"
+                    f"用时 {time.perf_counter() - start:.2f} 秒"
+                )
+                self._last_failure = None
+                self._register_atexit()
+                self._start_supervisor()
+            else:
+                self._last_failure = time.monotonic()
+            return started
+
+    def start_in_background(self) -> threading.Thread:
+        """
+        在后台线程中启动服务器，不阻塞调用方
+
+        Returns:
+            threading.Thread: 启动服务器的线程
+        """
+        thread = threading.Thread(
+            target=self.start_server, name="playwright-server-start", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def _start_server(self) -> bool:
+        """启动服务器进程并等待其就绪"""
         try:
             # 检查是否安装了Playwright
             if not self._check_playwright_installed():
@@ -252,41 +636,18 @@ class PlaywrightManager:
                     logger.error("无法安装Playwright，服务器无法启动")
                     return False
             
-            # 尝试优雅地停止任何现有实例
-            self._kill_existing_instances()
-            
             # 尝试使用Python的playwright启动服务器
             try:
                 logger.info("尝试使用Python启动Playwright服务器...")
-                
-                # 使用subprocess启动服务器，不显示窗口
-                startupinfo = None
-                if platform.system() == "Windows":
-                    startupinfo = subprocess.STARTUPINFO()
-                    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                
-                self.server_process = subprocess.Popen(
-                    [sys.executable, "-m", "playwright", "run-server"],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    startupinfo=startupinfo
-                )
-                
-                # 等待服务器启动
-                time.sleep(3)
-                
-                # 检查进程是否仍在运行
-                if self.server_process.poll() is None:
+                if self._launch(
+                    [sys.executable, "-m", "playwright", *self._server_args()]
+                ):
                     self.is_running = True
-                    logger.info("Playwright MCP服务器已使用Python启动")
-                    
-                    # 注册程序退出时关闭服务器
-                    atexit.register(self.stop_server)
-                    
+                    logger.info("Playwright服务器已使用Python启动")
                     return True
                 else:
-                    stdout, stderr = self.server_process.communicate()
-                    logger.warning(f"使用Python启动Playwright服务器失败: {stderr.decode('utf-8', errors='ignore')}")
+                    output = self._discard_failed_process()
+                    logger.warning(f"使用Python启动Playwright服务器失败: {output}")
             except Exception as e:
                 logger.warning(f"使用Python启动Playwright服务器出错: {e}")
             
@@ -296,15 +657,10 @@ class PlaywrightManager:
             if not cmd:
                 logger.error("无法确定启动Playwright服务器的命令")
                 return False
+            cmd = cmd + self._server_args()
             
             # 启动服务器
-            logger.info(f"启动Playwright MCP服务器: {' '.join(cmd)}")
-            
-            # 使用subprocess启动服务器，不显示窗口
-            startupinfo = None
-            if platform.system() == "Windows":
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            logger.info(f"启动Playwright服务器: {' '.join(cmd)}")
             
             # 创建node_modules/.bin目录（如果不存在），这可能是playwright查找的位置
             node_modules_bin = Path.cwd() / "node_modules" / ".bin"
@@ -319,112 +675,271 @@ class PlaywrightManager:
                 else:
                     env["PATH"] = f"{npm_dir}:{env.get('PATH', '')}"
             
-            self.server_process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                startupinfo=startupinfo,
-                env=env
-            )
-            
-            # 等待服务器启动
-            time.sleep(3)
-            
-            # 检查进程是否仍在运行
-            if self.server_process.poll() is None:
+            if self._launch(cmd, env=env):
                 self.is_running = True
-                logger.info("Playwright MCP服务器已启动")
-                
-                # 注册程序退出时关闭服务器
-                atexit.register(self.stop_server)
-                
+                logger.info("Playwright服务器已启动")
                 return True
             else:
-                stdout, stderr = self.server_process.communicate()
-                logger.error(f"启动Playwright MCP服务器失败: {stderr.decode('utf-8', errors='ignore')}")
+                output = self._discard_failed_process()
+                logger.error(f"启动Playwright服务器失败: {output}")
                 return False
                 
         except Exception as e:
-            logger.error(f"启动Playwright MCP服务器时发生错误: {str(e)}")
+            logger.error(f"启动Playwright服务器时发生错误: {str(e)}")
             return False
     
-    def stop_server(self) -> bool:
+    def _client_id(self) -> int:
+        """本进程在状态文件中的标识"""
+        return os.getpid()
+
+    @contextlib.contextmanager
+    def _host_lock(self):
+        """主机上所有工作进程共用的文件锁，启动、连接和停止服务器都在锁内进行"""
+        os.makedirs(self._state_dir, mode=0o700, exist_ok=True)
+        with open(self._lock_path, "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _read_state(self) -> Optional[dict]:
+        """读取状态文件，不存在或无法解析时返回None"""
+        try:
+            with open(self._state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_state(self, state: dict) -> None:
+        """写入状态文件，先写入临时文件再替换，避免其他进程读到不完整的内容"""
+        path = f"{self._state_path}.tmp"
+        with open(path, "w") as f:
+            json.dump(state, f)
+        os.replace(path, self._state_path)
+
+    def _remove_state(self) -> None:
+        """删除状态文件"""
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._state_path)
+
+    def _acquire_server(self) -> bool:
         """
-        停止Playwright MCP服务器
-        
+        在主机锁内连接已有的服务器，没有可用的服务器时启动一个新的
+
         Returns:
-            bool: 是否成功停止服务器
+            bool: 是否有可用的服务器
         """
-        if not self.is_running or self.server_process is None:
-            return True
-            
         try:
-            logger.info("停止Playwright MCP服务器...")
-            
-            # Windows和POSIX系统有不同的终止进程方法
+            with self._host_lock():
+                state = self._read_state()
+                if state is not None and self._adopt_server(state):
+                    return True
+                # 重启的服务器沿用原来的地址，仍连接着它的进程继续记录在状态文件中
+                clients = []
+                if state is not None and state.get("ws_path") == self._ws_path:
+                    clients = self._live_clients(state)
+
+                # 重启时沿用同一端口和websocket路径，已连接过的地址保持不变
+                if self.port is None:
+                    self.port = _free_port()
+                self._write_launch_config()
+                try:
+                    started = self._start_server()
+                finally:
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(self._config_path)
+                if not started:
+                    return False
+
+                self._write_state(
+                    {
+                        "pid": getattr(self.server_process, "pid", None),
+                        "port": self.port,
+                        "ws_path": self._ws_path,
+                        "clients": clients + [self._client_id()],
+                    }
+                )
+                return True
+        except OSError as e:
+            logger.error(f"无法使用Playwright状态目录 {self._state_dir}: {e}")
+            return False
+
+    def _live_clients(self, state: dict) -> List[int]:
+        """状态文件中除本进程外仍在运行的进程"""
+        return [
+            pid
+            for pid in state.get("clients", [])
+            if pid != self._client_id() and _pid_alive(pid)
+        ]
+
+    def _adopt_server(self, state: dict) -> bool:
+        """
+        连接状态文件中记录的服务器；服务器无响应时只终止记录的进程并删除状态文件
+
+        Args:
+            state: 状态文件的内容
+
+        Returns:
+            bool: 是否连接了已有的服务器
+        """
+        if not _endpoint_healthy(state.get("port"), state.get("ws_path", "")):
+            logger.info("状态文件中的Playwright服务器无响应，将启动新的服务器")
+            self._kill_recorded_server(state)
+            self._remove_state()
+            return False
+
+        self.port = state["port"]
+        self._ws_path = state["ws_path"]
+        self.server_process = None
+        self.is_running = True
+        state["clients"] = self._live_clients(state) + [self._client_id()]
+        self._write_state(state)
+        logger.info(f"连接主机上已有的Playwright服务器: {self.ws_endpoint}")
+        return True
+
+    def _kill_recorded_server(self, state: dict) -> None:
+        """终止状态文件中记录的服务器进程及其启动的浏览器"""
+        pid = state.get("pid")
+        if not pid or not _pid_alive(pid) or not _is_server_process(pid):
+            return
+        logger.info(f"终止状态文件中记录的Playwright服务器进程: {pid}")
+        try:
+            if platform.system() == "Windows":
+                subprocess.run(
+                    ["taskkill", "/F", "/T", "/PID", str(pid)],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+                return
+            os.killpg(pid, signal.SIGTERM)
+            deadline = time.monotonic() + 5
+            while _pid_alive(pid) and time.monotonic() < deadline:
+                time.sleep(0.05)
+            if _pid_alive(pid):
+                os.killpg(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def _register_atexit(self) -> None:
+        """注册程序退出时关闭服务器，重启时不重复注册"""
+        if not self._atexit_registered:
+            atexit.register(self.stop_server)
+            self._atexit_registered = True
+
+    def _start_supervisor(self) -> None:
+        """启动检查服务器健康状况的后台线程"""
+        if self._supervisor is not None and self._supervisor.is_alive():
+            return
+        self._stopping.clear()
+        self._supervisor = threading.Thread(
+            target=self._supervise, name="playwright-server-supervisor", daemon=True
+        )
+        self._supervisor.start()
+
+    def _supervise(self) -> None:
+        """定期检查服务器，进程退出或连续无响应时重启，重启失败时退出"""
+        failures = 0
+        while not self._stopping.wait(PLAYWRIGHT_HEALTH_INTERVAL):
+            with self._lock:
+                if self._stopping.is_set() or not self.is_running:
+                    return
+                if self._is_healthy():
+                    failures = 0
+                    continue
+                exited = (
+                    self.server_process is not None
+                    and self.server_process.poll() is not None
+                )
+                failures += 1
+                if not exited and failures < HEALTH_CHECK_FAILURES:
+                    continue
+
+                logger.warning(
+                    f"Playwright服务器{'已退出' if exited else '无响应'}，正在重启。"
+                    f"最近的输出: {' | '.join(self._output)}"
+                )
+                PLAYWRIGHT_RESTARTS.inc()
+                failures = 0
+                self._terminate_process()
+                self.is_running = False
+                # 其他进程可能已经重启了服务器，此时直接连接
+                if not self._acquire_server():
+                    # 下一个浏览器任务在START_RETRY_INTERVAL后再次尝试启动
+                    self._last_failure = time.monotonic()
+                    return
+
+    def _terminate_process(self) -> None:
+        """终止服务器进程及其启动的浏览器"""
+        if self.server_process is None:
+            return
+        # Windows和POSIX系统有不同的终止进程方法
+        try:
             if platform.system() == "Windows":
                 self.server_process.terminate()
             else:
                 os.killpg(os.getpgid(self.server_process.pid), signal.SIGTERM)
-                
-            # 等待进程终止
-            try:
-                self.server_process.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                # 如果超时，强制终止
-                if platform.system() == "Windows":
-                    self.server_process.kill()
-                else:
-                    os.killpg(os.getpgid(self.server_process.pid), signal.SIGKILL)
-            
-            self.is_running = False
-            self.server_process = None
-            logger.info("Playwright MCP服务器已停止")
-            return True
-            
-        except Exception as e:
-            logger.error(f"停止Playwright MCP服务器时发生错误: {str(e)}")
-            return False
-    
-    def _kill_existing_instances(self):
-        """尝试终止可能正在运行的现有实例"""
+        except ProcessLookupError:
+            pass
+
+        # 等待进程终止
         try:
+            self.server_process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            # 如果超时，强制终止
             if platform.system() == "Windows":
-                # Windows上使用taskkill终止所有playwright进程
-                try:
-                    startupinfo = subprocess.STARTUPINFO()
-                    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                    subprocess.run(
-                        ["taskkill", "/F", "/IM", "playwright.cmd", "/T"], 
-                        stdout=subprocess.DEVNULL,
-                        stderr=subprocess.DEVNULL,
-                        startupinfo=startupinfo
-                    )
-                except Exception:
-                    pass
-                    
-                # 也尝试终止Node进程
-                try:
-                    subprocess.run(
-                        ["taskkill", "/F", "/FI", "IMAGENAME eq node.exe", "/FI", "WINDOWTITLE eq *playwright*"], 
-                        stdout=subprocess.DEVNULL,
-                        stderr=subprocess.DEVNULL,
-                        startupinfo=startupinfo
-                    )
-                except Exception:
-                    pass
+                self.server_process.kill()
             else:
-                # Linux/Mac上使用pkill
-                try:
-                    subprocess.run(
-                        ["pkill", "-f", "playwright"], 
-                        stdout=subprocess.DEVNULL,
-                        stderr=subprocess.DEVNULL
-                    )
-                except Exception:
-                    pass
-        except Exception as e:
-            logger.warning(f"尝试清理现有Playwright实例时出错: {e}")
+                os.killpg(os.getpgid(self.server_process.pid), signal.SIGKILL)
+            self.server_process.wait()
+        self.server_process = None
+
+    def stop_server(self) -> bool:
+        """
+        停止使用Playwright服务器，主机上没有其他进程使用时关闭它
+        
+        Returns:
+            bool: 是否成功停止服务器
+        """
+        self._stopping.set()
+        with self._lock:
+            if not self.is_running:
+                return True
+                
+            try:
+                with self._host_lock():
+                    state = self._read_state()
+                    ours = state is not None and state.get("ws_path") == self._ws_path
+                    clients = self._live_clients(state) if ours else []
+                    if clients:
+                        # 其他进程仍在使用服务器，保持运行，由最后一个进程关闭
+                        state["clients"] = clients
+                        self._write_state(state)
+                        logger.info("其他进程仍在使用Playwright服务器，保持运行")
+                    else:
+                        logger.info("停止Playwright服务器...")
+                        if self.server_process is not None:
+                            self._terminate_process()
+                        elif ours:
+                            self._kill_recorded_server(state)
+                        if ours:
+                            self._remove_state()
+                        logger.info("Playwright服务器已停止")
+                self.server_process = None
+                self.is_running = False
+                return True
+
+            except Exception as e:
+                logger.error(f"停止Playwright服务器时发生错误: {str(e)}")
+                return False
 
 
 # 创建全局管理器实例
@@ -436,6 +951,23 @@ def ensure_playwright_server():
     return playwright_manager.start_server()
 
 
+def get_playwright_ws_endpoint() -> Optional[str]:
+    """
+    确保Playwright服务器正在运行，并返回其websocket地址
+
+    Returns:
+        Optional[str]: websocket地址，服务器无法启动时返回None
+    """
+    if not playwright_manager.start_server():
+        return None
+    return playwright_manager.ws_endpoint
+
+
+def start_playwright_server_in_background():
+    """在后台线程中启动Playwright服务器"""
+    return playwright_manager.start_in_background()
+
+
 def shutdown_playwright_server():
     """关闭Playwright服务器"""
     return playwright_manager.stop_server() 
\ No newline at end of file
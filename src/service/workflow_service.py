@@ -1,18 +1,29 @@
 import logging
 from typing import Optional, List, Dict, Any, AsyncGenerator
 import asyncio
+import contextlib
+import os
 import uuid
 
-from src.config import TEAM_MEMBER_CONFIGRATIONS, TEAM_MEMBERS
+from src.config import TEAM_MEMBER_CONFIGRATIONS, TEAM_MEMBERS, WORKFLOW_RECORD_DIR
 from src.graph import build_graph
-from src.tools.browser import browser_tool
+from src.graph.nodes import detect_handoff
+from src.tools.resources import WorkflowResources, use_workflow_resources
+from src.llms.usage import usage_tracker
+from src.utils.metrics import registry
+from src.utils.logging_setup import log_context, setup_logging
+from src.utils.replay import (
+    WorkflowRecorder,
+    WorkflowRecording,
+    WorkflowReplayer,
+    replay_session,
+)
+from src.utils.tracing import end_workflow_span, start_workflow_span
 from langchain_community.adapters.openai import convert_message_to_dict
+from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,  # Default level is INFO
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
+# Configure logging, written by a background thread
+setup_logging()
 
 
 def enable_debug_logging():
@@ -25,11 +36,18 @@ logger = logging.getLogger(__name__)
 # Create the graph
 graph = build_graph()
 
-# Cache for coordinator messages
-MAX_CACHE_SIZE = 3
 
-# Global variable to track current browser tool instance
-current_browser_tool: Optional[browser_tool] = None
+# graph.astream 的输出模式:
+# debug 提供节点的开始与结束，messages 提供 LLM 的流式输出，
+# updates 提供子图中的工具调用，custom 提供计划步骤，values 提供最终状态
+STREAM_MODES = ["debug", "messages", "updates", "custom", "values"]
+
+ACTIVE_WORKFLOWS = registry.gauge(
+    "deepmanus_active_workflows", "Workflows currently running"
+)
+WORKFLOWS = registry.counter(
+    "deepmanus_workflows_total", "Finished workflows by outcome", ["outcome"]
+)
 
 
 async def initialize_workflow(
@@ -38,6 +56,9 @@ async def initialize_workflow(
     deep_thinking_mode: bool = False,
     search_before_planning: bool = False,
     team_members: Optional[List[str]] = None,
+    record: Optional[str] = None,
+    replay: Optional[WorkflowRecording | str] = None,
+    replay_speed: float = 1.0,
 ) -> AsyncGenerator[Dict[str, Any], None]:
     """
     初始化工作流
@@ -48,6 +69,10 @@ async def initialize_workflow(
         deep_thinking_mode: 是否启用深度思考模式
         search_before_planning: 是否在规划前进行搜索
         team_members: 团队成员列表
+        record: 录制本工作流的 LLM 响应和工具结果的文件路径，
+            默认在设置了 WORKFLOW_RECORD_DIR 时录制到该目录
+        replay: 要回放的录制 (或其文件路径)，LLM 和工具调用都返回录制的结果
+        replay_speed: 回放时录制延迟的倍数，0 表示不等待
         
     Yields:
         Dict[str, Any]: 工作流事件
@@ -65,114 +90,135 @@ async def initialize_workflow(
     streaming_llm_agents = [*team_members, "planner", "coordinator"]
 
     # 重置协调器缓存
-    global current_browser_tool
     coordinator_cache = []
-    current_browser_tool = browser_tool
-    is_handoff_case = False
+    # 本工作流的浏览器、REPL 和子进程，结束或取消时只清理本工作流的资源
+    resources = WorkflowResources(workflow_id)
+    is_handoff_case = None
     is_workflow_triggered = False
+    final_state = {}
+    # 正在输出的 LLM 消息 (节点名, 消息ID)，astream 没有结束事件，遇到其他事件时结束
+    current_llm = None
 
-    try:
-        async for event in graph.astream_events(
-            {
-                # 常量
-                "TEAM_MEMBERS": team_members,
-                "TEAM_MEMBER_CONFIGRATIONS": TEAM_MEMBER_CONFIGRATIONS,
-                # 运行时变量
+    def end_of_llm():
+        nonlocal current_llm, is_handoff_case
+        node, message_id = current_llm
+        current_llm = None
+        if node == "coordinator" and is_handoff_case is None and coordinator_cache:
+            # 回复过短，无法在流式过程中判断，直接输出缓存内容
+            is_handoff_case = False
+            yield {
+                "event": "message",
+                "data": {
+                    "message_id": message_id,
+                    "delta": {"content": "".join(coordinator_cache)},
+                },
+            }
+        yield {
+            "event": "end_of_llm",
+            "data": {"agent_name": node},
+        }
+
+    # 录制或回放本工作流的 LLM 和工具调用
+    session = recording = None
+    callbacks = []
+    if replay is not None:
+        if isinstance(replay, str):
+            replay = WorkflowRecording.load(replay)
+        session = WorkflowReplayer(replay, replay_speed)
+    elif record or WORKFLOW_RECORD_DIR:
+        record = record or os.path.join(WORKFLOW_RECORD_DIR, f"{workflow_id}.json.gz")
+        recording = WorkflowRecording(
+            input={
                 "messages": messages,
                 "deep_thinking_mode": deep_thinking_mode,
                 "search_before_planning": search_before_planning,
-            },
-            version="v2",
-        ):
-            kind = event.get("event")
-            data = event.get("data")
-            name = event.get("name")
-            metadata = event.get("metadata")
-            node = (
-                ""
-                if (metadata.get("checkpoint_ns") is None)
-                else metadata.get("checkpoint_ns").split(":")[0]
-            )
-            langgraph_step = (
-                ""
-                if (metadata.get("langgraph_step") is None)
-                else str(metadata["langgraph_step"])
-            )
-            run_id = "" if (event.get("run_id") is None) else str(event["run_id"])
+                "team_members": team_members,
+            }
+        )
+        session = WorkflowRecorder(recording)
+        callbacks.append(session)
 
-            if kind == "on_chain_start" and name in streaming_llm_agents:
-                if name == "planner":
-                    is_workflow_triggered = True
-                    yield {
-                        "event": "start_of_workflow",
-                        "data": {
-                            "workflow_id": workflow_id,
-                            "input": messages,
-                        },
-                    }
-                yield {
-                    "event": "start_of_agent",
-                    "data": {
-                        "agent_name": name,
-                        "agent_id": f"{workflow_id}_{name}_{langgraph_step}",
-                    },
-                }
-            elif kind == "on_chain_end" and name in streaming_llm_agents:
-                yield {
-                    "event": "end_of_agent",
-                    "data": {
-                        "agent_name": name,
-                        "agent_id": f"{workflow_id}_{name}_{langgraph_step}",
-                    },
-                }
-            elif kind == "on_chat_model_start" and node in streaming_llm_agents:
-                yield {
-                    "event": "start_of_llm",
-                    "data": {"agent_name": node},
-                }
-            elif kind == "on_chat_model_end" and node in streaming_llm_agents:
-                yield {
-                    "event": "end_of_llm",
-                    "data": {"agent_name": node},
-                }
-            elif kind == "on_chat_model_stream" and node in streaming_llm_agents:
-                content = data["chunk"].content
-                if content is None or content == "":
-                    if not data["chunk"].additional_kwargs.get("reasoning_content"):
+    outcome = "error"
+    ACTIVE_WORKFLOWS.inc()
+    # 本工作流的 trace，节点、工具和 LLM 调用的 span 都在其下
+    workflow_span = start_workflow_span(
+        workflow_id, {"workflow.team_members": team_members}
+    )
+    try:
+        with (
+            use_workflow_resources(resources),
+            log_context(workflow_id),
+            replay_session(session),
+        ):
+            async for namespace, mode, data in graph.astream(
+                {
+                    # 常量
+                    "TEAM_MEMBERS": team_members,
+                    "TEAM_MEMBER_CONFIGRATIONS": TEAM_MEMBER_CONFIGRATIONS,
+                    # 运行时变量
+                    "messages": messages,
+                    "deep_thinking_mode": deep_thinking_mode,
+                    "search_before_planning": search_before_planning,
+                },
+                # 所有 LLM 调用的元数据中都带有 workflow_id，用于统计用量
+                config={
+                    "metadata": {"workflow_id": workflow_id},
+                    "callbacks": callbacks,
+                },
+                stream_mode=STREAM_MODES,
+                subgraphs=True,
+            ):
+                if mode == "messages":
+                    chunk, metadata = data
+                    if not isinstance(chunk, AIMessageChunk):
                         continue
-                    yield {
-                        "event": "message",
-                        "data": {
-                            "message_id": data["chunk"].id,
-                            "delta": {
-                                "reasoning_content": (
-                                    data["chunk"].additional_kwargs["reasoning_content"]
-                                )
+                    node = (metadata.get("checkpoint_ns") or "").split(":")[0]
+                    if node not in streaming_llm_agents:
+                        continue
+                    if current_llm is not None and current_llm != (node, chunk.id):
+                        for event in end_of_llm():
+                            yield event
+                    if current_llm is None:
+                        current_llm = (node, chunk.id)
+                        yield {
+                            "event": "start_of_llm",
+                            "data": {"agent_name": node},
+                        }
+
+                    content = chunk.content
+                    if content is None or content == "":
+                        if not chunk.additional_kwargs.get("reasoning_content"):
+                            continue
+                        yield {
+                            "event": "message",
+                            "data": {
+                                "message_id": chunk.id,
+                                "delta": {
+                                    "reasoning_content": (
+                                        chunk.additional_kwargs["reasoning_content"]
+                                    )
+                                },
                             },
-                        },
-                    }
-                else:
-                    if node == "coordinator":
-                        if len(coordinator_cache) < MAX_CACHE_SIZE:
+                        }
+                    elif node == "coordinator":
+                        if is_handoff_case is None:
+                            # 缓存协调器输出，直到能判断是否为handoff
                             coordinator_cache.append(content)
                             cached_content = "".join(coordinator_cache)
-                            if cached_content.startswith("handoff"):
-                                is_handoff_case = True
-                                continue
-                            if len(coordinator_cache) < MAX_CACHE_SIZE:
-                                continue
-                            yield {
-                                "event": "message",
-                                "data": {
-                                    "message_id": data["chunk"].id,
-                                    "delta": {"content": cached_content},
-                                },
-                            }
+                            is_handoff_case = detect_handoff(cached_content)
+                            if is_handoff_case is False:
+                                yield {
+                                    "event": "message",
+                                    "data": {
+                                        "message_id": chunk.id,
+                                        "delta": {"content": cached_content},
+                                    },
+                                }
                         elif not is_handoff_case:
                             yield {
                                 "event": "message",
                                 "data": {
-                                    "message_id": data["chunk"].id,
+                                    "message_id": chunk.id,
                                     "delta": {"content": content},
                                 },
                             }
@@ -180,56 +226,128 @@ async def initialize_workflow(
                         yield {
                             "event": "message",
                             "data": {
-                                "message_id": data["chunk"].id,
+                                "message_id": chunk.id,
                                 "delta": {"content": content},
                             },
                         }
-            elif kind == "on_tool_start" and node in team_members:
+                    continue
+
+                # 计划步骤在规划器输出过程中发出，其他事件都表示 LLM 消息已输出完毕
+                if current_llm is not None and mode != "custom":
+                    for event in end_of_llm():
+                        yield event
+
+                if mode == "debug" and not namespace:
+                    name = data["payload"]["name"]
+                    if name not in streaming_llm_agents:
+                        continue
+                    agent = {
+                        "agent_name": name,
+                        "agent_id": f"{workflow_id}_{name}_{data['step']}",
+                    }
+                    if data["type"] == "task":
+                        if name == "planner":
+                            is_workflow_triggered = True
+                            yield {
+                                "event": "start_of_workflow",
+                                "data": {
+                                    "workflow_id": workflow_id,
+                                    "input": messages,
+                                },
+                            }
+                        yield {"event": "start_of_agent", "data": agent}
+                    elif data["type"] == "task_result":
+                        yield {"event": "end_of_agent", "data": agent}
+                elif mode == "updates" and namespace:
+                    # 子图中 ReAct 代理的 agent 节点发起工具调用，tools 节点返回结果
+                    node = namespace[0].split(":")[0]
+                    if node not in team_members:
+                        continue
+                    for update in data.values():
+                        for message in (update or {}).get("messages", []):
+                            if isinstance(message, AIMessage):
+                                for tool_call in message.tool_calls:
+                                    yield {
+                                        "event": "tool_call",
+                                        "data": {
+                                            "tool_call_id": f"{workflow_id}_{node}_{tool_call['name']}_{tool_call['id']}",
+                                            "tool_name": tool_call["name"],
+                                            "tool_input": tool_call["args"],
+                                        },
+                                    }
+                            elif isinstance(message, ToolMessage):
+                                yield {
+                                    "event": "tool_call_result",
+                                    "data": {
+                                        "tool_call_id": f"{workflow_id}_{node}_{message.name}_{message.tool_call_id}",
+                                        "tool_name": message.name,
+                                        "tool_result": message.content,
+                                    },
+                                }
+                elif mode == "custom" and data.get("event") == "plan_step":
+                    yield {
+                        "event": "plan_step",
+                        "data": {
+                            "workflow_id": workflow_id,
+                            "index": data["data"]["index"],
+                            "step": data["data"]["step"],
+                        },
+                    }
+                elif mode == "values" and not namespace:
+                    final_state = data
+
+            if current_llm is not None:
+                for event in end_of_llm():
+                    yield event
+
+            if recording is not None:
+                await asyncio.to_thread(recording.save, record)
+                logger.info("工作流已录制到 %s", record)
+
+            final_messages = [
+                convert_message_to_dict(msg) for msg in final_state.get("messages", [])
+            ]
+            if is_workflow_triggered:
+                usage = usage_tracker.pop_workflow(workflow_id)
+                workflow_span.set_attributes(
+                    {
+                        "gen_ai.usage.input_tokens": usage["total"]["prompt_tokens"],
+                        "gen_ai.usage.output_tokens": (
+                            usage["total"]["completion_tokens"]
+                        ),
+                    }
+                )
                 yield {
-                    "event": "tool_call",
-                    "data": {
-                        "tool_call_id": f"{workflow_id}_{node}_{name}_{run_id}",
-                        "tool_name": name,
-                        "tool_input": data.get("input"),
-                    },
+                    "event": "usage",
+                    "data": {"workflow_id": workflow_id, **usage},
                 }
-            elif kind == "on_tool_end" and node in team_members:
                 yield {
-                    "event": "tool_call_result",
+                    "event": "end_of_workflow",
                     "data": {
-                        "tool_call_id": f"{workflow_id}_{node}_{name}_{run_id}",
-                        "tool_name": name,
-                        "tool_result": (
-                            data["output"].content if data.get("output") else ""
-                        ),
+                        "workflow_id": workflow_id,
+                        "messages": final_messages,
                     },
                 }
-            else:
-                continue
-
-        if is_workflow_triggered:
             yield {
-                "event": "end_of_workflow",
+                "event": "final_session_state",
                 "data": {
-                    "workflow_id": workflow_id,
-                    "messages": [
-                        convert_message_to_dict(msg)
-                        for msg in data["output"].get("messages", [])
-                    ],
+                    "messages": final_messages,
                 },
             }
-        yield {
-            "event": "final_session_state",
-            "data": {
-                "messages": [
-                    convert_message_to_dict(msg)
-                    for msg in data["output"].get("messages", [])
-                ],
-            },
-        }
+            outcome = "completed"
+    except (asyncio.CancelledError, GeneratorExit):
+        outcome = "cancelled"
+        raise
     except Exception as e:
         logger.error(f"工作流初始化过程中发生错误: {e}")
         raise
+    finally:
+        ACTIVE_WORKFLOWS.dec()
+        WORKFLOWS.inc(outcome)
+        workflow_span.set_attribute("workflow.outcome", outcome)
+        end_workflow_span(workflow_id)
+        usage_tracker.pop_workflow(workflow_id)
+        await resources.cleanup()
 
 
 async def run_agent_workflow(
@@ -238,6 +356,9 @@ async def run_agent_workflow(
     deep_thinking_mode: bool = False,
     search_before_planning: bool = False,
     team_members: Optional[List[str]] = None,
+    record: Optional[str] = None,
+    replay: Optional[WorkflowRecording | str] = None,
+    replay_speed: float = 1.0,
 ) -> AsyncGenerator[Dict[str, Any], None]:
     """
     运行代理工作流
@@ -248,42 +369,37 @@ async def run_agent_workflow(
         deep_thinking_mode: 是否启用深度思考模式
         search_before_planning: 是否在规划前进行搜索
         team_members: 团队成员列表
+        record: 录制本工作流的 LLM 响应和工具结果的文件路径，
+            默认在设置了 WORKFLOW_RECORD_DIR 时录制到该目录
+        replay: 要回放的录制 (或其文件路径)，LLM 和工具调用都返回录制的结果
+        replay_speed: 回放时录制延迟的倍数，0 表示不等待
         
     Yields:
         Dict[str, Any]: 工作流事件
     """
     try:
-        # 直接使用initialize_workflow的异步生成器
-        async for event in initialize_workflow(
-            messages, debug, deep_thinking_mode, search_before_planning, team_members
-        ):
-            yield event
-            
+        # 显式关闭initialize_workflow的生成器，确保其清理本工作流的资源
+        async with contextlib.aclosing(
+            initialize_workflow(
+                messages,
+                debug,
+                deep_thinking_mode,
+                search_before_planning,
+                team_members,
+                record,
+                replay,
+                replay_speed,
+            )
+        ) as events:
+            async for event in events:
+                yield event
+
     except asyncio.CancelledError:
-        logger.info("工作流被取消，正在清理资源...")
-        # 确保浏览器代理被正确清理
-        if current_browser_tool:
-            try:
-                await current_browser_tool.cleanup()
-            except Exception as e:
-                logger.error(f"清理浏览器代理时发生错误: {e}")
+        logger.info("工作流被取消，已清理资源")
         raise
     except Exception as e:
         logger.error(f"工作流执行过程中发生错误: {e}")
-        # 确保浏览器代理被正确清理
-        if current_browser_tool:
-            try:
-                await current_browser_tool.cleanup()
-            except Exception as cleanup_error:
-                logger.error(f"清理浏览器代理时发生错误: {cleanup_error}")
         yield {
             "event": "error",
             "data": {"error": str(e)}
         }
-    finally:
-        # 确保所有资源都被清理
-        if current_browser_tool:
-            try:
-                await current_browser_tool.cleanup()
-            except Exception as e:
-                logger.error(f"清理浏览器代理资源时发生错误: {e}")
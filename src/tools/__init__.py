@@ -1,7 +1,7 @@
 from .crawl import crawl_tool
 from .file_management import write_file_tool
 from .python_repl import python_repl_tool
-from .search import tavily_tool
+from .search import tavily_tool, multi_search_tool
 from .bash_tool import bash_tool
 from .browser import browser_tool
 
@@ -9,6 +9,7 @@ __all__ = [
     "bash_tool",
     "crawl_tool",
     "tavily_tool",
+    "multi_search_tool",
     "python_repl_tool",
     "write_file_tool",
     "browser_tool",
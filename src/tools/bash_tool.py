@@ -3,11 +3,46 @@ import subprocess
 from typing import Annotated
 from langchain_core.tools import tool
 from .decorators import log_io
+from .resources import get_workflow_resources, kill_process
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 
 
+def _run_command(cmd: str, timeout: int) -> subprocess.CompletedProcess:
+    """
+    Run a shell command like subprocess.run(check=True), in its own process group.
+
+    The process is registered with the current workflow, so that the command and
+    its children are killed when the workflow ends or times out.
+    """
+    resources = get_workflow_resources()
+    process = subprocess.Popen(
+        cmd,
+        shell=True,
+        text=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,
+    )
+    try:
+        if resources:
+            resources.add_process(process)
+        stdout, stderr = process.communicate(timeout=timeout)
+    except BaseException:
+        kill_process(process)
+        process.communicate()
+        raise
+    finally:
+        if resources:
+            resources.remove_process(process)
+    if process.returncode:
+        raise subprocess.CalledProcessError(
+            process.returncode, cmd, output=stdout, stderr=stderr
+        )
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+
 @tool
 @log_io
 def bash_tool(
@@ -20,9 +55,7 @@ def bash_tool(
     logger.info(f"Executing Bash Command: {cmd} with timeout {timeout}s")
     try:
         # Execute the command and capture output
-        result = subprocess.run(
-            cmd, shell=True, check=True, text=True, capture_output=True, timeout=timeout
-        )
+        result = _run_command(cmd, timeout)
         # Return stdout as the result
         return result.stdout
     except subprocess.CalledProcessError as e:
@@ -4,12 +4,15 @@ import json
 import time
 import random
 from pydantic import BaseModel, Field
-from typing import Optional, ClassVar, Type, Dict, Any
+from typing import ClassVar, Type, Dict, Any
 from langchain.tools import BaseTool
 from browser_use import AgentHistoryList, Browser, BrowserConfig
 from browser_use import Agent as BrowserAgent
 from src.llms.llm import vl_llm
 from src.tools.decorators import create_logged_tool
+from src.tools.resources import get_workflow_resources
+from src.tools.screenshots import ScreenshotOptimizer
+from src.playwright_manager import get_playwright_ws_endpoint
 from src.config import (
     CHROME_INSTANCE_PATH,
     CHROME_HEADLESS,
@@ -27,12 +30,19 @@ logger = logging.getLogger(__name__)
 # 最大重试次数
 MAX_BROWSER_RETRIES = 3
 
-def get_browser_config():
-    """创建浏览器配置"""
+def get_browser_config(ws_endpoint=None):
+    """
+    创建浏览器配置
+
+    提供ws_endpoint时连接Playwright服务器中已启动的浏览器，每个任务使用独立的上下文；
+    配置了CHROME_INSTANCE_PATH时仍使用本地的Chrome
+    """
     browser_config = BrowserConfig(
         headless=CHROME_HEADLESS,
         chrome_instance_path=CHROME_INSTANCE_PATH,
     )
+    if ws_endpoint and not CHROME_INSTANCE_PATH:
+        browser_config.wss_url = ws_endpoint
     
     # 确保代理配置正确
     if CHROME_PROXY_SERVER:
@@ -64,9 +74,6 @@ class BrowserTool(BaseTool):
         "Use this tool to interact with web browsers. Input should be a natural language description of what you want to do with the browser, such as 'Go to google.com and search for browser-use', or 'Navigate to Reddit and find the top post about AI'."
     )
 
-    _agent: Optional[BrowserAgent] = None
-    _browser_instance: Optional[Browser] = None
-
     def _generate_browser_result(
         self, result_content: str, generated_gif_path: str
     ) -> dict:
@@ -75,35 +82,7 @@ class BrowserTool(BaseTool):
             "generated_gif_path": generated_gif_path,
         }
 
-    async def terminate(self):
-        """Terminate the browser agent if it exists."""
-        if self._agent and hasattr(self._agent, 'browser') and self._agent.browser:
-            try:
-                await self._agent.browser.close()
-            except Exception as e:
-                logger.error(f"Error terminating browser agent: {str(e)}")
-        
-        if self._browser_instance:
-            try:
-                await self._browser_instance.close()
-            except Exception as e:
-                logger.error(f"Error closing browser instance: {str(e)}")
-                
-        self._agent = None
-        self._browser_instance = None
-
-    async def cleanup(self):
-        """清理浏览器资源"""
-        try:
-            await self.terminate()
-        except Exception as e:
-            logger.error(f"清理浏览器资源时发生错误: {str(e)}")
-            
-        # 确保本地实例变量被正确清理
-        self._agent = None
-        self._browser_instance = None
-
-    async def _create_browser_with_retry(self):
+    async def _create_browser_with_retry(self, ws_endpoint=None):
         """创建浏览器实例，带有重试机制"""
         retry_count = 0
         last_error = None
@@ -113,16 +92,8 @@ class BrowserTool(BaseTool):
                 # 确保历史目录存在
                 os.makedirs(BROWSER_HISTORY_DIR, exist_ok=True)
                 
-                # 如果存在旧实例，关闭它
-                if self._browser_instance:
-                    try:
-                        await self._browser_instance.close()
-                    except Exception:
-                        pass
-                
                 # 创建新的浏览器实例
-                self._browser_instance = Browser(config=get_browser_config())
-                return self._browser_instance
+                return Browser(config=get_browser_config(ws_endpoint))
             except Exception as e:
                 last_error = e
                 retry_count += 1
@@ -137,69 +108,40 @@ class BrowserTool(BaseTool):
         logger.error(f"创建浏览器实例失败，已重试 {MAX_BROWSER_RETRIES} 次: {last_error}")
         raise last_error or Exception("创建浏览器实例失败")
 
-    def _run(self, instruction: str) -> str:
-        """Run the browser task synchronously."""
+    async def _run_browser_agent(self, instruction: str) -> str:
+        """在当前事件循环中创建浏览器并执行任务，浏览器登记在所属工作流的资源中"""
         generated_gif_path = f"{BROWSER_HISTORY_DIR}/{uuid.uuid4()}.gif"
+        resources = get_workflow_resources()
         browser = None
         try:
-            # 使用事件循环创建浏览器
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                browser = loop.run_until_complete(self._create_browser_with_retry())
-                
-                self._agent = BrowserAgent(
-                    task=instruction,
-                    llm=vl_llm,
-                    browser=browser,
-                    generate_gif=generated_gif_path,
-                )
-
-                result = loop.run_until_complete(self._agent.run())
-                if isinstance(result, AgentHistoryList):
-                    return json.dumps(
-                        self._generate_browser_result(
-                            result.final_result(), generated_gif_path
-                        )
-                    )
-                else:
-                    return json.dumps(
-                        self._generate_browser_result(result, generated_gif_path)
-                    )
-            finally:
-                loop.close()
-        except Exception as e:
-            logger.error(f"Error executing browser task: {str(e)}")
-            return f"Error executing browser task: {str(e)}"
-        finally:
-            # 确保浏览器被关闭
-            if browser:
-                try:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    loop.run_until_complete(browser.close())
-                    loop.close()
-                except Exception as e:
-                    logger.error(f"Error closing browser: {str(e)}")
+            # 第一次执行浏览器任务时启动Playwright服务器，之后的任务连接其中已启动的浏览器，
+            # 服务器无法启动时在本地启动浏览器
+            ws_endpoint = await asyncio.to_thread(get_playwright_ws_endpoint)
+            if not ws_endpoint:
+                logger.warning("Playwright服务器未运行，在本地启动浏览器")
 
-    async def _arun(self, instruction: str) -> str:
-        """Run the browser task asynchronously."""
-        generated_gif_path = f"{BROWSER_HISTORY_DIR}/{uuid.uuid4()}.gif"
-        browser = None
-        try:
             # 使用重试机制创建浏览器
-            browser = await self._create_browser_with_retry()
-            
-            self._agent = BrowserAgent(
+            browser = await self._create_browser_with_retry(ws_endpoint)
+            if resources:
+                # 工作流结束或取消时由其资源负责关闭浏览器
+                resources.add_browser(browser, asyncio.get_running_loop())
+
+            agent = BrowserAgent(
                 task=instruction,
                 llm=vl_llm,
                 browser=browser,
                 generate_gif=generated_gif_path,
             )
-            
+            # 发送给视觉模型的截图经过裁剪、缩小和重新编码，页面没有变化时复用上一张图片
+            window = agent.browser_context.config.browser_window_size
+            screenshots = ScreenshotOptimizer(
+                viewport=(window["width"], window["height"])
+            )
+            screenshots.attach(agent.message_manager)
+
             # 添加超时控制
             try:
-                result = await asyncio.wait_for(self._agent.run(), timeout=300)  # 5分钟超时
+                result = await asyncio.wait_for(agent.run(), timeout=300)  # 5分钟超时
                 if isinstance(result, AgentHistoryList):
                     return json.dumps(
                         self._generate_browser_result(
@@ -217,17 +159,40 @@ class BrowserTool(BaseTool):
                         "Browser task timed out after 5 minutes", generated_gif_path
                     )
                 )
+            finally:
+                stats = screenshots.stats
+                if stats.screenshots:
+                    logger.info(
+                        f"浏览器任务的截图: {stats.screenshots} 张，复用 {stats.reused} 张，"
+                        f"节省 {stats.original_bytes - stats.sent_bytes} 字节、"
+                        f"约 {stats.original_tokens - stats.sent_tokens} 个图像token"
+                    )
         except Exception as e:
             logger.error(f"Error executing browser task: {str(e)}")
             return f"Error executing browser task: {str(e)}"
         finally:
             # 确保浏览器被关闭
             if browser:
+                if resources:
+                    resources.remove_browser(browser)
                 try:
                     await browser.close()
                 except Exception as e:
                     logger.error(f"Error closing browser: {str(e)}")
 
+    def _run(self, instruction: str) -> str:
+        """Run the browser task synchronously."""
+        # 工具运行在工作线程中，使用独立的事件循环
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self._run_browser_agent(instruction))
+        finally:
+            loop.close()
+
+    async def _arun(self, instruction: str) -> str:
+        """Run the browser task asynchronously."""
+        return await self._run_browser_agent(instruction)
+
     async def _browser_task(self, instruction: str) -> Dict[str, Any]:
         """执行浏览器任务"""
         browser = None
@@ -1,11 +1,163 @@
 import logging
 import functools
-from typing import Any, Callable, Type, TypeVar
+import threading
+import time
+from typing import Any, Callable, Dict, Type, TypeVar
+
+from langchain_core.tools import BaseTool
+
+from src.utils.metrics import registry
+from src.utils.replay import acall_tool, call_tool
+from src.utils.tracing import span
 
 logger = logging.getLogger(__name__)
 
 T = TypeVar("T")
 
+# Characters of each argument and result shown in debug logs
+PREVIEW_CHARS = 300
+
+TOOL_DURATION = registry.histogram(
+    "deepmanus_tool_duration_seconds", "Duration of tool calls", ["tool"]
+)
+
+
+class ToolStats:
+    """Call count, duration and result size of one tool."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.total_result_size = 0
+        self.max_result_size = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, result_size: int, failed: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            self.errors += failed
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            self.total_result_size += result_size
+            self.max_result_size = max(self.max_result_size, result_size)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = self.calls or 1
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "avg_seconds": round(self.total_seconds / calls, 4),
+                "max_seconds": round(self.max_seconds, 4),
+                "avg_result_size": self.total_result_size // calls,
+                "max_result_size": self.max_result_size,
+            }
+
+
+_tool_stats: Dict[str, ToolStats] = {}
+_tool_stats_lock = threading.Lock()
+
+
+def get_tool_stats(name: str) -> ToolStats:
+    """Get the stats of a tool, created on its first call."""
+    stats = _tool_stats.get(name)
+    if stats is None:
+        with _tool_stats_lock:
+            stats = _tool_stats.setdefault(name, ToolStats(name))
+    return stats
+
+
+def tool_stats_summary() -> Dict[str, Dict[str, Any]]:
+    """
+    Get the stats of every tool called by this process.
+
+    Returns:
+        dict: Calls, errors, durations and result sizes by tool name
+    """
+    return {name: stats.to_dict() for name, stats in list(_tool_stats.items())}
+
+
+def _size(value: Any) -> int:
+    """The length of a value's text, without formatting large strings."""
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_size(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_size(item) for item in value)
+    return len(str(value))
+
+
+def _preview(value: Any) -> str:
+    text = value if isinstance(value, str) else str(value)
+    if len(text) <= PREVIEW_CHARS:
+        return text
+    return f"{text[:PREVIEW_CHARS]}... ({len(text)} chars)"
+
+
+def _format_params(args: tuple, kwargs: dict) -> str:
+    return ", ".join(
+        [
+            *(_preview(arg) for arg in args),
+            *(f"{k}={_preview(v)}" for k, v in kwargs.items()),
+        ]
+    )
+
+
+class _ToolCall:
+    """
+    Instruments one tool call: debug logs, stats, the duration metric and a span.
+
+    Arguments and results are only formatted when debug logging is enabled.
+    """
+
+    __slots__ = ("name", "args", "kwargs", "result", "_start", "_context", "_span")
+
+    def __init__(self, name: str, args: tuple, kwargs: dict):
+        self.name = name
+        self.args = args
+        self.kwargs = kwargs
+        self.result = None
+
+    def __enter__(self) -> "_ToolCall":
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Tool %s called with parameters: %s",
+                self.name,
+                _format_params(self.args, self.kwargs),
+            )
+        self._context = span(f"tool {self.name}")
+        self._span = self._context.__enter__()
+        if self._span.is_recording():
+            self._span.set_attribute("tool.input_size", _size((self.args, self.kwargs)))
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        seconds = time.perf_counter() - self._start
+        failed = exc is not None
+        result_size = 0 if failed else _size(self.result)
+
+        TOOL_DURATION.observe(seconds, self.name)
+        get_tool_stats(self.name).record(seconds, result_size, failed)
+        if self._span.is_recording():
+            self._span.set_attribute("tool.output_size", result_size)
+        # The span records the exception, if any
+        self._context.__exit__(exc_type, exc, traceback)
+        if failed:
+            return
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Tool %s returned %d chars in %.3fs: %s",
+                self.name,
+                result_size,
+                seconds,
+                _preview(self.result),
+            )
+
 
 def log_io(func: Callable) -> Callable:
     """
@@ -20,20 +172,9 @@ def log_io(func: Callable) -> Callable:
 
     @functools.wraps(func)
     def wrapper(*args: Any, **kwargs: Any) -> Any:
-        # Log input parameters
-        func_name = func.__name__
-        params = ", ".join(
-            [*(str(arg) for arg in args), *(f"{k}={v}" for k, v in kwargs.items())]
-        )
-        logger.debug(f"Tool {func_name} called with parameters: {params}")
-
-        # Execute the function
-        result = func(*args, **kwargs)
-
-        # Log the output
-        logger.debug(f"Tool {func_name} returned: {result}")
-
-        return result
+        with _ToolCall(func.__name__, args, kwargs) as call:
+            call.result = call_tool(func.__name__, func, args, kwargs)
+        return call.result
 
     return wrapper
 
@@ -41,22 +182,20 @@ def log_io(func: Callable) -> Callable:
 class LoggedToolMixin:
     """A mixin class that adds logging functionality to any tool."""
 
-    def _log_operation(self, method_name: str, *args: Any, **kwargs: Any) -> None:
-        """Helper method to log tool operations."""
-        tool_name = self.__class__.__name__.replace("Logged", "")
-        params = ", ".join(
-            [*(str(arg) for arg in args), *(f"{k}={v}" for k, v in kwargs.items())]
-        )
-        logger.debug(f"Tool {tool_name}.{method_name} called with parameters: {params}")
-
     def _run(self, *args: Any, **kwargs: Any) -> Any:
         """Override _run method to add logging."""
-        self._log_operation("_run", *args, **kwargs)
-        result = super()._run(*args, **kwargs)
-        logger.debug(
-            f"Tool {self.__class__.__name__.replace('Logged', '')} returned: {result}"
-        )
-        return result
+        with _ToolCall(self.name, args, kwargs) as call:
+            call.result = call_tool(self.name, super()._run, args, kwargs)
+        return call.result
+
+    async def _arun(self, *args: Any, **kwargs: Any) -> Any:
+        """Override _arun method to add logging."""
+        if super()._arun.__func__ is BaseTool._arun:
+            # The default _arun runs the logged _run in a thread
+            return await super()._arun(*args, **kwargs)
+        with _ToolCall(self.name, args, kwargs) as call:
+            call.result = await acall_tool(self.name, super()._arun, args, kwargs)
+        return call.result
 
 
 def create_logged_tool(base_tool_class: Type[T]) -> Type[T]:
@@ -3,8 +3,9 @@ from typing import Annotated
 from langchain_core.tools import tool
 from langchain_experimental.utilities import PythonREPL
 from .decorators import log_io
+from .resources import get_workflow_resources
 
-# Initialize REPL and logger
+# Initialize REPL and logger, workflows use their own REPL
 repl = PythonREPL()
 logger = logging.getLogger(__name__)
 
@@ -25,7 +26,8 @@ def python_repl_tool(
 
     logger.info("Executing Python code")
     try:
-        result = repl.run(code)
+        resources = get_workflow_resources()
+        result = (resources.python_repl if resources else repl).run(code)
         # Check if the result is an error message by looking for typical error patterns
         if isinstance(result, str) and ("Error" in result or "Exception" in result):
             logger.error(result)
@@ -0,0 +1,175 @@
+"""
+Resources opened by the tools of a single workflow.
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+import signal
+import subprocess
+import threading
+import weakref
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Set
+
+from browser_use import Browser
+from langchain_experimental.utilities import PythonREPL
+
+from src.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+BROWSERS_OPEN = registry.gauge(
+    "deepmanus_browsers_open", "Browsers opened by running workflows"
+)
+PROCESSES_RUNNING = registry.gauge(
+    "deepmanus_processes_running", "Subprocesses started by running workflows"
+)
+
+# Seconds to wait for a browser to close when the workflow ends
+BROWSER_CLOSE_TIMEOUT = 10
+
+_current_resources: ContextVar[Optional["WorkflowResources"]] = ContextVar(
+    "workflow_resources", default=None
+)
+
+# Resources of the workflows that have not been cleaned up yet
+_open_resources: "weakref.WeakSet[WorkflowResources]" = weakref.WeakSet()
+
+
+class WorkflowClosedError(RuntimeError):
+    """Raised when a tool opens a resource after its workflow has ended."""
+
+
+class WorkflowResources:
+    """
+    The browsers, Python REPL and subprocesses of one workflow.
+
+    Tools register what they open here, so that the workflow can close them
+    when it completes or is cancelled without touching other workflows.
+    Tools run in worker threads, so registration is thread safe.
+    """
+
+    def __init__(self, workflow_id: str):
+        self.workflow_id = workflow_id
+        self.closed = False
+        self._lock = threading.Lock()
+        # Each browser is driven by the event loop of the thread that created it
+        self._browsers: Dict[Browser, asyncio.AbstractEventLoop] = {}
+        self._processes: Set[subprocess.Popen] = set()
+        self._python_repl: Optional[PythonREPL] = None
+        _open_resources.add(self)
+
+    def _check_open(self) -> None:
+        if self.closed:
+            raise WorkflowClosedError(f"Workflow {self.workflow_id} has ended")
+
+    @property
+    def python_repl(self) -> PythonREPL:
+        """The workflow's own REPL, so variables are not shared between workflows."""
+        with self._lock:
+            self._check_open()
+            if self._python_repl is None:
+                self._python_repl = PythonREPL()
+            return self._python_repl
+
+    def add_browser(self, browser: Browser, loop: asyncio.AbstractEventLoop) -> None:
+        with self._lock:
+            self._check_open()
+            if browser not in self._browsers:
+                BROWSERS_OPEN.inc()
+            self._browsers[browser] = loop
+
+    def remove_browser(self, browser: Browser) -> None:
+        with self._lock:
+            if self._browsers.pop(browser, None) is not None:
+                BROWSERS_OPEN.dec()
+
+    def add_process(self, process: subprocess.Popen) -> None:
+        with self._lock:
+            self._check_open()
+            if process not in self._processes:
+                PROCESSES_RUNNING.inc()
+            self._processes.add(process)
+
+    def remove_process(self, process: subprocess.Popen) -> None:
+        with self._lock:
+            if process in self._processes:
+                self._processes.remove(process)
+                PROCESSES_RUNNING.dec()
+
+    async def _close_browser(
+        self, browser: Browser, loop: asyncio.AbstractEventLoop
+    ) -> None:
+        try:
+            if loop.is_running() and loop is not asyncio.get_running_loop():
+                # The browser task is still running in its tool thread
+                future = asyncio.run_coroutine_threadsafe(browser.close(), loop)
+                await asyncio.wait_for(
+                    asyncio.wrap_future(future), BROWSER_CLOSE_TIMEOUT
+                )
+            elif not loop.is_closed():
+                await browser.close()
+        except Exception as e:
+            logger.error(f"Error closing browser of workflow {self.workflow_id}: {e}")
+
+    async def cleanup(self) -> None:
+        """Close every resource of the workflow, tools can no longer open new ones."""
+        with self._lock:
+            self.closed = True
+            browsers = list(self._browsers.items())
+            processes = list(self._processes)
+            self._browsers.clear()
+            self._processes.clear()
+            self._python_repl = None
+        _open_resources.discard(self)
+        BROWSERS_OPEN.dec(amount=len(browsers))
+        PROCESSES_RUNNING.dec(amount=len(processes))
+
+        for process in processes:
+            kill_process(process)
+        await asyncio.gather(
+            *(self._close_browser(browser, loop) for browser, loop in browsers)
+        )
+        if browsers or processes:
+            logger.info(
+                f"Closed {len(browsers)} browsers and {len(processes)} processes "
+                f"of workflow {self.workflow_id}"
+            )
+
+
+def kill_process(process: subprocess.Popen) -> None:
+    """Kill a process started with start_new_session=True and its children."""
+    if process.poll() is not None:
+        return
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+
+
+async def close_all_workflow_resources() -> None:
+    """Close the resources of the workflows still running, when the server shuts down."""
+    resources = list(_open_resources)
+    await asyncio.gather(*(r.cleanup() for r in resources))
+    if resources:
+        logger.info(f"Closed the resources of {len(resources)} unfinished workflows")
+
+
+def get_workflow_resources() -> Optional[WorkflowResources]:
+    """Return the resources of the running workflow, None outside of a workflow."""
+    return _current_resources.get()
+
+
+@contextlib.contextmanager
+def use_workflow_resources(resources: WorkflowResources) -> Iterator[None]:
+    """Make `resources` the current workflow's resources for the tools it runs."""
+    token = _current_resources.set(resources)
+    try:
+        yield
+    finally:
+        _current_resources.reset(token)
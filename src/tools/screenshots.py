@@ -0,0 +1,275 @@
+"""
+Shrink the screenshots the browser agent sends to the vision model.
+
+browser_use puts a full-resolution PNG of the page into every step's prompt,
+and image tokens dominate the latency and cost of those calls. The
+ScreenshotOptimizer attached to an agent's message manager crops each
+screenshot to the viewport, downscales and re-encodes it. When the page is the
+same as in the last screenshot sent, that image is sent again without encoding
+it anew. browser_use drops the previous state message after each step, so
+every prompt must carry its own image. The screenshots kept in the agent's
+history (and its GIF) are not changed.
+"""
+
+import base64
+import hashlib
+import io
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage
+from PIL import Image
+
+from src.config import (
+    BROWSER_SCREENSHOT_FORMAT,
+    BROWSER_SCREENSHOT_MAX_WIDTH,
+    BROWSER_SCREENSHOT_QUALITY,
+    BROWSER_SCREENSHOT_SKIP_DISTANCE,
+)
+from src.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+SCREENSHOTS = registry.counter(
+    "deepmanus_browser_screenshots_total",
+    "Screenshots taken for the browser agent, newly encoded or reused as unchanged",
+    ["outcome"],
+)
+SCREENSHOT_BYTES = registry.counter(
+    "deepmanus_browser_screenshot_bytes_total",
+    "Bytes of the screenshots as taken and as sent to the vision model",
+    ["stage"],
+)
+SCREENSHOT_TOKENS = registry.counter(
+    "deepmanus_browser_screenshot_tokens_total",
+    "Estimated image tokens of the screenshots as taken and as sent",
+    ["stage"],
+)
+
+_MIME_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp", "png": "image/png"}
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """
+    Image tokens of a high detail image for OpenAI vision models.
+
+    The image is scaled to fit 2048x2048, then its shortest side to 768, and
+    costs 170 tokens per 512px tile plus 85.
+    """
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    tiles = -(-int(width) // 512) * -(-int(height) // 512)
+    return 85 + 170 * tiles
+
+
+def perceptual_hash(image: Image.Image) -> int:
+    """
+    64-bit difference hash of an image.
+
+    Each bit tells whether a pixel of a 9x8 grayscale thumbnail is brighter than
+    its right neighbour, so small changes (a blinking cursor) flip few bits.
+    """
+    pixels = list(
+        image.convert("L").resize((9, 8), Image.Resampling.BILINEAR).getdata()
+    )
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left, right = pixels[row * 9 + col], pixels[row * 9 + col + 1]
+            bits = bits << 1 | (left > right)
+    return bits
+
+
+def hash_distance(a: int, b: int) -> int:
+    """Number of bits in which two perceptual hashes differ."""
+    return bin(a ^ b).count("1")
+
+
+class ScreenshotStats:
+    """What the optimizer saved over one browser task."""
+
+    def __init__(self):
+        self.screenshots = 0
+        self.reused = 0
+        self.original_bytes = 0
+        self.sent_bytes = 0
+        self.original_tokens = 0
+        self.sent_tokens = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "screenshots": self.screenshots,
+            "reused": self.reused,
+            "original_bytes": self.original_bytes,
+            "sent_bytes": self.sent_bytes,
+            "saved_bytes": self.original_bytes - self.sent_bytes,
+            "original_tokens": self.original_tokens,
+            "sent_tokens": self.sent_tokens,
+            "saved_tokens": self.original_tokens - self.sent_tokens,
+        }
+
+
+class ScreenshotOptimizer:
+    """
+    Rewrites the screenshot in each state message of a browser_use agent.
+
+    Args:
+        viewport: Browser viewport (width, height), taller screenshots are cropped
+            to its aspect ratio
+        max_width: Screenshots are downscaled to at most this width
+        image_format: jpeg, webp or png
+        quality: Encoder quality for jpeg and webp
+        skip_distance: A screenshot whose perceptual hash differs from the last
+            one sent by at most this many bits reuses its image, -1 reuses it only
+            for identical pixels
+    """
+
+    def __init__(
+        self,
+        viewport: Optional[Tuple[int, int]] = None,
+        max_width: int = BROWSER_SCREENSHOT_MAX_WIDTH,
+        image_format: str = BROWSER_SCREENSHOT_FORMAT,
+        quality: int = BROWSER_SCREENSHOT_QUALITY,
+        skip_distance: int = BROWSER_SCREENSHOT_SKIP_DISTANCE,
+    ):
+        image_format = image_format.lower()
+        if image_format not in _MIME_TYPES:
+            raise ValueError(
+                f"Unsupported screenshot format {image_format!r}, "
+                f"expected one of {', '.join(_MIME_TYPES)}"
+            )
+        self.viewport = viewport
+        self.max_width = max_width
+        self.image_format = image_format
+        self.quality = quality
+        self.skip_distance = skip_distance
+        self.stats = ScreenshotStats()
+        # The last image sent: its pixel digest, perceptual hash, data URL,
+        # encoded size and tokens
+        self._last_digest: Optional[bytes] = None
+        self._last_hash: Optional[int] = None
+        self._last_url: Optional[str] = None
+        self._last_bytes = 0
+        self._last_tokens = 0
+
+    def attach(self, message_manager) -> None:
+        """Optimize the screenshots of the state messages added to a MessageManager."""
+        add_state_message = message_manager.add_state_message
+
+        def add_optimized_state_message(*args, **kwargs):
+            add_state_message(*args, **kwargs)
+            managed = message_manager.history.messages[-1]
+            optimized = self.optimize_message(managed.message)
+            if optimized is not managed.message:
+                # Re-add it, so the manager counts the tokens of what is sent
+                message_manager.history.remove_message()
+                message_manager._add_message_with_tokens(optimized)
+
+        message_manager.add_state_message = add_optimized_state_message
+
+    def optimize_message(self, message: BaseMessage) -> BaseMessage:
+        """Return the message with its screenshot optimized."""
+        if not isinstance(message.content, list):
+            return message
+        content = []
+        changed = False
+        for part in message.content:
+            url = (
+                part.get("image_url", {}).get("url", "")
+                if isinstance(part, dict)
+                else ""
+            )
+            if not url.startswith("data:image/"):
+                content.append(part)
+                continue
+            changed = True
+            optimized = self.optimize(url.split(",", 1)[1])
+            content.append({"type": "image_url", "image_url": {"url": optimized}})
+        if not changed:
+            return message
+        return HumanMessage(content=content)
+
+    def optimize(self, screenshot_b64: str) -> str:
+        """
+        Optimize one base64 screenshot.
+
+        Returns:
+            The data URL to send, the last one sent if the page is unchanged
+        """
+        data = base64.b64decode(screenshot_b64)
+        image = Image.open(io.BytesIO(data))
+        self.stats.screenshots += 1
+        self.stats.original_bytes += len(data)
+        original_tokens = estimate_image_tokens(*image.size)
+        self.stats.original_tokens += original_tokens
+        SCREENSHOT_BYTES.inc("captured", amount=len(data))
+        SCREENSHOT_TOKENS.inc("captured", amount=original_tokens)
+
+        image = self._resize(self._crop(image))
+        digest = hashlib.blake2b(image.tobytes(), digest_size=16).digest()
+        image_hash = perceptual_hash(image) if self.skip_distance >= 0 else None
+        if self._last_url is not None and (
+            digest == self._last_digest
+            or (
+                image_hash is not None
+                and hash_distance(image_hash, self._last_hash) <= self.skip_distance
+            )
+        ):
+            self.stats.reused += 1
+            self._count_sent(self._last_bytes, self._last_tokens, "reused")
+            logger.debug("Page unchanged since the last screenshot sent, reusing it")
+            return self._last_url
+
+        image_format = self.image_format
+        encoded = self._encode(image, image_format)
+        if image_format != "png" and len(encoded) > len(data):
+            # Flat pages (plain text on a solid background) compress better as PNG
+            png = self._encode(image, "png")
+            if len(png) < len(encoded):
+                image_format, encoded = "png", png
+        tokens = estimate_image_tokens(*image.size)
+        self._count_sent(len(encoded), tokens, "encoded")
+        encoded_b64 = base64.b64encode(encoded).decode("ascii")
+        self._last_digest = digest
+        self._last_hash = image_hash
+        self._last_url = f"data:{_MIME_TYPES[image_format]};base64,{encoded_b64}"
+        self._last_bytes = len(encoded)
+        self._last_tokens = tokens
+        return self._last_url
+
+    def _count_sent(self, size: int, tokens: int, outcome: str) -> None:
+        self.stats.sent_bytes += size
+        self.stats.sent_tokens += tokens
+        SCREENSHOTS.inc(outcome)
+        SCREENSHOT_BYTES.inc("sent", amount=size)
+        SCREENSHOT_TOKENS.inc("sent", amount=tokens)
+
+    def _crop(self, image: Image.Image) -> Image.Image:
+        """Crop a full page screenshot to the top of the page, as tall as the viewport."""
+        if not self.viewport:
+            return image
+        width, height = self.viewport
+        # The screenshot may be scaled by the device pixel ratio
+        max_height = round(image.width * height / width)
+        if image.height <= max_height:
+            return image
+        return image.crop((0, 0, image.width, max_height))
+
+    def _resize(self, image: Image.Image) -> Image.Image:
+        if image.width <= self.max_width:
+            return image
+        height = round(image.height * self.max_width / image.width)
+        return image.resize((self.max_width, height), Image.Resampling.LANCZOS)
+
+    def _encode(self, image: Image.Image, image_format: str) -> bytes:
+        output = io.BytesIO()
+        if image_format == "png":
+            image.save(output, format="PNG", optimize=True)
+        else:
+            # Neither format has an alpha channel worth sending
+            image.convert("RGB").save(
+                output, format=image_format.upper(), quality=self.quality
+            )
+        return output.getvalue()
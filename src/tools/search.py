@@ -1,10 +1,96 @@
+import contextvars
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated
+
 from langchain_community.tools.tavily_search import TavilySearchResults
-from src.config import TAVILY_MAX_RESULTS
-from .decorators import create_logged_tool
+from langchain_core.tools import tool
+from src.config import (
+    TAVILY_MAX_RESULTS,
+    MULTI_SEARCH_MAX_QUERIES,
+    MULTI_SEARCH_MAX_RESULTS,
+)
+from .decorators import create_logged_tool, log_io
 
 logger = logging.getLogger(__name__)
 
 # Initialize Tavily search tool with logging
 LoggedTavilySearch = create_logged_tool(TavilySearchResults)
 tavily_tool = LoggedTavilySearch(name="tavily_search", max_results=TAVILY_MAX_RESULTS)
+
+
+def merge_search_results(
+    results_per_query: list[list[dict]], max_results: int = MULTI_SEARCH_MAX_RESULTS
+) -> list[dict]:
+    """
+    Merge the results of several searches into a single ranked list.
+
+    Results are deduplicated by URL. URLs returned by more queries rank first,
+    ties are broken by the best Tavily score, then by first appearance.
+
+    Args:
+        results_per_query: The Tavily results of each query
+        max_results: Maximum number of merged results to return
+
+    Returns:
+        The merged, ranked list of results
+    """
+    merged: dict[str, dict] = {}
+    hits: dict[str, int] = {}
+    for results in results_per_query:
+        for result in results:
+            url = result.get("url")
+            if not url:
+                continue
+            hits[url] = hits.get(url, 0) + 1
+            best = merged.get(url)
+            if best is None or (result.get("score") or 0) > (best.get("score") or 0):
+                merged[url] = result
+
+    ranked = sorted(
+        merged,
+        key=lambda url: (hits[url], merged[url].get("score") or 0),
+        reverse=True,
+    )
+    return [merged[url] for url in ranked[:max_results]]
+
+
+def _search(query: str):
+    return tavily_tool.invoke({"query": query})
+
+
+@tool("multi_search")
+@log_io
+def multi_search_tool(
+    queries: Annotated[
+        list[str],
+        "A list of search queries, e.g. several phrasings or aspects of the same question.",
+    ],
+):
+    """Use this to run several web searches at once. The queries are searched concurrently and
+    the results are merged, deduplicated by URL and ranked. Prefer this over repeated searches.
+    """
+    # Drop empty and duplicate queries while keeping their order
+    queries = list(dict.fromkeys(q.strip() for q in queries if q and q.strip()))
+    queries = queries[:MULTI_SEARCH_MAX_QUERIES]
+    if not queries:
+        return "No search queries provided."
+
+    with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+        # Each search runs in a copy of this context, so it belongs to the
+        # workflow's trace, logs and recording
+        futures = [
+            executor.submit(contextvars.copy_context().run, _search, query)
+            for query in queries
+        ]
+        responses = [future.result() for future in futures]
+
+    results_per_query = []
+    for query, response in zip(queries, responses):
+        if isinstance(response, list):
+            results_per_query.append(response)
+        else:
+            logger.error(
+                f"Tavily search for '{query}' returned malformed response: {response}"
+            )
+    return merge_search_results(results_per_query)
@@ -1,14 +1,53 @@
 import logging
 import json
 import json_repair
+import orjson
 
 logger = logging.getLogger(__name__)
 
+# 超过该长度且不以JSON开头的内容不再尝试修复
+REPAIR_SIZE_THRESHOLD = 16 * 1024
+
+
+def loads_json(content: str):
+    """
+    使用orjson严格解析JSON。
+
+    Args:
+        content (str): JSON字符串
+
+    Returns:
+        解析后的对象
+
+    Raises:
+        ValueError: 内容不是合法的JSON
+    """
+    return orjson.loads(content)
+
+
+def dumps_json(obj) -> str:
+    """
+    序列化为JSON字符串，保留非ASCII字符，orjson无法序列化时退回标准库。
+
+    Args:
+        obj: 要序列化的对象
+
+    Returns:
+        str: JSON字符串
+    """
+    try:
+        return orjson.dumps(obj).decode("utf-8")
+    except TypeError:
+        return json.dumps(obj, ensure_ascii=False)
+
 
 def repair_json_output(content: str) -> str:
     """
     修复和规范化 JSON 输出。
 
+    先用严格解析器快速校验，只有解析失败时才调用json_repair；
+    过长且明显不是JSON的内容直接返回。
+
     Args:
         content (str): 可能包含 JSON 的字符串内容
 
@@ -16,18 +55,127 @@ def repair_json_output(content: str) -> str:
         str: 修复后的 JSON 字符串，如果不是 JSON 则返回原始内容
     """
     content = content.strip()
-    if content.startswith(("{", "[")) or "```json" in content:
-        try:
-            # 如果内容被包裹在```json代码块中，提取JSON部分
-            if content.startswith("```json"):
-                content = content.removeprefix("```json")
-
-            if content.endswith("```"):
-                content = content.removesuffix("```")
-
-            # 尝试修复并解析JSON
-            repaired_content = json_repair.loads(content)
-            return json.dumps(repaired_content)
-        except Exception as e:
-            logger.warning(f"JSON repair failed: {e}")
+    if not content.startswith(("{", "[", "```json")):
+        if "```json" not in content or len(content) > REPAIR_SIZE_THRESHOLD:
+            return content
+
+    # 如果内容被包裹在```json代码块中，提取JSON部分
+    candidate = content
+    if candidate.startswith("```json"):
+        candidate = candidate.removeprefix("```json")
+    if candidate.endswith("```"):
+        candidate = candidate.removesuffix("```")
+    candidate = candidate.strip()
+
+    # 已经是合法的JSON，无需修复
+    try:
+        loads_json(candidate)
+        return candidate
+    except ValueError:
+        pass
+
+    try:
+        # 尝试修复并解析JSON
+        repaired_content = json_repair.loads(candidate)
+        # json_repair在无法提取任何JSON时返回空字符串
+        if repaired_content != "":
+            return dumps_json(repaired_content)
+    except Exception as e:
+        logger.warning(f"JSON repair failed: {e}")
     return content
+
+
+class PlanStreamParser:
+    """
+    增量解析流式输出的计划JSON，每当`steps`中的一个步骤完整时立即返回。
+
+    分块内容保存在列表中，每个字符只扫描一次。
+    """
+
+    def __init__(self):
+        self._chunks: list[str] = []
+        # 当前嵌套的容器类型，"{"或"["
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escaped = False
+        # 根对象中最近一个完整的字符串，用于识别键名
+        self._string_chars: list[str] = []
+        self._last_root_string = ""
+        self._steps_depth = None
+        self._step_chars: list[str] | None = None
+        self.steps: list[dict] = []
+
+    @property
+    def text(self) -> str:
+        """目前为止收到的全部内容"""
+        return "".join(self._chunks)
+
+    def feed(self, chunk: str) -> list[dict]:
+        """
+        输入一个新的分块。
+
+        Args:
+            chunk (str): 模型输出的新内容
+
+        Returns:
+            list[dict]: 本次分块中完成的步骤
+        """
+        self._chunks.append(chunk)
+        completed = []
+        for char in chunk:
+            step = self._consume(char)
+            if step is not None:
+                completed.append(step)
+        self.steps.extend(completed)
+        return completed
+
+    def _consume(self, char: str) -> dict | None:
+        if self._step_chars is not None:
+            self._step_chars.append(char)
+
+        if self._in_string:
+            if self._escaped:
+                self._escaped = False
+            elif char == "\\":
+                self._escaped = True
+            elif char == '"':
+                self._in_string = False
+                if len(self._stack) == 1:
+                    self._last_root_string = "".join(self._string_chars)
+            elif len(self._stack) == 1:
+                self._string_chars.append(char)
+            return None
+
+        if char == '"' and self._stack:
+            self._in_string = True
+            self._string_chars = []
+        elif char in "{[":
+            if (
+                char == "["
+                and len(self._stack) == 1
+                and self._last_root_string == "steps"
+            ):
+                self._steps_depth = 2
+            elif char == "{" and len(self._stack) == self._steps_depth:
+                self._step_chars = [char]
+            self._stack.append(char)
+        elif char in "}]" and self._stack:
+            self._stack.pop()
+            if len(self._stack) == self._steps_depth:
+                if char == "}" and self._step_chars is not None:
+                    return self._close_step()
+            elif self._steps_depth and len(self._stack) < self._steps_depth:
+                self._steps_depth = None
+        return None
+
+    def _close_step(self) -> dict | None:
+        step_text = "".join(self._step_chars)
+        self._step_chars = None
+        try:
+            step = loads_json(step_text)
+        except ValueError:
+            step = json_repair.loads(step_text)
+        if not isinstance(step, dict):
+            logger.warning(f"Skipping malformed plan step: {step_text}")
+            return None
+        return step
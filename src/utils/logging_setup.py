@@ -0,0 +1,141 @@
+"""
+Non-blocking logging for the server and the CLI.
+
+Records are put on a queue by the thread that logs them and written by a
+QueueListener thread, so a slow terminal or log collector never blocks the
+event loop. Each record carries the workflow_id of the workflow it belongs to.
+"""
+
+import atexit
+import contextlib
+import copy
+import logging
+import queue
+import sys
+import time
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Iterator, Optional
+
+from src.config import LOG_FORMAT, LOG_LEVEL, LOG_QUEUE_SIZE
+from src.utils.json_utils import dumps_json
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(workflow)s%(message)s"
+
+_workflow_id: ContextVar[Optional[str]] = ContextVar("log_workflow_id", default=None)
+
+_listener: Optional[QueueListener] = None
+
+
+@contextlib.contextmanager
+def log_context(workflow_id: str) -> Iterator[None]:
+    """Tag the records logged inside the block, and by its tools, with workflow_id."""
+    token = _workflow_id.set(workflow_id)
+    try:
+        yield
+    finally:
+        _workflow_id.reset(token)
+
+
+class WorkflowContextFilter(logging.Filter):
+    """Adds the current workflow_id to records, in the thread that logs them."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        workflow_id = _workflow_id.get()
+        record.workflow_id = workflow_id
+        record.workflow = f"[{workflow_id}] " if workflow_id else ""
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created))
+            + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        workflow_id = getattr(record, "workflow_id", None)
+        if workflow_id:
+            entry["workflow_id"] = workflow_id
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return dumps_json(entry)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Drops records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only resolve what cannot cross threads, the writer thread formats the rest
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _remove_console_handlers(logger: logging.Logger) -> None:
+    """Remove synchronous stdout/stderr handlers, e.g. from logging.basicConfig."""
+    for handler in logger.handlers[:]:
+        if type(handler) is logging.StreamHandler and handler.stream in (
+            sys.stdout,
+            sys.stderr,
+        ):
+            logger.removeHandler(handler)
+
+
+def setup_logging(
+    level: str = LOG_LEVEL, json_format: bool = LOG_FORMAT == "json"
+) -> None:
+    """
+    Route all logging through a queue to a background writer thread.
+
+    Safe to call more than once, only the first call configures logging.
+
+    Args:
+        level: The root log level
+        json_format: Write JSON lines instead of text
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(
+        JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT)
+    )
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = _DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(WorkflowContextFilter())
+
+    root = logging.getLogger()
+    _remove_console_handlers(root)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    # browser_use writes to its own console handler, send it through the queue too
+    browser_use_logger = logging.getLogger("browser_use")
+    _remove_console_handlers(browser_use_logger)
+    browser_use_logger.propagate = True
+
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -0,0 +1,465 @@
+"""
+Recording and replay of workflows.
+
+A recording holds the LLM responses and tool results of one workflow, with
+their timings. Replaying it runs the real graph, nodes and streaming while
+every LLM call and tool call returns the recorded result, so changes can be
+benchmarked offline with realistic message sizes and pacing.
+"""
+
+import asyncio
+import contextlib
+import gzip
+import json
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+from uuid import UUID
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    BaseCallbackHandler,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import (
+    ChatGeneration,
+    ChatGenerationChunk,
+    ChatResult,
+    LLMResult,
+)
+from langchain_core.runnables import RunnableLambda, ensure_config
+
+from src.llms.usage import agent_name, response_model, usage_callback
+from src.utils.json_utils import dumps_json, loads_json, repair_json_output
+
+FORMAT_VERSION = 1
+
+# Tool arguments added by LangChain, not by the model
+_INJECTED_TOOL_ARGS = ("run_manager", "callbacks", "config")
+
+_session: ContextVar[Union["WorkflowRecorder", "WorkflowReplayer", None]] = ContextVar(
+    "replay_session", default=None
+)
+# Set while a recorded tool runs, what it calls is part of its result
+_in_tool: ContextVar[bool] = ContextVar("replay_in_tool", default=False)
+
+
+class ReplayError(Exception):
+    """The workflow made an LLM or tool call that the recording does not have."""
+
+
+def _tool_key(name: str, args: tuple, kwargs: dict) -> str:
+    kwargs = {k: v for k, v in kwargs.items() if k not in _INJECTED_TOOL_ARGS}
+    return f"{name}:{json.dumps([args, kwargs], sort_keys=True, default=str)}"
+
+
+def _jsonable(value: Any) -> Any:
+    """The value as the JSON round trip of the recording will return it."""
+    return json.loads(json.dumps(value, default=str))
+
+
+class WorkflowRecording:
+    """
+    The LLM responses and tool results of one workflow.
+
+    Args:
+        input: The workflow's messages and options
+        llm: Responses by agent, in call order
+        tools: Results by tool name and arguments, in call order
+    """
+
+    def __init__(
+        self,
+        input: Optional[Dict[str, Any]] = None,
+        llm: Optional[Dict[str, List[dict]]] = None,
+        tools: Optional[Dict[str, List[dict]]] = None,
+    ):
+        self.input = input or {}
+        self.llm = llm or {}
+        self.tools = tools or {}
+
+    def save(self, path: str) -> None:
+        """Write the recording as gzipped JSON."""
+        content = dumps_json(
+            {
+                "version": FORMAT_VERSION,
+                "input": self.input,
+                "llm": self.llm,
+                "tools": self.tools,
+            }
+        )
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            f.write(content)
+
+    @classmethod
+    def load(cls, path: str) -> "WorkflowRecording":
+        """Read a recording written by save()."""
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = loads_json(f.read())
+        if data.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported recording version: {data.get('version')}")
+        return cls(data["input"], data["llm"], data["tools"])
+
+
+class _LLMRun:
+    __slots__ = ("agent", "start", "first_token", "chunk_sizes", "generation")
+
+    def __init__(self, agent: str):
+        self.agent = agent
+        self.start = time.monotonic()
+        self.first_token: Optional[float] = None
+        # Length of the text of each streamed chunk, replayed with the same sizes
+        self.chunk_sizes: List[int] = []
+        # The chunks streamed so far, in case the reader closes the stream
+        self.generation: Optional[ChatGenerationChunk] = None
+
+
+class WorkflowRecorder(BaseCallbackHandler):
+    """Records the LLM responses and tool results of a workflow."""
+
+    # Only bookkeeping, no need to run it in the executor for async calls
+    run_inline = True
+
+    def __init__(self, recording: WorkflowRecording):
+        self.recording = recording
+        self._lock = threading.Lock()
+        self._runs: Dict[UUID, _LLMRun] = {}
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[BaseMessage]],
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        # The LLM calls of tools, e.g. the browser's, are replayed with the tool
+        if not _in_tool.get():
+            self._runs[run_id] = _LLMRun(agent_name(metadata or {}))
+
+    def on_llm_new_token(
+        self,
+        token: str,
+        *,
+        run_id: UUID,
+        chunk: Optional[ChatGenerationChunk] = None,
+        **kwargs: Any,
+    ) -> None:
+        run = self._runs.get(run_id)
+        if run is None:
+            return
+        if token:
+            run.chunk_sizes.append(len(token))
+        if run.first_token is None:
+            run.first_token = time.monotonic()
+        if isinstance(chunk, ChatGenerationChunk):
+            run.generation = chunk if run.generation is None else run.generation + chunk
+
+    def _record_llm(self, run: _LLMRun, response: LLMResult) -> None:
+        now = time.monotonic()
+        message = response.generations[0][0].message
+        entry = {
+            "content": message.content,
+            "tool_calls": [
+                {"name": c["name"], "args": c["args"], "id": c["id"]}
+                for c in message.tool_calls
+            ],
+            "reasoning_content": message.additional_kwargs.get("reasoning_content"),
+            "usage": message.usage_metadata,
+            "model": response_model(response),
+            "chunk_sizes": run.chunk_sizes,
+            "ttft": (run.first_token or now) - run.start,
+            "latency": now - run.start,
+        }
+        with self._lock:
+            self.recording.llm.setdefault(run.agent, []).append(entry)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            self._record_llm(run, response)
+
+    def on_llm_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        run = self._runs.pop(run_id, None)
+        # A stream closed by its reader, e.g. the coordinator once it hands off,
+        # is replayed up to where it was closed
+        if (
+            run is not None
+            and isinstance(error, GeneratorExit)
+            and run.generation is not None
+        ):
+            self._record_llm(run, LLMResult(generations=[[run.generation]]))
+
+    def _record_tool(self, key: str, result: Any, seconds: float) -> None:
+        call = {"result": _jsonable(result), "seconds": seconds}
+        # e.g. the (content, artifact) pairs of tavily
+        if isinstance(result, tuple):
+            call["tuple"] = True
+        with self._lock:
+            self.recording.tools.setdefault(key, []).append(call)
+
+    def call_tool(self, name: str, func: Callable, args: tuple, kwargs: dict) -> Any:
+        token = _in_tool.set(True)
+        start = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            _in_tool.reset(token)
+        self._record_tool(
+            _tool_key(name, args, kwargs), result, time.monotonic() - start
+        )
+        return result
+
+    async def acall_tool(
+        self, name: str, func: Callable, args: tuple, kwargs: dict
+    ) -> Any:
+        token = _in_tool.set(True)
+        start = time.monotonic()
+        try:
+            result = await func(*args, **kwargs)
+        finally:
+            _in_tool.reset(token)
+        self._record_tool(
+            _tool_key(name, args, kwargs), result, time.monotonic() - start
+        )
+        return result
+
+
+class WorkflowReplayer:
+    """
+    Serves the LLM responses and tool results of a recording, in order.
+
+    Args:
+        recording: The recording to replay
+        speed: Multiplies the recorded delays, 0 replays without waiting
+    """
+
+    def __init__(self, recording: WorkflowRecording, speed: float = 1.0):
+        self.recording = recording
+        self.speed = speed
+        self._lock = threading.Lock()
+        self._llm = {agent: deque(calls) for agent, calls in recording.llm.items()}
+        self._tools = {key: deque(calls) for key, calls in recording.tools.items()}
+
+    def next_llm(self, agent: str) -> dict:
+        with self._lock:
+            calls = self._llm.get(agent)
+            if not calls:
+                raise ReplayError(f"No recorded LLM response left for agent {agent}")
+            return calls.popleft()
+
+    def _next_tool(self, name: str, args: tuple, kwargs: dict) -> dict:
+        key = _tool_key(name, args, kwargs)
+        with self._lock:
+            calls = self._tools.get(key)
+            if not calls:
+                raise ReplayError(f"No recorded result for tool call {key}")
+            return calls.popleft()
+
+    @staticmethod
+    def _result(call: dict) -> Any:
+        return tuple(call["result"]) if call.get("tuple") else call["result"]
+
+    def call_tool(self, name: str, func: Callable, args: tuple, kwargs: dict) -> Any:
+        call = self._next_tool(name, args, kwargs)
+        time.sleep(call["seconds"] * self.speed)
+        return self._result(call)
+
+    async def acall_tool(
+        self, name: str, func: Callable, args: tuple, kwargs: dict
+    ) -> Any:
+        call = self._next_tool(name, args, kwargs)
+        await asyncio.sleep(call["seconds"] * self.speed)
+        return self._result(call)
+
+
+@contextlib.contextmanager
+def replay_session(
+    session: Union[WorkflowRecorder, WorkflowReplayer, None],
+) -> Iterator[None]:
+    """Record or replay the LLM and tool calls made inside the block."""
+    token = _session.set(session)
+    try:
+        yield
+    finally:
+        _session.reset(token)
+
+
+def current_replay() -> Optional[WorkflowReplayer]:
+    """The recording being replayed by the current workflow, if any."""
+    session = _session.get()
+    return session if isinstance(session, WorkflowReplayer) else None
+
+
+def call_tool(name: str, func: Callable, args: tuple, kwargs: dict) -> Any:
+    """Run a tool, recording its result or returning the recorded one."""
+    session = _session.get()
+    if session is None or _in_tool.get():
+        return func(*args, **kwargs)
+    return session.call_tool(name, func, args, kwargs)
+
+
+async def acall_tool(name: str, func: Callable, args: tuple, kwargs: dict) -> Any:
+    """Run an async tool, recording its result or returning the recorded one."""
+    session = _session.get()
+    if session is None or _in_tool.get():
+        return await func(*args, **kwargs)
+    return await session.acall_tool(name, func, args, kwargs)
+
+
+def _split(text: str, sizes: List[int]) -> List[str]:
+    """Split text into chunks of the recorded sizes, or one chunk if they differ."""
+    if not sizes or sum(sizes) != len(text):
+        return [text] if text else []
+    parts = []
+    start = 0
+    for size in sizes:
+        parts.append(text[start : start + size])
+        start += size
+    return parts
+
+
+def _replay_chunks(call: dict) -> List[AIMessageChunk]:
+    """The recorded response as chunks, split like the original stream."""
+    chunks = []
+    if call.get("reasoning_content"):
+        chunks.append(
+            AIMessageChunk(
+                content="",
+                additional_kwargs={"reasoning_content": call["reasoning_content"]},
+            )
+        )
+    content = call["content"]
+    if isinstance(content, str):
+        chunks.extend(
+            AIMessageChunk(content=text)
+            for text in _split(content, call["chunk_sizes"])
+        )
+    else:
+        chunks.append(AIMessageChunk(content=content))
+    last = AIMessageChunk(
+        content="",
+        tool_call_chunks=[
+            {
+                "name": tool_call["name"],
+                "args": json.dumps(tool_call["args"]),
+                "id": tool_call["id"],
+                "index": index,
+            }
+            for index, tool_call in enumerate(call["tool_calls"])
+        ],
+        usage_metadata=call.get("usage"),
+        response_metadata={"model_name": call["model"]} if call.get("model") else {},
+    )
+    return [*chunks, last]
+
+
+def _parse_structured(message: AIMessage) -> Any:
+    """Parse a recorded structured output, from JSON mode or a tool call."""
+    if message.tool_calls:
+        return message.tool_calls[0]["args"]
+    return loads_json(repair_json_output(message.content))
+
+
+class ReplayChatModel(BaseChatModel):
+    """
+    Answers every call with the next recorded response of the calling agent.
+
+    The first chunk waits for the recorded time to first token, the others
+    are spread over the rest of the recorded latency, both scaled by the
+    replay speed.
+    """
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def _next(self) -> Tuple[WorkflowReplayer, dict]:
+        replayer = current_replay()
+        if replayer is None:
+            raise ReplayError("The replay model was called outside of a replay")
+        # The node making the call, LLM.stream() gives no run manager to _stream
+        metadata = ensure_config().get("metadata") or {}
+        return replayer, replayer.next_llm(agent_name(metadata))
+
+    @staticmethod
+    def _delays(replayer: WorkflowReplayer, call: dict, count: int) -> List[float]:
+        ttft = call["ttft"] * replayer.speed
+        rest = max(call["latency"] - call["ttft"], 0) * replayer.speed
+        return [ttft] + [rest / max(count - 1, 1)] * (count - 1)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = None
+        for chunk in self._stream(messages, stop, run_manager, **kwargs):
+            message = chunk.message if message is None else message + chunk.message
+        return ChatResult(
+            generations=[
+                ChatGeneration(
+                    message=AIMessage(
+                        content=message.content,
+                        additional_kwargs=message.additional_kwargs,
+                        tool_calls=message.tool_calls,
+                        usage_metadata=message.usage_metadata,
+                        response_metadata=message.response_metadata,
+                    )
+                )
+            ]
+        )
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        replayer, call = self._next()
+        chunks = _replay_chunks(call)
+        for delay, message in zip(self._delays(replayer, call, len(chunks)), chunks):
+            if delay:
+                time.sleep(delay)
+            chunk = ChatGenerationChunk(message=message)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ):
+        replayer, call = self._next()
+        chunks = _replay_chunks(call)
+        for delay, message in zip(self._delays(replayer, call, len(chunks)), chunks):
+            if delay:
+                await asyncio.sleep(delay)
+            chunk = ChatGenerationChunk(message=message)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    def bind_tools(self, tools, **kwargs):
+        # The recorded responses already name the tools to call
+        return self
+
+    def with_structured_output(self, schema=None, **kwargs):
+        return self | RunnableLambda(_parse_structured)
+
+
+# The chat model of every agent while a recording is replayed
+replay_chat_model = ReplayChatModel(callbacks=[usage_callback])
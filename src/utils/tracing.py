@@ -0,0 +1,232 @@
+"""
+OpenTelemetry tracing of workflows.
+
+Each workflow is one trace: graph nodes are children of the workflow span, and
+the tools, LLM calls and crawls made by a node are children of its span.
+opentelemetry-sdk is optional; without it, or with TRACING_ENABLED off, every
+helper returns a shared no-op span and costs a single attribute check.
+"""
+
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from src.config import (
+    TRACING_ENABLED,
+    TRACING_EXPORTER,
+    TRACING_FILE,
+    TRACING_OTLP_ENDPOINT,
+    TRACING_SAMPLE_RATE,
+)
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "deepmanus"
+
+
+class _NoopSpan:
+    """Stands in for a span when tracing is off."""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def record_exception(self, exception: BaseException) -> None:
+        pass
+
+    def is_recording(self) -> bool:
+        return False
+
+    def end(self) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+_lock = threading.Lock()
+_tracer = None
+_configured = False
+# workflow_id -> the workflow's root span, the parent of its node spans
+_workflow_spans: Dict[str, Any] = {}
+
+
+def _create_exporter():
+    if TRACING_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter,
+        )
+
+        return OTLPSpanExporter(endpoint=TRACING_OTLP_ENDPOINT)
+    if TRACING_EXPORTER != "file":
+        logger.warning(f"Unknown TRACING_EXPORTER {TRACING_EXPORTER}, using file")
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+    return ConsoleSpanExporter(
+        out=open(TRACING_FILE, "a", encoding="utf-8"),
+        formatter=lambda span: span.to_json(indent=None) + "\n",
+    )
+
+
+def configure_tracing(
+    exporter=None, sample_rate: float = TRACING_SAMPLE_RATE, batch: bool = True
+) -> bool:
+    """
+    Set up the tracer, replacing the one configured from the environment.
+
+    Args:
+        exporter: The OpenTelemetry span exporter, None to disable tracing
+        sample_rate: Fraction of workflows traced
+        batch: Export spans in a background thread instead of when they end
+
+    Returns:
+        bool: Whether tracing is enabled
+    """
+    global _tracer, _configured
+    tracer = None
+    if exporter is not None:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import (
+            BatchSpanProcessor,
+            SimpleSpanProcessor,
+        )
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+        provider = TracerProvider(
+            resource=Resource.create({"service.name": SERVICE_NAME}),
+            sampler=ParentBased(TraceIdRatioBased(sample_rate)),
+        )
+        processor = BatchSpanProcessor if batch else SimpleSpanProcessor
+        provider.add_span_processor(processor(exporter))
+        tracer = provider.get_tracer(__name__)
+    with _lock:
+        _tracer = tracer
+        _configured = True
+    return tracer is not None
+
+
+def get_tracer():
+    """The configured tracer, None when tracing is off."""
+    if _configured:
+        return _tracer
+    exporter = None
+    if TRACING_ENABLED:
+        try:
+            exporter = _create_exporter()
+        except ImportError:
+            logger.warning(
+                "TRACING_ENABLED is set but opentelemetry-sdk is not installed, "
+                'tracing is disabled (pip install ".[tracing]")'
+            )
+    configure_tracing(exporter)
+    return _tracer
+
+
+def _context(parent, root: bool = False):
+    from opentelemetry import context, trace
+
+    if root:
+        # Start a new trace, even inside another one
+        return context.Context()
+    if parent is None:
+        return None
+    return trace.set_span_in_context(parent)
+
+
+def start_span(
+    name: str,
+    attributes: Optional[Dict[str, Any]] = None,
+    parent=None,
+    root: bool = False,
+):
+    """
+    Start a span that must be ended with span.end(), e.g. from callbacks.
+
+    Args:
+        name: The span name
+        attributes: Span attributes
+        parent: The parent span, defaults to the current span
+        root: Start a new trace instead
+
+    Returns:
+        The span, or the no-op span when tracing is off
+    """
+    tracer = get_tracer()
+    if tracer is None:
+        return NOOP_SPAN
+    return tracer.start_span(
+        name, context=_context(parent, root), attributes=attributes
+    )
+
+
+def span(name: str, attributes: Optional[Dict[str, Any]] = None, parent=None):
+    """
+    Context manager running the block in a new current span.
+
+    Args:
+        name: The span name
+        attributes: Span attributes
+        parent: The parent span, defaults to the current span
+
+    Returns:
+        A context manager yielding the span, or the no-op span when tracing is off
+    """
+    tracer = get_tracer()
+    if tracer is None:
+        return NOOP_SPAN
+    return tracer.start_as_current_span(
+        name, context=_context(parent), attributes=attributes
+    )
+
+
+def end_span(span, error: Optional[BaseException] = None) -> None:
+    """End a span started with start_span, marking it failed if `error` is set."""
+    if error is not None and span.is_recording():
+        from opentelemetry.trace import Status, StatusCode
+
+        span.record_exception(error)
+        span.set_status(Status(StatusCode.ERROR, str(error)))
+    span.end()
+
+
+def start_workflow_span(workflow_id: str, attributes: Optional[Dict] = None):
+    """
+    Start the root span of a workflow's trace.
+
+    The span is not made current, since the workflow is an async generator;
+    node spans find it by the workflow_id in their run metadata.
+
+    Args:
+        workflow_id: The workflow's ID
+        attributes: Additional span attributes
+
+    Returns:
+        The span, or the no-op span when tracing is off
+    """
+    if get_tracer() is None:
+        return NOOP_SPAN
+    workflow_span = start_span(
+        "workflow", {"workflow_id": workflow_id, **(attributes or {})}, root=True
+    )
+    _workflow_spans[workflow_id] = workflow_span
+    return workflow_span
+
+
+def end_workflow_span(workflow_id: str) -> None:
+    """End the root span of a workflow's trace."""
+    workflow_span = _workflow_spans.pop(workflow_id, None)
+    if workflow_span is not None:
+        workflow_span.end()
+
+
+def get_workflow_span(workflow_id: Optional[str]):
+    """The root span of a running workflow, None if it is not traced."""
+    return _workflow_spans.get(workflow_id) if workflow_id else None
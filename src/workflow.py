@@ -1,12 +1,10 @@
 import logging
 from src.config import TEAM_MEMBER_CONFIGRATIONS, TEAM_MEMBERS
 from src.graph import build_graph
+from src.utils.logging_setup import setup_logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,  # Default level is INFO
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
+# Configure logging, written by a background thread
+setup_logging()
 
 
 def enable_debug_logging():
@@ -48,7 +46,7 @@ def run_agent_workflow(user_input: str, debug: bool = False):
             "search_before_planning": True,
         }
     )
-    logger.debug(f"Final workflow state: {result}")
+    logger.debug("Final workflow state: %s", result)
     logger.info("Workflow completed successfully")
     return result
 
@@ -34,7 +34,6 @@ async def test_browser():
         return False
     finally:
         # 清理资源
-        await browser_tool.cleanup()
         shutdown_playwright_server()
 
 if __name__ == "__main__":
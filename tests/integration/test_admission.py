@@ -0,0 +1,184 @@
+import asyncio
+
+import pytest
+
+from src.api.admission import (
+    AdmissionController,
+    AdmissionRejected,
+    get_resource_class,
+)
+
+
+def _controller(**limits):
+    options = dict(
+        max_concurrent=2,
+        max_per_key=0,
+        max_browser=0,
+        max_queue_size=0,
+        queue_timeout=1.0,
+        retry_after=5,
+    )
+    options.update(limits)
+    return AdmissionController(**options)
+
+
+def test_get_resource_class():
+    """Test that workflows which may use the browser are classed separately"""
+    assert get_resource_class(None) == "browser"
+    assert get_resource_class(["researcher", "browser", "reporter"]) == "browser"
+    assert get_resource_class(["researcher", "reporter"]) == "default"
+
+
+def test_waits_for_a_free_slot():
+    """Test that a request over the limit is admitted once a slot is released"""
+    controller = _controller(max_concurrent=1)
+
+    async def run():
+        first = await controller.acquire("a", "default")
+        second = asyncio.create_task(controller.acquire("b", "default"))
+        await asyncio.sleep(0.01)
+        assert not second.done()
+        assert controller.stats()["queue_depth"] == 1
+        first.release()
+        slot = await second
+        assert controller.stats()["running"] == 1
+        slot.release()
+
+    asyncio.run(run())
+    stats = controller.stats()
+    assert stats["running"] == 0
+    assert stats["admitted"] == 2
+    assert stats["wait_seconds"]["count"] == 2
+    assert stats["wait_seconds"]["max"] > 0
+
+
+def test_released_slots_go_to_waiters_in_order():
+    """Test that waiting requests get released slots before new arrivals, oldest first"""
+    controller = _controller(max_concurrent=1)
+
+    async def run():
+        first = await controller.acquire("a", "default")
+        second = asyncio.create_task(controller.acquire("b", "default"))
+        await asyncio.sleep(0.01)
+        third = asyncio.create_task(controller.acquire("c", "default"))
+        await asyncio.sleep(0.01)
+        first.release()
+        late = asyncio.create_task(controller.acquire("d", "default"))
+        await asyncio.sleep(0.01)
+        assert second.done()
+        assert not third.done() and not late.done()
+        (await second).release()
+        await asyncio.sleep(0.01)
+        assert third.done() and not late.done()
+        (await third).release()
+        (await late).release()
+
+    asyncio.run(run())
+    assert controller.stats()["admitted"] == 4
+
+
+def test_waiter_limited_by_key_does_not_block_others():
+    """Test that a slot goes to a later waiter when the oldest is over its key limit"""
+    controller = _controller(max_concurrent=2, max_per_key=1)
+
+    async def run():
+        first = await controller.acquire("a", "default")
+        second = await controller.acquire("b", "default")
+        same_key = asyncio.create_task(controller.acquire("a", "default"))
+        other_key = asyncio.create_task(controller.acquire("c", "default"))
+        await asyncio.sleep(0.01)
+        second.release()
+        await asyncio.sleep(0.01)
+        assert other_key.done() and not same_key.done()
+        first.release()
+        (await same_key).release()
+        (await other_key).release()
+
+    asyncio.run(run())
+    assert controller.stats()["running"] == 0
+
+
+def test_cancelled_waiter_passes_its_slot_on():
+    """Test that a slot given to a request that went away goes to the next waiter"""
+    controller = _controller(max_concurrent=1)
+
+    async def run():
+        first = await controller.acquire("a", "default")
+        second = asyncio.create_task(controller.acquire("b", "default"))
+        third = asyncio.create_task(controller.acquire("c", "default"))
+        await asyncio.sleep(0.01)
+        first.release()
+        second.cancel()
+        slot = await third
+        assert controller.stats()["running"] == 1
+        slot.release()
+
+    asyncio.run(run())
+    assert controller.stats()["running"] == 0
+    assert controller.stats()["queue_depth"] == 0
+
+
+def test_rejects_after_timeout():
+    """Test that a request is rejected with a retry delay when the wait times out"""
+    controller = _controller(max_concurrent=1, queue_timeout=0.05)
+
+    async def run():
+        await controller.acquire("a", "default")
+        with pytest.raises(AdmissionRejected) as exc_info:
+            await controller.acquire("b", "default")
+        return exc_info.value
+
+    error = asyncio.run(run())
+    assert error.reason == "timeout"
+    assert error.retry_after == 5
+    assert controller.stats()["rejected"] == {"timeout": 1}
+    assert controller.stats()["queue_depth"] == 0
+
+
+def test_rejects_when_queue_is_full():
+    """Test that requests are rejected right away when too many are waiting"""
+    controller = _controller(max_concurrent=1, max_queue_size=1)
+
+    async def run():
+        await controller.acquire("a", "default")
+        waiting = asyncio.create_task(controller.acquire("b", "default"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(AdmissionRejected) as exc_info:
+            await controller.acquire("c", "default")
+        waiting.cancel()
+        return exc_info.value
+
+    assert asyncio.run(run()).reason == "queue_full"
+
+
+def test_per_key_and_browser_limits():
+    """Test that the per key and browser limits apply on top of the global one"""
+    controller = _controller(
+        max_concurrent=10, max_per_key=1, max_browser=1, queue_timeout=0.01
+    )
+
+    async def run():
+        await controller.acquire("a", "default")
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire("a", "default")
+        await controller.acquire("b", "browser")
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire("c", "browser")
+        await controller.acquire("c", "default")
+
+    asyncio.run(run())
+    assert controller.stats()["running_by_class"] == {"default": 2, "browser": 1}
+
+
+def test_release_is_idempotent():
+    """Test that releasing a slot twice frees it only once"""
+    controller = _controller()
+
+    async def run():
+        first = await controller.acquire("a", "default")
+        await controller.acquire("a", "default")
+        first.release()
+        first.release()
+
+    asyncio.run(run())
+    assert controller.stats()["running"] == 1
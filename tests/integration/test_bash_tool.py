@@ -10,7 +10,7 @@ class TestBashTool(unittest.TestCase):
         result = bash_tool.invoke("echo 'Hello World'")
         self.assertEqual(result.strip(), "Hello World")
 
-    @patch("subprocess.run")
+    @patch("src.tools.bash_tool._run_command")
     def test_command_with_error(self, mock_run):
         """Test bash tool when command fails"""
         # Configure mock to raise CalledProcessError
@@ -22,7 +22,7 @@ class TestBashTool(unittest.TestCase):
         self.assertIn("Command failed with exit code 1", result)
         self.assertIn("Command not found", result)
 
-    @patch("subprocess.run")
+    @patch("src.tools.bash_tool._run_command")
     def test_command_with_exception(self, mock_run):
         """Test bash tool when an unexpected exception occurs"""
         # Configure mock to raise a generic exception
@@ -0,0 +1,61 @@
+import logging
+
+import pytest
+
+from src.tools.decorators import PREVIEW_CHARS, get_tool_stats, log_io
+
+
+class Expensive:
+    """An argument that counts how often it is formatted"""
+
+    formatted = 0
+
+    def __str__(self):
+        Expensive.formatted += 1
+        return "expensive"
+
+
+@log_io
+def echo_tool(value, repeat=1):
+    return "x" * 10_000 * repeat
+
+
+@log_io
+def failing_tool():
+    raise RuntimeError("boom")
+
+
+def test_no_formatting_when_debug_is_off(caplog):
+    """Test that arguments and results are not formatted unless DEBUG is enabled"""
+    caplog.set_level(logging.INFO, logger="src.tools.decorators")
+    Expensive.formatted = 0
+    echo_tool(Expensive())
+    assert Expensive.formatted == 0
+    assert caplog.records == []
+
+
+def test_debug_logs_truncated_previews(caplog):
+    """Test that debug logs show truncated previews with sizes"""
+    caplog.set_level(logging.DEBUG, logger="src.tools.decorators")
+    echo_tool("a" * 1000, repeat=2)
+
+    called, returned = [record.getMessage() for record in caplog.records]
+    assert f"{'a' * PREVIEW_CHARS}... (1000 chars)" in called
+    assert "repeat=2" in called
+    assert "returned 20000 chars" in returned
+    assert len(returned) < 500
+
+
+def test_tool_stats():
+    """Test that calls, durations, result sizes and errors are recorded per tool"""
+    echo_tool("a")
+    echo_tool("a", repeat=3)
+    with pytest.raises(RuntimeError):
+        failing_tool()
+
+    stats = get_tool_stats("echo_tool")
+    assert stats.calls >= 2
+    assert stats.max_result_size >= 30_000
+    assert stats.max_seconds > 0
+    assert stats.total_seconds >= stats.max_seconds
+    assert get_tool_stats("failing_tool").to_dict()["errors"] == 1
@@ -0,0 +1,43 @@
+import asyncio
+
+from src.llms.http_client import (
+    _LoopLocalTransport,
+    get_async_http_client,
+    get_http_client,
+)
+from src.llms.llm import create_deepseek_llm, create_openai_llm
+
+
+def test_clients_are_shared_per_host():
+    """Test that base URLs of the same host share one client"""
+    client = get_http_client("https://api.example.com/v1")
+    assert get_http_client("https://API.example.com/v2/") is client
+    assert get_http_client("https://other.example.com/v1") is not client
+    assert get_async_http_client("https://api.example.com/v1") is (
+        get_async_http_client("https://api.example.com")
+    )
+
+
+def test_llms_use_shared_clients():
+    """Test that the LLM clients are built on the shared HTTP clients"""
+    base_url = "https://llm.example.com/v1"
+    openai_llm = create_openai_llm(model="gpt-4o", base_url=base_url, api_key="x")
+    deepseek_llm = create_deepseek_llm(
+        model="deepseek-chat", base_url=base_url, api_key="x"
+    )
+
+    for llm in (openai_llm, deepseek_llm):
+        assert llm.http_client is get_http_client(base_url)
+        assert llm.http_async_client is get_async_http_client(base_url)
+
+
+def test_async_transport_per_event_loop():
+    """Test that each event loop gets its own connection pool"""
+    transport = _LoopLocalTransport()
+
+    async def get_pool():
+        first = transport._transport()
+        assert transport._transport() is first
+        return first
+
+    assert asyncio.run(get_pool()) is not asyncio.run(get_pool())
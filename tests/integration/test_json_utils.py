@@ -0,0 +1,85 @@
+import json
+import pytest
+from src.utils.json_utils import (
+    PlanStreamParser,
+    REPAIR_SIZE_THRESHOLD,
+    repair_json_output,
+)
+
+PLAN = {
+    "thought": 'The user asks about "steps" [1]',
+    "title": "Plan",
+    "steps": [
+        {
+            "agent_name": "researcher",
+            "title": "Search {things}",
+            "description": 'Look for "quoted" text',
+        },
+        {"agent_name": "reporter", "title": "Report", "description": "Write ]}"},
+    ],
+}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 16, 10000])
+def test_plan_stream_parser_emits_steps(chunk_size):
+    """Test that every step is emitted once, whatever the chunking"""
+    text = "```json\n" + json.dumps(PLAN, ensure_ascii=False, indent=2) + "\n```"
+    parser = PlanStreamParser()
+    emitted = []
+    for i in range(0, len(text), chunk_size):
+        emitted.extend(parser.feed(text[i : i + chunk_size]))
+    assert emitted == PLAN["steps"]
+    assert parser.steps == PLAN["steps"]
+    assert parser.text == text
+
+
+def test_plan_stream_parser_emits_step_before_plan_ends():
+    """Test that a step is available as soon as its object is closed"""
+    parser = PlanStreamParser()
+    assert parser.feed('{"title": "t", "steps": [{"agent_name": "coder"') == []
+    assert parser.feed("}, {") == [{"agent_name": "coder"}]
+    assert parser.feed('"agent_name": "reporter"}]}') == [{"agent_name": "reporter"}]
+
+
+def test_plan_stream_parser_ignores_other_arrays():
+    """Test that objects outside the steps array are not emitted"""
+    parser = PlanStreamParser()
+    assert parser.feed('{"other": [{"a": 1}], "steps": []}') == []
+
+
+def test_repair_json_output_valid_json_is_untouched():
+    """Test that valid JSON skips the repair step"""
+    content = '{"title": "计划", "steps": []}'
+    assert repair_json_output(f"  {content}\n") == content
+
+
+def test_repair_json_output_strips_code_fence():
+    """Test that JSON wrapped in a ```json block is extracted"""
+    assert repair_json_output('```json\n{"a": 1}\n```') == '{"a": 1}'
+
+
+def test_repair_json_output_repairs_invalid_json():
+    """Test that malformed JSON is repaired and unicode is preserved"""
+    repaired = repair_json_output('{"title": "计划", "steps": [1, 2,')
+    assert json.loads(repaired) == {"title": "计划", "steps": [1, 2]}
+    assert "计划" in repaired
+
+
+def test_repair_json_output_plain_text():
+    """Test that plain text is returned as is"""
+    assert repair_json_output("# Report\n\nNo JSON here.") == (
+        "# Report\n\nNo JSON here."
+    )
+
+
+def test_repair_json_output_large_report_with_json_block():
+    """Test that long reports embedding a JSON block are not rewritten"""
+    report = "# Report\n\n" + "text " * REPAIR_SIZE_THRESHOLD
+    report += '\n```json\n{"a": 1}\n```'
+    assert repair_json_output(report) == report
+
+
+def test_repair_json_output_unparseable_content():
+    """Test that content json_repair cannot make sense of is kept"""
+    content = "```json\nnot json at all"
+    assert repair_json_output(content) == content
@@ -0,0 +1,58 @@
+from langchain_openai import ChatOpenAI
+from starlette.testclient import TestClient
+
+from benchmarks.fake_openai_server import MODEL, create_app
+from benchmarks.loadtest_sse import StreamResult, parse_sse
+from src.prompts.template import apply_prompt_template
+
+
+def test_fake_openai_server_streams_agent_replies():
+    """Test that an OpenAI client streams the agents' replies from the stub server"""
+    client = TestClient(create_app(reply_length=5))
+    llm = ChatOpenAI(
+        model=MODEL,
+        base_url="http://testserver/v1",
+        api_key="fake",
+        http_client=client,
+        stream_usage=True,
+    )
+    messages = apply_prompt_template(
+        "researcher", {"messages": [{"role": "user", "content": "LangGraph"}]}
+    )
+
+    chunks = list(llm.stream(messages))
+    reply = "".join(chunk.content for chunk in chunks)
+
+    assert len([chunk for chunk in chunks if chunk.content]) == 5
+    assert reply == llm.invoke(messages).content
+    assert (
+        sum(
+            chunk.usage_metadata["output_tokens"]
+            for chunk in chunks
+            if chunk.usage_metadata
+        )
+        == 5
+    )
+
+
+def test_parse_sse_frames():
+    """Test that the load test counts events, tokens and completion from SSE lines"""
+    lines = [
+        "event: start_of_workflow",
+        'data: {"workflow_id": "w"}',
+        "",
+        "event: message",
+        'data: {"message_id": "m", "delta": {"content": "two words"}}',
+        "",
+        "event: final_session_state",
+        'data: {"messages": []}',
+        "",
+    ]
+    result = StreamResult()
+    for i, (event, data) in enumerate(parse_sse(lines)):
+        result.on_event(event, data, elapsed=float(i))
+
+    assert result.events == 3
+    assert result.ttfe == 0.0
+    assert result.tokens == 2
+    assert result.completed and result.error is None
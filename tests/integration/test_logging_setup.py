@@ -0,0 +1,82 @@
+import json
+import logging
+import queue
+from logging.handlers import QueueListener
+
+from src.utils.logging_setup import (
+    JsonFormatter,
+    WorkflowContextFilter,
+    _DroppingQueueHandler,
+    log_context,
+)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self, formatter):
+        super().__init__()
+        self.setFormatter(formatter)
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+
+def _logger(log_queue):
+    handler = _DroppingQueueHandler(log_queue)
+    handler.addFilter(WorkflowContextFilter())
+    logger = logging.getLogger("test_logging_setup")
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    return logger, handler
+
+
+def test_json_lines_with_workflow_id():
+    """Test that records are written as JSON by the listener, tagged with the workflow"""
+    log_queue = queue.Queue()
+    logger, _ = _logger(log_queue)
+    output = ListHandler(JsonFormatter())
+    listener = QueueListener(log_queue, output)
+    listener.start()
+
+    with log_context("wf-1"):
+        logger.info("step %d of %s", 1, "plan")
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("failed")
+    logger.info("outside")
+    listener.stop()
+
+    first, failed, outside = [json.loads(line) for line in output.lines]
+    assert first["message"] == "step 1 of plan"
+    assert first["workflow_id"] == "wf-1"
+    assert first["level"] == "INFO"
+    assert "ValueError: boom" in failed["exception"]
+    assert "workflow_id" not in outside
+
+
+def test_full_queue_drops_records():
+    """Test that logging never blocks when the writer cannot keep up"""
+    logger, handler = _logger(queue.Queue(maxsize=2))
+    for i in range(5):
+        logger.info("record %d", i)
+    assert handler.dropped == 3
+
+
+def test_disabled_debug_payloads_are_not_formatted():
+    """Test that arguments of disabled debug records are never formatted"""
+
+    class Payload:
+        formatted = False
+
+        def __str__(self):
+            Payload.formatted = True
+            return "payload"
+
+    log_queue = queue.Queue()
+    logger, _ = _logger(log_queue)
+    logger.setLevel(logging.INFO)
+    logger.debug("Current state messages: %s", Payload())
+    assert not Payload.formatted
+    assert log_queue.empty()
@@ -0,0 +1,109 @@
+import asyncio
+import uuid
+
+from benchmarks.fakes import ScriptedChatModel, offline_workflow
+from src.api.admission import AdmissionController, register_admission_metrics
+from src.llms.usage import UsageCallbackHandler, UsageTracker
+from src.service.workflow_service import initialize_workflow
+from src.tools.python_repl import python_repl_tool
+from src.utils.metrics import MetricsRegistry, registry
+
+
+def _sample(text, line_start):
+    for line in text.splitlines():
+        if line.startswith(line_start + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+def test_exposition_format():
+    """Test the Prometheus text format of counters, gauges and histograms"""
+    metrics = MetricsRegistry()
+    requests = metrics.counter("requests_total", "Requests", ["path"])
+    requests.inc('/a"b')
+    requests.inc('/a"b', amount=2)
+    metrics.gauge("in_flight", "In flight").set(3)
+    latency = metrics.histogram("latency_seconds", "Latency", ["op"], buckets=[1, 5])
+    for value in (0.5, 1, 3, 10):
+        latency.observe(value, "get")
+
+    text = metrics.render()
+    assert "# TYPE requests_total counter" in text
+    assert _sample(text, 'requests_total{path="/a\\"b"}') == 3
+    assert _sample(text, "in_flight") == 3
+    assert _sample(text, 'latency_seconds_bucket{op="get",le="1"}') == 2
+    assert _sample(text, 'latency_seconds_bucket{op="get",le="5"}') == 3
+    assert _sample(text, 'latency_seconds_bucket{op="get",le="+Inf"}') == 4
+    assert _sample(text, 'latency_seconds_sum{op="get"}') == 14.5
+    assert _sample(text, 'latency_seconds_count{op="get"}') == 4
+
+
+def test_tool_duration_is_recorded():
+    """Test that decorated tools record their duration"""
+    line = 'deepmanus_tool_duration_seconds_count{tool="python_repl_tool"}'
+    before = _sample(registry.render(), line) or 0
+    python_repl_tool.invoke({"code": "print(1)"})
+    assert _sample(registry.render(), line) == before + 1
+
+
+def test_llm_errors_are_counted():
+    """Test that failed LLM calls are counted, but not streams closed by their reader"""
+    handler = UsageCallbackHandler(UsageTracker())
+    line = 'deepmanus_llm_errors_total{model="error-model"}'
+    before = _sample(registry.render(), line) or 0
+
+    for error in (ValueError("API error"), GeneratorExit()):
+        run_id = uuid.uuid4()
+        handler.on_chat_model_start(
+            {},
+            [[]],
+            run_id=run_id,
+            invocation_params={"model": "error-model"},
+        )
+        handler.on_llm_error(error, run_id=run_id)
+
+    assert _sample(registry.render(), line) == before + 1
+
+
+def test_workflow_metrics():
+    """Test that a workflow records node and LLM durations and is no longer active"""
+
+    async def run():
+        async for _ in initialize_workflow(
+            [{"role": "user", "content": "Write a report on LangGraph"}]
+        ):
+            pass
+
+    with offline_workflow(ScriptedChatModel(reply_tokens=3)):
+        asyncio.run(run())
+
+    text = registry.render()
+    assert _sample(text, 'deepmanus_node_duration_seconds_count{node="planner"}') >= 1
+    assert _sample(text, 'deepmanus_workflows_total{outcome="completed"}') >= 1
+    assert _sample(text, "deepmanus_active_workflows") == 0
+
+
+def test_admission_metrics():
+    """Test that the admission stats are exported on every scrape"""
+    controller = AdmissionController(
+        max_concurrent=4,
+        max_per_key=2,
+        max_browser=1,
+        max_queue_size=0,
+        queue_timeout=0,
+        retry_after=1,
+    )
+    register_admission_metrics(controller)
+
+    async def admit():
+        return await controller.acquire("key", "browser")
+
+    slot = asyncio.run(admit())
+    text = registry.render()
+    assert _sample(text, 'deepmanus_admission_running{resource_class="browser"}') == 1
+    assert _sample(text, 'deepmanus_admission_limit{resource_class="browser"}') == 1
+    slot.release()
+    text = registry.render()
+    assert _sample(text, 'deepmanus_admission_running{resource_class="browser"}') == 0
+    wait_count = 'deepmanus_admission_wait_seconds_count{resource_class="browser"}'
+    assert _sample(text, wait_count) >= 1
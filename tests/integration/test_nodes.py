@@ -0,0 +1,135 @@
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+from langchain_core.messages import AIMessageChunk, HumanMessage
+
+from src.config import TEAM_MEMBERS, TEAM_MEMBER_CONFIGRATIONS
+from src.graph.nodes import coordinator_node, detect_handoff, planner_node
+
+
+def _state(**kwargs):
+    return {
+        "TEAM_MEMBERS": TEAM_MEMBERS,
+        "TEAM_MEMBER_CONFIGRATIONS": TEAM_MEMBER_CONFIGRATIONS,
+        "messages": [HumanMessage(content="What is LangGraph?")],
+        **kwargs,
+    }
+
+
+def _mock_llm(*chunks):
+    llm = MagicMock()
+    llm.stream.side_effect = lambda messages: (
+        AIMessageChunk(content=chunk) for chunk in chunks
+    )
+    return llm
+
+
+@patch("src.graph.nodes.tavily_tool")
+@patch("src.graph.nodes.get_llm_by_type")
+def test_coordinator_speculative_search_on_handoff(mock_get_llm, mock_tavily):
+    """Test that the speculative search result is handed to the planner"""
+    mock_get_llm.return_value = _mock_llm("handoff_to_planner()")
+    mock_tavily.invoke.return_value = [{"title": "t", "content": "c"}]
+
+    command = coordinator_node(_state(search_before_planning=True))
+
+    assert command.goto == "planner"
+    assert command.update["search_results"] == [{"title": "t", "content": "c"}]
+    mock_tavily.invoke.assert_called_once_with({"query": "What is LangGraph?"})
+
+
+@patch("src.graph.nodes.tavily_tool")
+@patch("src.graph.nodes.get_llm_by_type")
+def test_coordinator_discards_search_without_handoff(mock_get_llm, mock_tavily):
+    """Test that the speculative search is discarded for small talk"""
+    mock_get_llm.return_value = _mock_llm("Hello", ", I am ", "DeepManus.")
+    mock_tavily.invoke.return_value = [{"title": "t", "content": "c"}]
+
+    command = coordinator_node(_state(search_before_planning=True))
+
+    assert command.goto == "__end__"
+    assert "search_results" not in command.update
+
+
+@patch("src.graph.nodes.tavily_tool")
+@patch("src.graph.nodes.get_llm_by_type")
+def test_coordinator_without_search_before_planning(mock_get_llm, mock_tavily):
+    """Test that no search is started when search_before_planning is off"""
+    mock_get_llm.return_value = _mock_llm("handoff_to_planner()")
+
+    command = coordinator_node(_state(search_before_planning=False))
+
+    assert command.goto == "planner"
+    mock_tavily.invoke.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "content, expected",
+    [
+        ("", None),
+        ("hand", None),
+        ("  handoff_to", None),
+        ("handoff_to_planner", True),
+        ("handoff_to_planner()", True),
+        ("`handoff_to_planner()`", True),
+        ("Hello", False),
+        ("handy", False),
+    ],
+)
+def test_detect_handoff(content, expected):
+    """Test handoff detection on partial coordinator replies"""
+    assert detect_handoff(content) is expected
+
+
+@patch("src.graph.nodes.get_llm_by_type")
+def test_coordinator_stops_streaming_after_handoff(mock_get_llm):
+    """Test that the coordinator stops consuming the stream once it hands off"""
+    consumed = []
+
+    def stream(messages):
+        for chunk in ["hand", "off_to_", "planner", "()", " and more"]:
+            consumed.append(chunk)
+            yield AIMessageChunk(content=chunk)
+
+    mock_get_llm.return_value.stream.side_effect = stream
+
+    command = coordinator_node(_state())
+
+    assert command.goto == "planner"
+    assert consumed == ["hand", "off_to_", "planner"]
+
+
+@patch("src.graph.nodes.get_llm_by_type")
+def test_planner_streams_plan(mock_get_llm):
+    """Test that the planner assembles the streamed plan"""
+    mock_get_llm.return_value = _mock_llm(
+        '{"title": "t", "steps": [{"agent_name": ',
+        '"researcher"}, {"agent_name": "reporter"}]}',
+    )
+
+    command = planner_node(_state())
+
+    assert command.goto == "supervisor"
+    plan = json.loads(command.update["full_plan"])
+    assert [step["agent_name"] for step in plan["steps"]] == ["researcher", "reporter"]
+
+
+@patch("src.utils.json_utils.json_repair.loads")
+@patch("src.graph.nodes.get_llm_by_type")
+def test_planner_repairs_only_invalid_plans(mock_get_llm, mock_repair):
+    """Test that a valid plan is not repaired, and a broken one still is"""
+    mock_repair.side_effect = lambda text: {"title": "t", "steps": []}
+    mock_get_llm.return_value = _mock_llm('```json\n{"title": "t", "steps": []}\n```')
+
+    command = planner_node(_state())
+
+    assert json.loads(command.update["full_plan"]) == {"title": "t", "steps": []}
+    mock_repair.assert_not_called()
+
+    mock_get_llm.return_value = _mock_llm('{"title": "t", "steps": [],}')
+
+    command = planner_node(_state())
+
+    assert command.goto == "supervisor"
+    assert json.loads(command.update["full_plan"]) == {"title": "t", "steps": []}
+    mock_repair.assert_called_once()
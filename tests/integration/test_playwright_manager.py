@@ -0,0 +1,257 @@
+import contextlib
+import http.server
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import src.playwright_manager as playwright_manager_module
+from src.playwright_manager import OUTPUT_LINES, PlaywrightManager
+from src.utils.metrics import registry
+
+
+def _restarts():
+    for line in registry.render().splitlines():
+        if line.startswith("deepmanus_playwright_restarts_total "):
+            return float(line.split()[-1])
+    return 0
+
+
+class _Process:
+    """Stands in for the server process, exited when returncode is set"""
+
+    def __init__(self, returncode=None):
+        self.returncode = returncode
+
+    def poll(self):
+        return self.returncode
+
+
+def test_version_is_detected_once(monkeypatch, tmp_path):
+    """Test that the Playwright version is detected once per process"""
+    manager = PlaywrightManager(state_dir=str(tmp_path))
+    calls = []
+    monkeypatch.setattr(
+        manager, "_detect_playwright_version", lambda: calls.append(1) or "1.50.0"
+    )
+
+    assert manager.get_playwright_version() == "1.50.0"
+    assert manager._check_playwright_installed()
+    assert len(calls) == 1
+
+
+def test_not_installed_without_package_or_npm(monkeypatch, tmp_path):
+    """Test that Playwright counts as not installed when neither it nor npm is found"""
+    manager = PlaywrightManager(state_dir=str(tmp_path))
+
+    def version(name):
+        raise playwright_manager_module.metadata.PackageNotFoundError(name)
+
+    monkeypatch.setattr(playwright_manager_module.metadata, "version", version)
+    monkeypatch.setattr(manager, "_find_npm_executable", lambda: None)
+
+    assert manager.get_playwright_version() is None
+    assert not manager._check_playwright_installed()
+
+
+def test_concurrent_starts_start_one_server(monkeypatch, tmp_path):
+    """Test that browser tasks starting the server at once start it only once"""
+    manager = PlaywrightManager(state_dir=str(tmp_path))
+    starts = []
+
+    def start():
+        starts.append(1)
+        time.sleep(0.05)
+        manager.is_running = True
+        return True
+
+    monkeypatch.setattr(manager, "_start_server", start)
+    threads = [threading.Thread(target=manager.start_server) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    manager.stop_server()
+
+    assert len(starts) == 1
+
+
+def test_failed_start_is_not_retried_immediately(monkeypatch, tmp_path):
+    """Test that a failed start is not repeated by every browser task"""
+    manager = PlaywrightManager(state_dir=str(tmp_path))
+    starts = []
+    monkeypatch.setattr(manager, "_start_server", lambda: starts.append(1) or False)
+
+    assert not manager.start_server()
+    assert not manager.start_server()
+    assert len(starts) == 1
+
+    manager.start_in_background().join()
+    assert len(starts) == 1
+
+
+def test_health_check(monkeypatch, tmp_path):
+    """Test that the server is healthy only if it answers with its websocket path"""
+    manager = PlaywrightManager(state_dir=str(tmp_path))
+    ws_path = manager._ws_path
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = json.dumps({"wsEndpointPath": ws_path}).encode()
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        manager.port = server.server_address[1]
+        manager.server_process = _Process()
+        assert manager._is_healthy()
+
+        manager._ws_path = "/another-server"
+        assert not manager._is_healthy()
+
+        manager._ws_path = ws_path
+        manager.server_process = _Process(returncode=1)
+        assert not manager._is_healthy()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_supervisor_restarts_exited_server(monkeypatch, tmp_path):
+    """Test that the supervisor restarts a server whose process has exited"""
+    manager = PlaywrightManager(state_dir=str(tmp_path))
+    monkeypatch.setattr(playwright_manager_module, "PLAYWRIGHT_HEALTH_INTERVAL", 0.01)
+    restarted = threading.Event()
+
+    def start():
+        manager.server_process = _Process()
+        manager.is_running = True
+        if starts:
+            restarted.set()
+        starts.append(1)
+        return True
+
+    starts = []
+    monkeypatch.setattr(manager, "_start_server", start)
+    monkeypatch.setattr(
+        manager, "_is_healthy", lambda: manager.server_process.poll() is None
+    )
+    monkeypatch.setattr(
+        manager, "_terminate_process", lambda: setattr(manager, "server_process", None)
+    )
+    restarts = _restarts()
+
+    assert manager.start_server()
+    manager.server_process.returncode = 1
+    assert restarted.wait(5)
+    manager.stop_server()
+
+    assert len(starts) == 2
+    assert manager.is_running is False
+    assert _restarts() == restarts + 1
+
+
+def test_server_output_is_logged(monkeypatch, tmp_path):
+    """Test that the server's output file is forwarded to the log until it exits"""
+    manager = PlaywrightManager(state_dir=str(tmp_path))
+    monkeypatch.setattr(
+        manager,
+        "_wait_until_ready",
+        lambda timeout: manager.server_process.wait(timeout=10) == 0,
+    )
+    script = "for i in range(5000): print(f'line {i} ' + 'x' * 40)"
+
+    assert manager._launch([sys.executable, "-c", script])
+    manager.server_process = None
+    deadline = time.monotonic() + 5
+    while (
+        not (manager._output and manager._output[-1].startswith("line 4999"))
+        and time.monotonic() < deadline
+    ):
+        time.sleep(0.01)
+
+    assert len(manager._output) == OUTPUT_LINES
+    assert manager._output[-1].startswith("line 4999")
+
+
+def test_second_worker_adopts_server(monkeypatch, tmp_path):
+    """Test that workers on a host share one server, closed by the last to stop"""
+    first = PlaywrightManager(state_dir=str(tmp_path))
+    second = PlaywrightManager(state_dir=str(tmp_path))
+    monkeypatch.setattr(playwright_manager_module, "_endpoint_healthy", lambda *a: True)
+    monkeypatch.setattr(playwright_manager_module, "_pid_alive", lambda pid: True)
+    monkeypatch.setattr(first, "_client_id", lambda: 1001)
+    monkeypatch.setattr(second, "_client_id", lambda: 1002)
+    monkeypatch.setattr(
+        first, "_start_server", lambda: setattr(first, "is_running", True) or True
+    )
+    monkeypatch.setattr(second, "_start_server", lambda: False)
+    stopped = []
+    monkeypatch.setattr(first, "_kill_recorded_server", lambda state: stopped.append(1))
+    monkeypatch.setattr(
+        second, "_kill_recorded_server", lambda state: stopped.append(2)
+    )
+
+    assert first.start_server()
+    assert second.start_server()
+    assert second.ws_endpoint == first.ws_endpoint
+    assert first._read_state()["clients"] == [1001, 1002]
+
+    first.stop_server()
+    assert stopped == []
+    assert first._read_state()["clients"] == [1002]
+
+    second.stop_server()
+    assert stopped == [2]
+    assert first._read_state() is None
+
+
+def _spawn_detached(*args):
+    """Start a process that is not a child of the tests, like another worker's server"""
+    script = (
+        "import subprocess, sys; "
+        "print(subprocess.Popen(sys.argv[1:], start_new_session=True, "
+        "stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).pid)"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script, sys.executable, "-c", *args],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return int(output)
+
+
+def test_stale_server_is_killed_by_pid(monkeypatch, tmp_path):
+    """Test that only the recorded process is killed when the recorded server is gone"""
+    manager = PlaywrightManager(state_dir=str(tmp_path))
+    sleep = ("import time; time.sleep(60)", "launch-server")
+    recorded, other = _spawn_detached(*sleep), _spawn_detached(*sleep)
+    try:
+        manager._write_state(
+            {"pid": recorded, "port": None, "ws_path": "/old", "clients": []}
+        )
+        monkeypatch.setattr(
+            manager,
+            "_start_server",
+            lambda: setattr(manager, "is_running", True) or True,
+        )
+
+        assert manager.start_server()
+        assert not playwright_manager_module._pid_alive(recorded)
+        assert playwright_manager_module._pid_alive(other)
+        assert manager._read_state()["ws_path"] == manager._ws_path
+    finally:
+        manager.stop_server()
+        for pid in (recorded, other):
+            with contextlib.suppress(ProcessLookupError):
+                os.kill(pid, signal.SIGKILL)
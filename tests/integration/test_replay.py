@@ -0,0 +1,89 @@
+import asyncio
+
+from benchmarks.bench_workflow import BENCHMARK_PLAN
+from benchmarks.fakes import (
+    STAND_IN_TOOL_ARGS,
+    ScriptedChatModel,
+    offline_workflow,
+    stand_in_tools,
+)
+from src.service.workflow_service import run_agent_workflow
+from src.utils.replay import WorkflowRecording
+
+PROMPT = [{"role": "user", "content": "Write a report on LangGraph"}]
+
+
+def _run(**kwargs):
+    async def collect():
+        return [
+            event
+            async for event in run_agent_workflow(
+                PROMPT, search_before_planning=True, **kwargs
+            )
+        ]
+
+    return asyncio.run(collect())
+
+
+def _record(path):
+    model = ScriptedChatModel(
+        reply_tokens=3, plan=BENCHMARK_PLAN, tool_args_by_name=STAND_IN_TOOL_ARGS
+    )
+    tools = stand_in_tools(result_chars=100)
+    with offline_workflow(model, tools, search_tool=tools["search"]):
+        return _run(record=str(path))
+
+
+def test_record_workflow(tmp_path):
+    """Test that a recording holds every agent's responses and every tool result"""
+    path = tmp_path / "workflow.json.gz"
+    _record(path)
+    recording = WorkflowRecording.load(str(path))
+
+    assert recording.input["messages"] == PROMPT
+    assert recording.input["search_before_planning"] is True
+    assert set(recording.llm) == {
+        "coordinator",
+        "planner",
+        "supervisor",
+        "researcher",
+        "browser",
+        "reporter",
+    }
+    # One call per step and a final one, plus one per tool call of the agents
+    assert len(recording.llm["supervisor"]) == 4
+    assert len(recording.llm["researcher"]) == 4
+    tool_names = {key.split(":")[0] for key in recording.tools}
+    assert tool_names == {"tavily_search", "multi_search_tool", "crawl_tool", "browser"}
+    planner = recording.llm["planner"][0]
+    assert sum(planner["chunk_sizes"]) == len(planner["content"])
+
+
+def test_replay_workflow(tmp_path):
+    """Test that replaying through the real agents and tools yields the recorded events"""
+    path = tmp_path / "workflow.json.gz"
+    recorded = _record(path)
+    # No fakes: the real LLM clients and tools would fail without network
+    replayed = _run(replay=str(path), replay_speed=0)
+
+    assert [e["event"] for e in replayed] == [e["event"] for e in recorded]
+    assert replayed[-1]["data"]["messages"] == recorded[-1]["data"]["messages"]
+    results = [
+        e["data"]["tool_result"] for e in replayed if e["event"] == "tool_call_result"
+    ]
+    assert results == [
+        e["data"]["tool_result"] for e in recorded if e["event"] == "tool_call_result"
+    ]
+
+
+def test_replay_missing_response(tmp_path):
+    """Test that a call missing from the recording fails the workflow"""
+    path = tmp_path / "workflow.json.gz"
+    _record(path)
+    recording = WorkflowRecording.load(str(path))
+    recording.llm["reporter"] = []
+
+    events = _run(replay=recording, replay_speed=0)
+
+    assert events[-1]["event"] == "error"
+    assert "reporter" in events[-1]["data"]["error"]
@@ -0,0 +1,114 @@
+import asyncio
+import contextvars
+import threading
+import time
+
+import pytest
+
+from src.tools.bash_tool import bash_tool
+from src.tools.python_repl import python_repl_tool
+from src.tools.resources import (
+    WorkflowClosedError,
+    WorkflowResources,
+    close_all_workflow_resources,
+    get_workflow_resources,
+    use_workflow_resources,
+)
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.closed_in = None
+
+    async def close(self):
+        self.closed_in = threading.current_thread()
+
+
+def test_use_workflow_resources():
+    """Test that the resources are only current inside the context"""
+    resources = WorkflowResources("wf")
+    assert get_workflow_resources() is None
+    with use_workflow_resources(resources):
+        assert get_workflow_resources() is resources
+    assert get_workflow_resources() is None
+
+
+def test_python_repl_is_per_workflow():
+    """Test that variables defined in one workflow are not visible in another"""
+    first, second = WorkflowResources("first"), WorkflowResources("second")
+    with use_workflow_resources(first):
+        python_repl_tool.invoke({"code": "secret = 42"})
+        assert "Stdout: 42" in python_repl_tool.invoke({"code": "print(secret)"})
+    with use_workflow_resources(second):
+        result = python_repl_tool.invoke({"code": "print(secret)"})
+    assert "NameError" in result
+
+
+def test_cleanup_kills_running_command():
+    """Test that ending a workflow kills its commands but not other workflows'"""
+    resources, other = WorkflowResources("wf"), WorkflowResources("other")
+    results = {}
+
+    def run(name, workflow):
+        with use_workflow_resources(workflow):
+            results[name] = bash_tool.invoke({"cmd": "sleep 30", "timeout": 60})
+
+    threads = {
+        name: threading.Thread(
+            target=contextvars.copy_context().run, args=(run, name, workflow)
+        )
+        for name, workflow in (("wf", resources), ("other", other))
+    }
+    for thread in threads.values():
+        thread.start()
+    time.sleep(0.5)
+
+    start = time.monotonic()
+    asyncio.run(resources.cleanup())
+    threads["wf"].join(timeout=5)
+    assert time.monotonic() - start < 5
+    assert "Command failed" in results["wf"]
+    assert threads["other"].is_alive()
+
+    asyncio.run(other.cleanup())
+    threads["other"].join(timeout=5)
+
+
+def test_closed_workflow_refuses_new_resources():
+    """Test that tools cannot open resources once their workflow has ended"""
+    resources = WorkflowResources("wf")
+    asyncio.run(resources.cleanup())
+    with pytest.raises(WorkflowClosedError):
+        resources.python_repl
+    with use_workflow_resources(resources):
+        assert "Error executing command" in bash_tool.invoke({"cmd": "echo hi"})
+
+
+def test_cleanup_closes_browser_in_its_own_loop():
+    """Test that a browser is closed in the event loop of the thread driving it"""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever)
+    thread.start()
+    try:
+        browser = FakeBrowser()
+        resources = WorkflowResources("wf")
+        resources.add_browser(browser, loop)
+        asyncio.run(resources.cleanup())
+        assert browser.closed_in is thread
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+def test_close_all_workflow_resources():
+    """Test that shutting down closes the resources of unfinished workflows"""
+    finished, running = WorkflowResources("finished"), WorkflowResources("running")
+    asyncio.run(finished.cleanup())
+    running.python_repl
+
+    asyncio.run(close_all_workflow_resources())
+
+    assert running.closed
+    with pytest.raises(WorkflowClosedError):
+        running.python_repl
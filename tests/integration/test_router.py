@@ -0,0 +1,231 @@
+import asyncio
+import time
+from typing import Any, List, Optional
+
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from src.config.loader import process_dict
+from src.llms.router import GENERATE, STREAM, RoutedChatModel
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers):
+        self.status_code = status_code
+        self.headers = headers
+
+
+class FakeRateLimitError(Exception):
+    def __init__(self, retry_after):
+        super().__init__("rate limited")
+        self.response = FakeResponse(429, {"retry-after": str(retry_after)})
+
+
+class FakeEndpoint(BaseChatModel):
+    name: str
+    delay: float = 0.0
+    error: Optional[Exception] = None
+    calls: List[dict] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _answer(self, kwargs):
+        self.calls.append(kwargs)
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return f"answer from {self.name}"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        message = AIMessage(content=self._answer(kwargs))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for word in self._answer(kwargs).split(" "):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+    def bind_tools(self, tools, **kwargs: Any):
+        return self.bind(tools=[f"{self.name}:{t}" for t in tools], **kwargs)
+
+
+def _router(*endpoints, **settings):
+    return RoutedChatModel(endpoints=list(endpoints), settings=settings)
+
+
+def _seed(router, index, latency, samples=20, kinds=(GENERATE, STREAM)):
+    for kind in kinds:
+        for _ in range(samples):
+            router.stats[index].begin()
+            router.stats[index].record_success(kind, latency, 0.3)
+
+
+def test_prefers_fastest_endpoint():
+    """Test that requests go to the endpoint with the lowest latency"""
+    router = _router(FakeEndpoint(name="slow"), FakeEndpoint(name="fast"))
+    _seed(router, 0, 2.0)
+    _seed(router, 1, 0.1)
+    assert router.invoke("hi").content == "answer from fast"
+
+
+def test_fails_over_to_next_endpoint():
+    """Test that a failed request is retried on another endpoint"""
+    router = _router(
+        FakeEndpoint(name="broken", error=ValueError("boom")),
+        FakeEndpoint(name="healthy"),
+    )
+    assert router.invoke("hi").content == "answer from healthy"
+    assert "".join(c.content for c in router.stream("hi")).strip() == (
+        "answer from healthy"
+    )
+    # The broken endpoint is now penalised
+    assert router.stats[0].error_rate > 0
+    assert router._order(GENERATE)[0] == 1
+
+
+def test_all_endpoints_failing_raises():
+    """Test that the last error is raised when every endpoint failed"""
+    router = _router(
+        FakeEndpoint(name="a", error=ValueError("a")),
+        FakeEndpoint(name="b", error=ValueError("b")),
+    )
+    with pytest.raises(ValueError):
+        router.invoke("hi")
+
+
+def test_rate_limited_endpoint_is_skipped():
+    """Test that an endpoint is skipped for its Retry-After after a 429"""
+    limited = FakeEndpoint(name="limited", error=FakeRateLimitError(30))
+    router = _router(limited, FakeEndpoint(name="backup"))
+    _seed(router, 0, 0.01)
+    _seed(router, 1, 1.0)
+
+    assert router.invoke("hi").content == "answer from backup"
+    assert router.stats[0].cooldown_until - time.monotonic() > 25
+    limited.error = None
+    assert router.invoke("hi").content == "answer from backup"
+
+
+def test_hedges_slow_requests():
+    """Test that a request slower than the endpoint's p95 is sent to a second one"""
+    stalled = FakeEndpoint(name="stalled", delay=1.0)
+    router = _router(stalled, FakeEndpoint(name="hedge"), hedge_min_samples=5)
+    _seed(router, 0, 0.05)
+    _seed(router, 1, 0.5)
+
+    start = time.monotonic()
+    assert router.invoke("hi").content == "answer from hedge"
+    assert "".join(c.content for c in router.stream("hi")).strip() == (
+        "answer from hedge"
+    )
+    assert asyncio.run(router.ainvoke("hi")).content == "answer from hedge"
+    assert time.monotonic() - start < 2.5
+
+
+class SlowStreamEndpoint(BaseChatModel):
+    """Streams a word at a time, logging each word and when its stream is closed"""
+
+    name: str
+    first_delay: float
+    word_delay: float
+    words: int
+    # Any, so the list is shared with the test instead of copied
+    log: Any
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-stream"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        raise NotImplementedError
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.first_delay)
+        try:
+            for i in range(self.words):
+                if i:
+                    time.sleep(self.word_delay)
+                self.log.append(self.name)
+                yield ChatGenerationChunk(message=AIMessageChunk(content=f"{i} "))
+        finally:
+            self.log.append(f"{self.name} closed")
+
+
+def test_hedged_stream_stops_the_losing_request():
+    """Test that the losing stream is stopped as soon as the other endpoint wins"""
+    log = []
+    stalled = SlowStreamEndpoint(
+        name="stalled", first_delay=0.2, word_delay=0.01, words=50, log=log
+    )
+    hedge = SlowStreamEndpoint(
+        name="hedge", first_delay=0.0, word_delay=0.05, words=10, log=log
+    )
+    router = _router(stalled, hedge, hedge_min_samples=5)
+    _seed(router, 0, 0.05)
+    _seed(router, 1, 0.5)
+
+    chunks = list(router.stream("hi"))
+
+    assert len(chunks) == 10
+    # The stalled endpoint sent one chunk after losing, then its stream was closed
+    assert log.count("stalled") == 1
+    assert log.index("stalled closed") < log.index("hedge closed")
+    assert router.stats[0].in_flight == 0
+
+
+def test_hedges_slow_async_streams():
+    """Test that an async stream with no first chunk by the p95 is sent to a second one"""
+    stalled = FakeEndpoint(name="stalled", delay=1.0)
+    router = _router(stalled, FakeEndpoint(name="hedge"), hedge_min_samples=5)
+    _seed(router, 0, 0.05)
+    _seed(router, 1, 0.5)
+
+    async def collect():
+        start = time.monotonic()
+        text = "".join([chunk.content async for chunk in router.astream("hi")])
+        return text, time.monotonic() - start
+
+    text, elapsed = asyncio.run(collect())
+    assert text.strip() == "answer from hedge"
+    # Timed inside the loop, asyncio.run waits for the stalled endpoint's thread
+    assert elapsed < 0.9
+    # The losing stream does not count as a failure of its endpoint
+    assert router.stats[0].error_rate == 0
+
+
+def test_latency_is_kept_per_call_kind():
+    """Test that stream first chunk times and full latencies are ranked apart"""
+    router = _router(FakeEndpoint(name="a"), FakeEndpoint(name="b"))
+    # a answers whole requests faster, b starts streaming sooner
+    _seed(router, 0, 0.5, kinds=(GENERATE,))
+    _seed(router, 1, 1.0, kinds=(GENERATE,))
+    _seed(router, 0, 0.4, kinds=(STREAM,))
+    _seed(router, 1, 0.1, kinds=(STREAM,))
+
+    assert router._order(GENERATE)[0] == 0
+    assert router._order(STREAM)[0] == 1
+    assert router.invoke("hi").content == "answer from a"
+    assert "".join(c.content for c in router.stream("hi")).strip() == "answer from b"
+    assert len(router.stats[1].samples[STREAM]) == 21
+    assert len(router.stats[1].samples[GENERATE]) == 20
+
+
+def test_bind_tools_per_endpoint():
+    """Test that tools are bound to each endpoint in its own format"""
+    first, second = FakeEndpoint(name="a", calls=[]), FakeEndpoint(name="b", calls=[])
+    router = _router(first, second, hedge_min_samples=0)
+    _seed(router, 1, 0.1)
+    _seed(router, 0, 1.0)
+
+    router.bind_tools(["search"]).invoke("hi")
+    assert second.calls[-1]["tools"] == ["b:search"]
+
+
+def test_config_lists_are_processed(monkeypatch):
+    """Test that environment variables are replaced in endpoint lists"""
+    monkeypatch.setenv("ENDPOINT_KEY", "secret")
+    conf = process_dict({"BASIC_MODEL": [{"model": "m", "api_key": "$ENDPOINT_KEY"}]})
+    assert conf["BASIC_MODEL"][0]["api_key"] == "secret"
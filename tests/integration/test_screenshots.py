@@ -0,0 +1,135 @@
+import base64
+import io
+
+from browser_use.agent.message_manager.service import MessageManager
+from browser_use.agent.prompts import SystemPrompt
+from browser_use.browser.views import BrowserState
+from browser_use.dom.views import DOMElementNode
+from PIL import Image, ImageDraw
+
+from src.tools.screenshots import ScreenshotOptimizer, estimate_image_tokens
+
+
+def _page(width=1920, height=1080, rows=20, offset=0, photo=False):
+    """A PNG screenshot of a page with a few lines of 'text' and optionally a photo"""
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    for row in range(rows):
+        y = offset + 40 + row * 50
+        draw.rectangle((80, y, 80 + (row * 373) % 1200 + 300, y + 20), fill="black")
+    if photo:
+        gradient = Image.linear_gradient("L").resize((600, 400))
+        grain = Image.effect_noise((600, 400), 40)
+        image.paste(Image.merge("RGB", (gradient, grain, gradient)), (1200, 100))
+        for row in range(rows):
+            draw.text(
+                (80, offset + 62 + row * 50), "Lorem ipsum dolor sit amet " * 4, "gray"
+            )
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return base64.b64encode(output.getvalue()).decode("ascii")
+
+
+def _decode(data_url):
+    header, data = data_url.split(",", 1)
+    return header, Image.open(io.BytesIO(base64.b64decode(data)))
+
+
+def test_screenshot_is_downscaled_and_reencoded():
+    """Test that a screenshot is sent smaller, as JPEG, and the savings are counted"""
+    optimizer = ScreenshotOptimizer(max_width=1024, image_format="jpeg", quality=70)
+
+    header, image = _decode(optimizer.optimize(_page(photo=True)))
+
+    assert header == "data:image/jpeg;base64"
+    assert image.size == (1024, 576)
+    stats = optimizer.stats.to_dict()
+    assert stats["screenshots"] == 1
+    assert 0 < stats["sent_bytes"] < stats["original_bytes"]
+    assert stats["original_tokens"] == estimate_image_tokens(1920, 1080) == 1105
+    assert stats["sent_tokens"] == estimate_image_tokens(1024, 576) == 765
+
+
+def test_flat_page_falls_back_to_png():
+    """Test that a page JPEG compresses worse than the screenshot is sent as PNG"""
+    optimizer = ScreenshotOptimizer(max_width=1024, image_format="jpeg")
+
+    header, image = _decode(optimizer.optimize(_page()))
+
+    assert header == "data:image/png;base64"
+    assert image.size == (1024, 576)
+    assert optimizer.stats.sent_tokens < optimizer.stats.original_tokens
+
+
+def test_full_page_screenshot_is_cropped_to_viewport():
+    """Test that a screenshot taller than the viewport keeps only its top"""
+    optimizer = ScreenshotOptimizer(viewport=(1280, 1100), max_width=1280)
+
+    _, image = _decode(optimizer.optimize(_page(width=1280, height=4000, rows=70)))
+
+    assert image.size == (1280, 1100)
+
+
+def test_unchanged_page_reuses_the_last_image():
+    """Test that the image of an unchanged page is sent again without re-encoding"""
+    optimizer = ScreenshotOptimizer()
+
+    first = optimizer.optimize(_page())
+    assert optimizer.optimize(_page()) == first
+    assert optimizer.optimize(_page(offset=300, rows=10)) != first
+    assert optimizer.stats.reused == 1
+    # The reused image is still sent to the model
+    assert optimizer.stats.sent_tokens == 3 * estimate_image_tokens(1024, 576)
+
+
+def test_similar_page_reuses_the_last_image_within_distance():
+    """Test that near identical pages reuse the last image only when configured"""
+    exact = ScreenshotOptimizer()
+    near = ScreenshotOptimizer(skip_distance=2)
+
+    for optimizer in (exact, near):
+        optimizer.optimize(_page(rows=20))
+        optimizer.optimize(_page(rows=21))
+
+    assert exact.stats.reused == 0
+    assert near.stats.reused == 1
+
+
+def test_optimizer_rewrites_agent_state_messages():
+    """Test that the state messages of a browser_use agent carry the optimized image"""
+    manager = MessageManager(
+        llm=None,
+        task="Find the news",
+        action_descriptions="",
+        system_prompt_class=SystemPrompt,
+    )
+    ScreenshotOptimizer().attach(manager)
+    screenshot = _page(photo=True)
+    root = DOMElementNode(
+        tag_name="body",
+        xpath="",
+        attributes={},
+        children=[],
+        is_visible=True,
+        parent=None,
+    )
+    state = BrowserState(
+        element_tree=root,
+        selector_map={},
+        url="https://example.com",
+        title="Example",
+        tabs=[],
+        screenshot=screenshot,
+    )
+
+    manager.add_state_message(state)
+    first = manager.history.messages[-1].message.content
+    manager._remove_last_state_message()
+    manager.add_state_message(state)
+    second = manager.history.messages[-1].message.content
+
+    assert first[1]["image_url"]["url"].startswith("data:image/jpeg;base64,")
+    # Each state message carries an image, the previous one has been removed
+    assert second[1] == first[1]
+    # The agent's history keeps the original screenshot, e.g. for its GIF
+    assert state.screenshot == screenshot
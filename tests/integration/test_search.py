@@ -0,0 +1,53 @@
+from unittest.mock import patch
+from src.tools.search import merge_search_results, multi_search_tool
+
+
+def _result(url, score, title="title"):
+    return {"url": url, "title": title, "content": "content", "score": score}
+
+
+def test_merge_search_results_dedupes_by_url():
+    """Test that results shared by several queries are merged into one"""
+    merged = merge_search_results(
+        [
+            [_result("https://a.com", 0.5), _result("https://b.com", 0.9)],
+            [_result("https://a.com", 0.7)],
+        ]
+    )
+    assert [r["url"] for r in merged] == ["https://a.com", "https://b.com"]
+    # The best scoring duplicate is kept
+    assert merged[0]["score"] == 0.7
+
+
+def test_merge_search_results_respects_limit():
+    """Test that the merged list is capped at max_results"""
+    results = [[_result(f"https://{i}.com", i / 10) for i in range(8)]]
+    merged = merge_search_results(results, max_results=3)
+    assert [r["url"] for r in merged] == [
+        "https://7.com",
+        "https://6.com",
+        "https://5.com",
+    ]
+
+
+@patch("src.tools.search.tavily_tool")
+def test_multi_search_tool(mock_tavily):
+    """Test that every unique query is searched and malformed responses are skipped"""
+    responses = {
+        "first": [_result("https://a.com", 0.4)],
+        "second": [_result("https://a.com", 0.6), _result("https://b.com", 0.9)],
+        "broken": "HTTPError('401 Client Error')",
+    }
+    mock_tavily.invoke.side_effect = lambda args: responses[args["query"]]
+
+    result = multi_search_tool.invoke(
+        {"queries": ["first", "second", "first", " ", "broken"]}
+    )
+    assert mock_tavily.invoke.call_count == 3
+    assert [r["url"] for r in result] == ["https://a.com", "https://b.com"]
+
+
+def test_multi_search_tool_empty_queries():
+    """Test multi search with no usable queries"""
+    result = multi_search_tool.invoke({"queries": ["", "  "]})
+    assert result == "No search queries provided."
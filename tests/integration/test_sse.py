@@ -0,0 +1,234 @@
+import asyncio
+import contextvars
+import json
+import pytest
+from sse_starlette.sse import AppStatus
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from src.api.sse import (
+    BoundedEventQueue,
+    DrainingEventSourceResponse,
+    coalesce_message_events,
+    encode_event,
+)
+
+
+def _delta(message_id, content, field="content"):
+    return {
+        "event": "message",
+        "data": {"message_id": message_id, "delta": {field: content}},
+    }
+
+
+async def _events(items, delay=0.0):
+    for item in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+
+def _collect(events, window=1.0, max_bytes=0):
+    async def run():
+        return [
+            event
+            async for event in coalesce_message_events(
+                events, window=window, max_bytes=max_bytes
+            )
+        ]
+
+    return asyncio.run(run())
+
+
+def test_coalesce_merges_consecutive_deltas():
+    """Test that deltas of the same message are merged and order is preserved"""
+    items = [
+        _delta("a", "Hel"),
+        _delta("a", "lo"),
+        _delta("a", "think", field="reasoning_content"),
+        _delta("b", "Hi"),
+        {"event": "end_of_llm", "data": {"agent_name": "planner"}},
+        _delta("b", "!"),
+    ]
+    assert _collect(_events(items)) == [
+        _delta("a", "Hello"),
+        _delta("a", "think", field="reasoning_content"),
+        _delta("b", "Hi"),
+        {"event": "end_of_llm", "data": {"agent_name": "planner"}},
+        _delta("b", "!"),
+    ]
+
+
+def test_coalesce_flushes_on_size():
+    """Test that a merged delta is flushed once it reaches max_bytes"""
+    items = [_delta("a", "abc") for _ in range(4)]
+    assert _collect(_events(items), max_bytes=6) == [
+        _delta("a", "abcabc"),
+        _delta("a", "abcabc"),
+    ]
+
+
+def test_coalesce_flushes_on_window():
+    """Test that pending deltas are sent when the time window expires"""
+    items = [_delta("a", "x"), _delta("a", "y")]
+    assert _collect(_events(items, delay=0.05), window=0.01) == items
+
+
+def test_coalesce_disabled():
+    """Test that a zero window passes events through unchanged"""
+    items = [_delta("a", "x"), _delta("a", "y")]
+    assert _collect(_events(items), window=0) == items
+
+
+def test_abandoned_stream_closes_workflow_in_its_context():
+    """Test that a client leaving mid-stream closes the workflow in the producer task"""
+    current = contextvars.ContextVar("current", default=None)
+    closed = []
+
+    async def workflow():
+        token = current.set("workflow")
+        try:
+            while True:
+                yield _delta("a", "x")
+        finally:
+            # Raises ValueError if closed from another context
+            current.reset(token)
+            closed.append(True)
+
+    async def run():
+        stream = coalesce_message_events(
+            workflow(), window=1.0, max_bytes=1, max_queue_size=1
+        )
+        await anext(stream)
+        # Let the producer block on the full queue
+        await asyncio.sleep(0.01)
+        await stream.aclose()
+        return list(closed)
+
+    assert asyncio.run(run()) == [True]
+
+
+def test_encode_event_keeps_unicode():
+    """Test that SSE data is JSON without escaped non-ASCII text"""
+    frame = encode_event(_delta("a", "你好"))
+    assert frame["event"] == "message"
+    assert "你好" in frame["data"]
+    assert json.loads(frame["data"])["delta"]["content"] == "你好"
+
+
+def _fill(queue, items):
+    async def run():
+        for item in items:
+            await queue.put(item)
+        return [queue.get_nowait() for _ in range(len(queue))]
+
+    return asyncio.run(run())
+
+
+def test_bounded_queue_drop_oldest():
+    """Test that the oldest token delta is dropped when the queue is full"""
+    start = {"event": "start_of_llm", "data": {"agent_name": "planner"}}
+    queue = BoundedEventQueue(3, "drop_oldest")
+    items = [start, _delta("a", "1"), _delta("a", "2"), _delta("a", "3")]
+    assert _fill(queue, items) == [start, _delta("a", "2"), _delta("a", "3")]
+    assert queue.dropped == 1
+
+
+def test_bounded_queue_coalesce():
+    """Test that deltas are merged into the queue tail when the queue is full"""
+    queue = BoundedEventQueue(2, "coalesce")
+    items = [_delta("a", "1"), _delta("a", "2"), _delta("a", "3"), _delta("a", "4")]
+    assert _fill(queue, items) == [_delta("a", "1"), _delta("a", "234")]
+    assert queue.merged == 2
+
+
+def test_bounded_queue_block():
+    """Test that a full queue makes the producer wait for the consumer"""
+
+    async def run():
+        queue = BoundedEventQueue(1, "block")
+        await queue.put(_delta("a", "1"))
+        blocked = asyncio.create_task(queue.put(_delta("a", "2")))
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+        assert queue.get_nowait() == _delta("a", "1")
+        await blocked
+        return queue.get_nowait()
+
+    assert asyncio.run(run()) == _delta("a", "2")
+
+
+def test_bounded_queue_unknown_policy():
+    """Test that an unknown overflow policy is rejected"""
+    with pytest.raises(ValueError):
+        BoundedEventQueue(1, "unknown")
+
+
+def test_coalesce_with_slow_client():
+    """Test that a bounded queue keeps all text for a slow client"""
+    items = [_delta("a", str(i)) for i in range(50)]
+
+    async def run():
+        events = []
+        async for event in coalesce_message_events(
+            _events(items),
+            window=0,
+            max_bytes=0,
+            max_queue_size=4,
+            overflow_policy="coalesce",
+        ):
+            await asyncio.sleep(0.001)
+            events.append(event)
+        return events
+
+    events = asyncio.run(run())
+    assert len(events) < len(items)
+    text = "".join(event["data"]["delta"]["content"] for event in events)
+    assert text == "".join(str(i) for i in range(50))
+
+
+def _drain(count, delay, drain_timeout):
+    """Stream `count` events while the server is shutting down, return the frames"""
+    finished = []
+
+    async def events():
+        try:
+            for i in range(count):
+                await asyncio.sleep(delay)
+                yield encode_event(_delta("a", str(i)))
+            finished.append(True)
+        finally:
+            finished.append(False)
+
+    async def endpoint(request):
+        return DrainingEventSourceResponse(
+            events(),
+            sep="\n",
+            drain_timeout=drain_timeout,
+            final_event=encode_event({"event": "error", "data": {"error": "bye"}}),
+        )
+
+    app = Starlette(routes=[Route("/stream", endpoint)])
+    with TestClient(app) as client:
+        frames = client.get("/stream").text.strip().split("\n\n")
+    return [frame.split("\n")[0] for frame in frames], finished
+
+
+def test_draining_response_finishes_stream(monkeypatch):
+    """Test that a stream shorter than the drain timeout is not cut off"""
+    monkeypatch.setattr(AppStatus, "should_exit", True)
+    frames, finished = _drain(3, delay=0.01, drain_timeout=5)
+    assert frames == ["event: message"] * 3
+    assert finished == [True, False]
+
+
+def test_draining_response_ends_stream_after_timeout(monkeypatch):
+    """Test that a stream still running after the drain timeout ends with the final event"""
+    monkeypatch.setattr(AppStatus, "should_exit", True)
+    frames, finished = _drain(1000, delay=0.01, drain_timeout=0.1)
+    assert 0 < len(frames) < 1000
+    assert frames[-1] == "event: error"
+    assert set(frames[:-1]) == {"event: message"}
+    # The stream was cancelled
+    assert finished == [False]
@@ -0,0 +1,139 @@
+import asyncio
+import uuid
+
+import pytest
+from langchain_community.tools.tavily_search import TavilySearchResults
+from langchain_core.tools import tool
+
+pytest.importorskip("opentelemetry.sdk")
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (  # noqa: E402
+    InMemorySpanExporter,
+)
+from opentelemetry.trace import StatusCode  # noqa: E402
+
+from benchmarks.fakes import ScriptedChatModel, offline_workflow
+from src.llms.usage import UsageCallbackHandler, UsageTracker, usage_callback
+from src.service.workflow_service import initialize_workflow
+from src.tools.decorators import log_io
+from src.tools.search import multi_search_tool
+from src.utils.tracing import NOOP_SPAN, configure_tracing, span
+
+
+@tool
+@log_io
+def fake_search(query: str) -> str:
+    """Search the web."""
+    return f"results for {query}"
+
+
+@pytest.fixture
+def exporter():
+    exporter = InMemorySpanExporter()
+    configure_tracing(exporter, batch=False)
+    yield exporter
+    configure_tracing(None)
+
+
+def _run_workflow(tools=None):
+    model = ScriptedChatModel(
+        reply_tokens=3,
+        tool_args={"query": "langgraph"},
+        tool_args_by_name={"multi_search": {"queries": ["langgraph", "langchain"]}},
+        callbacks=[usage_callback],
+    )
+
+    async def run():
+        return [
+            event
+            async for event in initialize_workflow(
+                [{"role": "user", "content": "Write a report on LangGraph"}]
+            )
+        ]
+
+    with offline_workflow(model, {"researcher": tools or [fake_search]}):
+        return asyncio.run(run())
+
+
+def test_workflow_is_one_trace(exporter):
+    """Test that nodes, tools and LLM calls are spans of the workflow's trace"""
+    events = _run_workflow()
+    workflow_id = next(
+        e["data"]["workflow_id"] for e in events if e["event"] == "start_of_workflow"
+    )
+    spans = {s.context.span_id: s for s in exporter.get_finished_spans()}
+    by_name = {}
+    for s in spans.values():
+        by_name.setdefault(s.name, []).append(s)
+
+    (workflow,) = by_name["workflow"]
+    assert workflow.attributes["workflow_id"] == workflow_id
+    assert workflow.attributes["workflow.outcome"] == "completed"
+    assert workflow.parent is None
+    assert {s.context.trace_id for s in spans.values()} == {workflow.context.trace_id}
+
+    (planner,) = by_name["node planner"]
+    assert planner.parent.span_id == workflow.context.span_id
+    (tool_span,) = by_name["tool fake_search"]
+    assert tool_span.attributes["tool.output_size"] == len("results for langgraph")
+    assert spans[tool_span.parent.span_id].name == "node researcher"
+
+    (planner_llm,) = by_name["llm planner"]
+    assert planner_llm.parent.span_id == planner.context.span_id
+    assert planner_llm.attributes["gen_ai.usage.output_tokens"] > 0
+    # The coordinator's stream is closed on handoff, its span still ends cleanly
+    (coordinator_llm,) = by_name["llm coordinator"]
+    assert coordinator_llm.status.status_code != StatusCode.ERROR
+
+
+def test_failed_llm_call_ends_its_span(exporter):
+    """Test that the span of a failed LLM call is ended with the error"""
+    handler = UsageCallbackHandler(UsageTracker())
+    run_id = uuid.uuid4()
+    handler.on_chat_model_start(
+        {}, [[]], run_id=run_id, metadata={"checkpoint_ns": "coder:1"}
+    )
+    handler.on_llm_error(ValueError("API error"), run_id=run_id)
+
+    (llm_span,) = exporter.get_finished_spans()
+    assert llm_span.name == "llm coder"
+    assert llm_span.status.status_code == StatusCode.ERROR
+    assert llm_span.events[0].name == "exception"
+
+
+def test_concurrent_searches_belong_to_the_workflow_trace(exporter, monkeypatch):
+    """Test that the searches multi_search runs in threads are spans of its trace"""
+    monkeypatch.setattr(
+        TavilySearchResults,
+        "_run",
+        lambda self, query, run_manager=None: [{"url": f"https://{query}.dev"}],
+    )
+    _run_workflow([multi_search_tool])
+    spans = exporter.get_finished_spans()
+    by_id = {s.context.span_id: s for s in spans}
+    (workflow,) = [s for s in spans if s.name == "workflow"]
+    (multi_search,) = [s for s in spans if s.name == "tool multi_search_tool"]
+    searches = [s for s in spans if s.name == "tool tavily_search"]
+
+    assert len(searches) == 2
+    for search in searches:
+        assert search.context.trace_id == workflow.context.trace_id
+        assert by_id[search.parent.span_id] is multi_search
+
+
+def test_unsampled_workflows_record_nothing():
+    """Test that no spans are recorded for workflows that are not sampled"""
+    exporter = InMemorySpanExporter()
+    configure_tracing(exporter, sample_rate=0.0, batch=False)
+    try:
+        _run_workflow()
+    finally:
+        configure_tracing(None)
+    assert exporter.get_finished_spans() == ()
+
+
+def test_tracing_off_uses_noop_span():
+    """Test that the helpers return the shared no-op span when tracing is off"""
+    configure_tracing(None)
+    with span("anything") as current:
+        assert current is NOOP_SPAN
+        current.set_attribute("size", 1)
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from benchmarks.fakes import ScriptedChatModel, offline_workflow
+from src.llms.usage import UsageCallbackHandler, UsageTracker, usage_callback
+from src.service.workflow_service import initialize_workflow
+
+
+class ReportingChatModel(BaseChatModel):
+    """Replies with the token usage an OpenAI compatible API would report"""
+
+    model_name: str = "gpt-4o"
+    fail: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "reporting"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.fail:
+            raise ValueError("API error")
+        message = AIMessage(
+            content="done",
+            usage_metadata={
+                "input_tokens": 1000,
+                "output_tokens": 500,
+                "total_tokens": 1500,
+            },
+            response_metadata={"model_name": self.model_name},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def _invoke(model, **metadata):
+    model.invoke("hi", config={"metadata": metadata})
+
+
+def test_reported_usage_and_cost():
+    """Test that reported tokens are recorded with their cost per agent"""
+    tracker = UsageTracker()
+    model = ReportingChatModel(callbacks=[UsageCallbackHandler(tracker)])
+    _invoke(model, workflow_id="wf", checkpoint_ns="planner:1234")
+    _invoke(model, workflow_id="wf", checkpoint_ns="researcher:1|agent:2")
+    _invoke(model)
+
+    workflow = tracker.pop_workflow("wf")
+    assert set(workflow["agents"]) == {"planner", "researcher"}
+    assert workflow["total"]["calls"] == 2
+    assert workflow["total"]["prompt_tokens"] == 2000
+    assert workflow["total"]["estimated_calls"] == 0
+    assert workflow["models"]["gpt-4o"]["cost"] > 0
+
+    summary = tracker.summary()
+    assert summary["total"]["calls"] == 3
+    assert summary["agents"]["unknown"]["completion_tokens"] == 500
+    assert summary["workflows_in_progress"] == 0
+
+
+def test_errors_are_counted():
+    """Test that failed calls are counted for their agent"""
+    tracker = UsageTracker()
+    model = ReportingChatModel(fail=True, callbacks=[UsageCallbackHandler(tracker)])
+    with pytest.raises(ValueError):
+        _invoke(model, checkpoint_ns="coder:1")
+    assert tracker.summary()["agents"]["coder"]["errors"] == 1
+
+
+def test_workflow_usage_event():
+    """Test that a workflow reports the usage of each agent before it ends"""
+    model = ScriptedChatModel(reply_tokens=3, callbacks=[usage_callback])
+
+    async def collect():
+        return [
+            event
+            async for event in initialize_workflow(
+                [{"role": "user", "content": "Write a report on LangGraph"}]
+            )
+        ]
+
+    with offline_workflow(model):
+        events = asyncio.run(collect())
+    kinds = [event["event"] for event in events]
+    usage = events[kinds.index("usage")]["data"]
+
+    assert kinds.index("usage") == kinds.index("end_of_workflow") - 1
+    assert {"coordinator", "planner", "researcher", "reporter"} <= set(usage["agents"])
+    # The coordinator's stream is closed once it hands off, that is no error
+    assert usage["agents"]["coordinator"]["calls"] == 1
+    assert usage["agents"]["coordinator"]["errors"] == 0
+    assert usage["agents"]["coordinator"]["completion_tokens"] > 0
+    # The fake model reports no usage, its tokens are counted locally
+    assert usage["total"]["estimated_calls"] == usage["total"]["calls"]
+    assert usage["agents"]["planner"]["completion_tokens"] > 0
+    assert usage["agents"]["planner"]["avg_ttft"] <= (
+        usage["agents"]["planner"]["avg_latency"]
+    )
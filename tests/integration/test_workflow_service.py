@@ -0,0 +1,94 @@
+import asyncio
+
+from langchain_core.tools import tool
+
+from benchmarks.fakes import ScriptedChatModel, offline_workflow
+from src.service.workflow_service import initialize_workflow
+
+
+@tool
+def fake_search(query: str) -> str:
+    """Search the web."""
+    return f"results for {query}"
+
+
+def _run(model, tools=None):
+    async def collect():
+        return [
+            event
+            async for event in initialize_workflow(
+                [{"role": "user", "content": "Write a report on LangGraph"}]
+            )
+        ]
+
+    with offline_workflow(model, tools):
+        return asyncio.run(collect())
+
+
+def test_workflow_events():
+    """Test the order of the agent, llm and plan events of a workflow"""
+    events = _run(ScriptedChatModel(reply_tokens=3))
+    kinds = [event["event"] for event in events]
+
+    assert kinds[0] == "start_of_agent"
+    assert kinds[-2:] == ["end_of_workflow", "final_session_state"]
+    agents = [
+        event["data"]["agent_name"]
+        for event in events
+        if event["event"] == "start_of_agent"
+    ]
+    assert agents == ["coordinator", "planner", "researcher", "reporter"]
+    assert kinds.count("start_of_llm") == kinds.count("end_of_llm") == 4
+    plan_steps = [
+        event["data"]["index"] for event in events if event["event"] == "plan_step"
+    ]
+    assert plan_steps == [0, 1]
+    # The coordinator handed off, its reply is not shown
+    coordinator = kinds.index("end_of_agent")
+    assert "message" not in kinds[:coordinator]
+    # Agent results are recorded in the final state
+    contents = [m["content"] for m in events[-1]["data"]["messages"]]
+    assert len(contents) == 4
+    assert contents[-1].startswith("reporter-token-0")
+
+
+def test_workflow_tool_events():
+    """Test that tool calls inside an agent are reported with their results"""
+    events = _run(
+        ScriptedChatModel(reply_tokens=3, tool_args={"query": "langgraph"}),
+        {"researcher": [fake_search]},
+    )
+    calls = [event["data"] for event in events if event["event"] == "tool_call"]
+    results = [
+        event["data"] for event in events if event["event"] == "tool_call_result"
+    ]
+
+    assert len(calls) == len(results) == 1
+    assert calls[0]["tool_name"] == "fake_search"
+    assert calls[0]["tool_input"] == {"query": "langgraph"}
+    assert results[0]["tool_call_id"] == calls[0]["tool_call_id"]
+    assert results[0]["tool_result"] == "results for langgraph"
+
+
+def test_offline_benchmark_level():
+    """Test that the benchmark harness runs concurrent workflows through every stand-in tool"""
+    from benchmarks.bench_workflow import BENCHMARK_PLAN, run_level
+    from benchmarks.fakes import STAND_IN_TOOL_ARGS, stand_in_tools
+
+    model = ScriptedChatModel(
+        reply_tokens=3, plan=BENCHMARK_PLAN, tool_args_by_name=STAND_IN_TOOL_ARGS
+    )
+    tools = stand_in_tools(result_chars=100)
+    with offline_workflow(model, tools, search_tool=tools["search"]):
+        result = asyncio.run(run_level(2, 3, search_before_planning=True))
+
+    assert result["errors"] == 0
+    assert result["workflows/s"] > 0
+    assert result["p50 ms"] <= result["p95 ms"]
+    assert result["peak RSS MB"] > 0
+
+    events = _run(model, tools)
+    tool_names = {e["data"]["tool_name"] for e in events if e["event"] == "tool_call"}
+    assert tool_names == set(STAND_IN_TOOL_ARGS)
+    results = [e["data"] for e in events if e["event"] == "tool_call_result"]
+    assert not any("Error" in str(r["tool_result"]) for r in results)